@@ -4,15 +4,16 @@ import os
 import logging
 import redis
 
-from agent_framework import initialize_llm_client, observability_decorator
+from agent_framework import observability_decorator
 from .context_manager import set_session, session_var
+from .utils.llm_gateway import get_llm_gateway
 
 # set up the redis client
 redis_host = os.getenv('REDIS_HOST', 'localhost')
 redis_client = redis.asyncio.Redis(host=redis_host, port=6379, db=0)
 
-# set up the LLM
-client = initialize_llm_client()
+# every LLM call shares the process wide gateway and its connection pool
+client = get_llm_gateway()
 MODEL = os.environ['LLM_MODEL_ID']
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
@@ -127,7 +128,8 @@ async def single_turn_agent(messages: List[dict], task_id: str):
     messages.insert(1, first_assistant_message)
 
     # call the language model
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
+        node='PatientInformation',
         model=os.environ['LLM_MODEL_ID'],
         messages=messages,
         max_tokens=4096,
@@ -41,6 +41,26 @@ const NEXT_PUBLIC_GREETING_FILENAME = process.env.NEXT_PUBLIC_GREETING_FILENAME
 const NEXT_PUBLIC_AGENT = process.env.NEXT_PUBLIC_AGENT || "pizza-agent";
 const skinConfig = SkinConfigurations[NEXT_PUBLIC_AGENT];
 
+// widget details arrive as objects, older agents send them as JSON strings
+// or, for orders without a confirmation number, as the plain tool message
+type WidgetDetails = string | { [key: string]: any } | any[];
+
+const parseWidgetDetails = (details: WidgetDetails) => {
+  if (typeof details !== "string") {
+    return details;
+  }
+  try {
+    return JSON.parse(details);
+  } catch (error) {
+    return details;
+  }
+};
+
+const parseConfirmationDetails = (details: WidgetDetails) => {
+  const confirmation = parseWidgetDetails(details);
+  return typeof confirmation === "string" ? { message: confirmation } : confirmation;
+};
+
 
 export default function Home() {
 
@@ -87,7 +107,7 @@ export default function Home() {
   const [message, setMessage] = useState("");
   const [latestWidget, setLatestWidget] = useState<{
     type: string;
-    details: string;
+    details: WidgetDetails;
   } | null>(null);
 
 
@@ -164,14 +184,9 @@ export default function Home() {
         }
       }
 
-      let details: any;
-      try {
-        details = JSON.parse(widget.details);
-      } catch (error) {
-        console.error(
-          "Error: Invalid JSON received for widget:",
-          JSON.stringify(error)
-        );
+      let details: any = parseWidgetDetails(widget.details);
+      if (typeof details === "string") {
+        console.error("Error: Invalid JSON received for widget:", widget.type);
         console.log(widget.details);
         details = [];
       }
@@ -365,7 +380,7 @@ export default function Home() {
         </>
       )}
       {currentPage === "order-confirmation" && (
-        <OrderConfirmation confirmation={JSON.parse(latestWidget!.details)} />
+        <OrderConfirmation confirmation={parseConfirmationDetails(latestWidget!.details)} />
       )}
     </main>
   );
@@ -1,6 +1,7 @@
 from .tools.shopify import *
 from agent_framework import make_tools_description
 
+import inspect
 import os
 
 
@@ -22,6 +23,100 @@ tool_funcs = [
     get_order_status,
 ]
 tools_desc, tools_dict, tool_param_desc = make_tools_description(tool_funcs)
+tool_signatures = {func.__name__: inspect.signature(func) for func in tool_funcs}
+
+# Stream the customer response sentence by sentence so text to speech can start early
+customer_response_streaming = os.getenv('CUSTOMER_RESPONSE_STREAMING', 'false').lower() == 'true'
+
+# 'two-step' chooses the tool and identifies its parameters with two LLM calls, 'fused' does both in one call
+tool_call_mode = os.getenv('TOOL_CALL_MODE', 'two-step').lower()
+tool_choice_node = 'ChooseToolWithParams' if tool_call_mode == 'fused' else 'ChooseTool'
+
+# 'prefix-cache' moves the per-turn sections (conversation, tool results) to the end of the node
+# system prompts so the static sections form a prefix the LLM provider can cache
+prompt_layout = os.getenv('PROMPT_LAYOUT', 'default').lower()
+
+# Start the tool choice alongside Routing and keep its result when Routing calls a tool
+speculative_tool_choice = os.getenv('SPECULATIVE_TOOL_CHOICE', 'false').lower() == 'true'
+
+# 'fast' handles actions taken on the frontend (widget clicks) without LLM calls: the tool output is
+# described with a template and, when enabled, acknowledged with a templated response. The full
+# reasoning path only runs when the tool fails
+frontend_action_mode = os.getenv('FRONTEND_ACTION_MODE', 'reasoning').lower()
+frontend_action_acknowledgement = os.getenv('FRONTEND_ACTION_ACKNOWLEDGEMENT', 'true').lower() == 'true'
+
+# Describe the output of the Shopify tools with their templates in ConvertNaturalLanguage,
+# the LLM only describes the output of tools without a template
+tool_description_templates = os.getenv('TOOL_DESCRIPTION_TEMPLATES', 'true').lower() == 'true'
+
+# Tools run on a bounded thread pool with per tool concurrency limits and timeouts,
+# limits and timeouts are given as "tool=value" pairs, e.g. "get_products=8,submit_cart_for_order=2"
+def parse_tool_settings(value, cast):
+    settings = {}
+    for item in filter(None, [i.strip() for i in value.split(',')]):
+        tool, setting = item.split('=')
+        settings[tool.strip()] = cast(setting)
+    return settings
+
+tool_thread_pool_size = int(os.getenv('TOOL_THREAD_POOL_SIZE', '16'))
+tool_default_concurrency = int(os.getenv('TOOL_DEFAULT_CONCURRENCY', str(tool_thread_pool_size)))
+tool_concurrency_limits = parse_tool_settings(os.getenv('TOOL_CONCURRENCY_LIMITS', ''), int)
+tool_default_timeout = float(os.getenv('TOOL_TIMEOUT_SECONDS', '30'))
+tool_timeouts = parse_tool_settings(os.getenv('TOOL_TIMEOUTS', ''), float)
+
+# Compaction keeps the last turns of long conversations verbatim and replaces older turns with a
+# rolling summary kept in redis by session guid, token budgets cap the conversation each node sends to the LLM
+compaction_enabled = os.getenv('COMPACTION_ENABLED', 'false').lower() == 'true'
+compaction_keep_turns = int(os.getenv('COMPACTION_KEEP_TURNS', '6'))
+compaction_min_summary_tokens = int(os.getenv('COMPACTION_MIN_SUMMARY_TOKENS', '1000'))
+compaction_summary_ttl_seconds = int(os.getenv('COMPACTION_SUMMARY_TTL_SECONDS', '86400'))
+compaction_token_budget = int(os.getenv('COMPACTION_TOKEN_BUDGET', '0')) or None
+compaction_node_token_budgets = parse_tool_settings(os.getenv('COMPACTION_NODE_TOKEN_BUDGETS', ''), int)
+
+# 'json-schema' sends the output schema of each node for constrained decoding on providers which
+# support it, 'json-object' only asks for JSON. Invalid JSON is repaired locally before the LLM json fixer runs
+json_output_mode = os.getenv('JSON_OUTPUT_MODE', 'json-object').lower()
+
+# Cache the tool results, widgets and response of turns which only called cart independent tools,
+# keyed on the normalized customer question and the catalog version
+response_cache_enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+response_cache_ttl_seconds = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+response_cache_tools = [i.strip() for i in os.getenv('RESPONSE_CACHE_TOOLS', 'get_products,get_product_details').split(',') if i.strip()]
+
+# 'push' stops a turn as soon as it is cancelled, through redis keyspace notifications of the task
+# status key or a message on its cancel channel. 'poll' only checks the status between nodes
+cancellation_mode = os.getenv('CANCELLATION_MODE', 'push').lower()
+
+# Every LLM call goes through one gateway with a shared connection pool, a global and per model
+# concurrency limit ("model=n" pairs) and a bounded queue of calls waiting for a slot (0 is unbounded)
+llm_max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', '32'))
+llm_max_connections = int(os.getenv('LLM_MAX_CONNECTIONS', str(llm_max_concurrency)))
+llm_model_concurrency = parse_tool_settings(os.getenv('LLM_MODEL_CONCURRENCY', ''), int)
+llm_max_queue = int(os.getenv('LLM_MAX_QUEUE', '0'))
+llm_queue_warning_seconds = float(os.getenv('LLM_QUEUE_WARNING_SECONDS', '1'))
+
+# Every LLM call of a turn has to finish within what is left of the turn latency budget, optionally
+# capped per call (0 is no limit). With hedging, a call still running after the p90 latency of its
+# node is sent again and the first answer is used
+turn_latency_budget = float(os.getenv('TURN_LATENCY_BUDGET_SECONDS', '30')) or None
+llm_call_timeout_seconds = float(os.getenv('LLM_CALL_TIMEOUT_SECONDS', '0')) or None
+llm_hedging = os.getenv('LLM_HEDGING', 'false').lower() == 'true'
+llm_hedge_percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', '0.9'))
+llm_hedge_min_samples = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+llm_hedge_min_delay_seconds = float(os.getenv('LLM_HEDGE_MIN_DELAY_SECONDS', '0.2'))
+
+# Write the span tree of every turn to a file in `turn_trace_dir`, as 'chrome' trace events (for
+# chrome://tracing or Perfetto) or as 'otlp' JSON; 'none' turns the export off
+turn_trace_export = os.getenv('TURN_TRACE_EXPORT', 'none').lower()
+turn_trace_dir = os.getenv('TURN_TRACE_DIR', 'turn-traces')
+
+# How nodes log their messages, inputs, outputs and results: 'verbose' logs them whole, 'structured'
+# logs key=value fields cut to `log_field_max_chars` and only a sample of payloads whole, 'off' skips
+# them. Per node modes ("node=mode" pairs) override the default
+log_payload_mode = os.getenv('LOG_PAYLOAD_MODE', 'structured').lower()
+log_node_payload_modes = parse_tool_settings(os.getenv('LOG_NODE_PAYLOAD_MODES', ''), lambda mode: mode.strip().lower())
+log_field_max_chars = int(os.getenv('LOG_FIELD_MAX_CHARS', '200'))
+log_payload_sample_rate = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
 
 # xRx modalities
 input_modality = 'audio'
@@ -1,8 +1,9 @@
 from .context_manager import set_session, session_var
 import asyncio
-import json
 from agent_framework import observability_decorator
 from .graph.main import agent_graph
+from .utils.timings import turn_timings_var
+from .utils.events import AgentEvent, ErrorEvent
 import logging
 import traceback
 import os
@@ -38,26 +39,22 @@ async def run_agent(input_dict: dict):
             async for result in agent_graph(messages, task_id, action, {}):
                 if 'error' in result:
                     logging.error(f"Error in graph traversal: {result}")
-                    yield json.dumps(result)
+                    yield ErrorEvent(result['error']).encode()
                     return
-                yield format_result_to_output(result)
+                # the only place a result is serialized
+                yield format_result_to_output(result).encode()
 
         except Exception as e:
             logging.exception(f"Error occurred in the agent graph")
             error_traceback = traceback.format_exc()
-            yield json.dumps({
-                'error': str(e),
-                'traceback': error_traceback
-            })
+            yield ErrorEvent(str(e), error_traceback).encode()
             raise e
 
 
-def format_result_to_output(result):
-    logging.info(f"Starting output formatting...")
+def format_result_to_output(result: dict) -> AgentEvent:
     try:
         tool_prompt_start = "### Tools Used Before Responding to Customer\n\n"
         response_prompt_start = "\n\n### Audio Response to Customer\n\n"
-        result = json.loads(result)
         if result.get('memory', {}).get('tool-output-cache', []):
             tool_output_cache = result.get('memory', {}).get('tool-output-cache', [])
             tool_output_cache_str = ''.join([
@@ -80,17 +77,26 @@ def format_result_to_output(result):
             ]
         
         if result.get('node', '') == 'CustomerResponse':
-            messages_output[-1]['content'] += response_prompt_start + result.get('output', '')
+            # streamed responses carry the text so far in 'response' and only the new chunk in 'output'
+            messages_output[-1]['content'] += response_prompt_start + result.get('response', result.get('output', ''))
     
     except Exception as e:
         
         logging.exception(f"An error occurred during format_result_to_output")
         raise e
 
-    return json.dumps({
-        'messages': messages_output,
-        'session': session_var.get(),
-        'node': result.get('node', ''),
-        'output': result.get('output', ''),
-        'reason': result.get('reason', ''),
-    })
+    event = AgentEvent(
+        node=result.get('node', ''),
+        output=result.get('output', ''),
+        reason=result.get('reason', ''),
+        final=result.get('final', True),
+        messages=messages_output,
+        session=session_var.get(),
+    )
+
+    # the final response of the turn carries where the time of the turn went until then
+    timings = turn_timings_var.get()
+    if timings is not None and event.node == 'CustomerResponse' and event.final:
+        event.timings = timings.breakdown()
+
+    return event
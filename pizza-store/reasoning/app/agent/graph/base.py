@@ -1,20 +1,86 @@
 from typing import List, Dict
 from abc import ABC, abstractmethod
-import networkx as nx
+from types import MappingProxyType
+from dataclasses import dataclass
 import asyncio
 import logging
-import redis
-import os
+import time
+from agent.utils.redis_pool import get_async_redis
+from agent.utils.deadlines import start_turn_deadline
+from agent.utils.cancellation import start_turn_cancellation, stop_turn_cancellation, turn_cancellation_var
+from agent.utils.timings import start_turn_timings
+from agent.utils.trace_export import export_turn_trace
+from agent.utils.payload_logging import log_payload
+from agent.utils.metrics import registry
+from .memory import Memory
 
 # set up the redis client
-redis_host = os.getenv('REDIS_HOST', 'localhost')
-redis_client = redis.asyncio.Redis(host=redis_host, port=6379, db=0)
+redis_client = get_async_redis()
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# sentinel put on the result queue once every node of a traversal has finished
+_TRAVERSAL_DONE = object()
+# sentinel put on the result queue when the task is cancelled
+_TRAVERSAL_CANCELLED = object()
+
+
+@dataclass
+class SpeculationStats:
+    """Process wide counters for speculative node execution."""
+    started: int = 0
+    committed: int = 0
+    wasted: int = 0
+    latency_saved_seconds: float = 0.0
+
+speculation_stats = SpeculationStats()
+
+
+@registry.collector
+def speculation_metrics():
+    yield 'xrx_speculations_total', 'counter', 'Speculative node runs by outcome.', [
+        ({'outcome': 'started'}, speculation_stats.started),
+        ({'outcome': 'committed'}, speculation_stats.committed),
+        ({'outcome': 'wasted'}, speculation_stats.wasted),
+    ]
+    yield 'xrx_speculation_saved_seconds_total', 'counter', 'Latency saved by committed speculations.', [({}, speculation_stats.latency_saved_seconds)]
+
+
+class Speculation:
+    """A successor started ahead of time whose results are buffered until the parent commits it."""
+    def __init__(self, node_id, memory=None):
+        self.node_id = node_id
+        # the memory the speculative run started from
+        self.memory = memory
+        self.task = None
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        # set when the parent chooses the speculation, the run only saved the time it overlapped the parent
+        self.parent_finished_at = None
+
+    def commit(self):
+        parent_finished_at = self.parent_finished_at or time.perf_counter()
+        saved = max(min(self.finished_at or parent_finished_at, parent_finished_at) - self.started_at, 0.0)
+        speculation_stats.committed += 1
+        speculation_stats.latency_saved_seconds += saved
+        logger.info(f"Committed speculative node {self.node_id}, saved {saved * 1000:.1f} ms")
+
+    def discard(self):
+        if self.task.done() and not self.task.cancelled():
+            # retrieve a failed speculation's exception so asyncio does not report it as unhandled
+            self.task.exception()
+        self.task.cancel()
+        speculation_stats.wasted += 1
+        logger.info(f"Discarded speculative node {self.node_id}")
+
 class Node(ABC):
+    """A step of the agent graph.
+
+    Node instances are built once per process and shared by every request, so all
+    per-turn state has to travel through the `input` dict and never live on `self`.
+    """
     def __init__(self, id, attributes=None):
         self.id = id
         self.attributes = attributes or {}
@@ -27,7 +93,20 @@ class Node(ABC):
     async def get_successors(self, result: dict):
         pass
 
+    async def speculate(self, input: dict):
+        """Successors which may start while this node is still processing, as (node_id, input) pairs.
+
+        Only used when the graph is traversed with `speculative=True`. A speculative successor is
+        committed if `get_successors` returns the same node id and discarded otherwise. Memory is
+        immutable and can be shared, anything else it may modify must be given as its own copy.
+        """
+        return []
+
     async def check_for_continue(self, task_id):
+        # cancellations pushed by redis stop the turn right away, polling is only needed without them
+        cancellation = turn_cancellation_var.get()
+        if cancellation is not None and (cancellation.watched or cancellation.cancelled):
+            return not cancellation.cancelled
         redis_status = await redis_client.get('task-' + task_id)
         logger.info(f"Node {self.id} on task {task_id} has status {redis_status}")
         if redis_status == b'cancelled':
@@ -35,42 +114,127 @@ class Node(ABC):
         return True
 
 class Graph:
+    """Builder for the agent graph. Call `compile()` once and share the result across requests."""
     def __init__(self):
-        self.G = nx.DiGraph()
+        self.nodes = {}
+        self.edges = {}
 
     def add_node(self, node):
-        self.G.add_node(node.id, node=node)
+        if node.id in self.nodes:
+            raise ValueError(f"Node {node.id} is already part of the graph")
+        self.nodes[node.id] = node
+        self.edges.setdefault(node.id, [])
 
     def add_edge(self, from_node, to_node):
-        self.G.add_edge(from_node.id, to_node.id)
-    
-    async def traverse(self, task_id, start_node_id, messages, input=None, max_nodes=40):
+        self.edges[from_node.id].append(to_node.id)
+
+    def compile(self):
+        for node_id, successor_ids in self.edges.items():
+            unknown = [i for i in successor_ids if i not in self.nodes]
+            if unknown:
+                raise ValueError(f"Node {node_id} has edges to unknown nodes: {unknown}")
+        return CompiledGraph(self.nodes, self.edges)
+
+
+class CompiledGraph:
+    """Immutable graph with a precomputed id-to-node table, safe to share between requests."""
+    __slots__ = ('_nodes', '_edges')
+
+    def __init__(self, nodes, edges):
+        object.__setattr__(self, '_nodes', dict(nodes))
+        object.__setattr__(self, '_edges', {k: tuple(v) for k, v in edges.items()})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledGraph is immutable")
+
+    @property
+    def nodes(self):
+        return MappingProxyType(self._nodes)
+
+    @property
+    def edges(self):
+        return MappingProxyType(self._edges)
+
+    async def traverse(self, task_id, start_node_id, messages, input=None, max_nodes=40, speculative=False, latency_budget=None):
+        """Runs the graph from `start_node_id` and yields the results of the nodes as they arrive.
+
+        `latency_budget` is the number of seconds the whole traversal may take. Every node runs
+        with the same turn deadline, which bounds each of its LLM calls.
+
+        The time of every node run, with the LLM and tool calls it made, is recorded in the
+        turn timings (`agent.utils.timings`). The runs form a span tree following
+        `get_successors`, exported per turn when `turn_trace_export` is set.
+
+        When the task is cancelled, every running node is cancelled at once, including its
+        in-flight LLM and tool calls, and the traversal stops without yielding anything else.
+        """
         result_queue = asyncio.Queue()
         active_tasks = 0
-        tasks_done = asyncio.Event()
+        running_tasks = set()
         visited_nodes_count = 0  # Changed from set to counter
+        nodes = self._nodes
+
+        async def run_speculative(speculation, messages, input, parent):
+            # buffer the results, nothing reaches the queue unless the parent commits the speculation
+            run = timings.start_node(speculation.node_id, speculation.started_at, parent, speculative=True)
+            try:
+                results = [result async for result in nodes[speculation.node_id].process(messages, input)]
+            finally:
+                timings.finish_node(run)
+            speculation.finished_at = time.perf_counter()
+            return results
+
+        async def replay_speculation(speculation, node, messages, input):
+            try:
+                buffered = await speculation.task
+            except Exception:
+                logger.exception(f"Speculative run of node {node.id} failed, processing it again")
+                async for result in node.process(messages, input):
+                    yield result
+                return
+            speculation.commit()
+            for result in buffered:
+                # the speculative run started before the parent's last memory changes, apply its changes on top of them
+                if 'memory' in result:
+                    base = Memory.of(speculation.memory)
+                    result = {**result, 'memory': base.merge(Memory.of(input.get('memory')), Memory.of(result['memory']))}
+                yield result
 
-        async def execute_node(node_id, messages, input=None):
+        async def execute_node(node_id, messages, input=None, speculation=None, scheduled_at=None, parent=None):
             nonlocal active_tasks, visited_nodes_count
             active_tasks += 1
-            node = self.G.nodes[node_id]['node']
+            node = nodes[node_id]
             result = None
+            run = None
+            speculations = {}
             logger.info(f"Starting processing node: {node.id} on task id: {task_id}")
 
             # Check if the number of visited nodes exceeds 40
             if visited_nodes_count > max_nodes:
                 error_message = f"Number of nodes in the search exceeds {max_nodes}. Breaking the search."
                 logger.error(error_message)
-                await result_queue.put({'error': error_message})
-                tasks_done.set()
+                result_queue.put_nowait({'error': error_message})
+                active_tasks -= 1
                 return
 
             # start by processing the first node
             visited_nodes_count += 1  # Increment the counter
             try:
-                async for intermediate_result in node.process(messages, input):
-                    await result_queue.put(intermediate_result)
+                run = timings.start_node(node.id, scheduled_at, parent)
+                if speculative:
+                    for (speculative_id, speculative_input) in await node.speculate(input):
+                        speculations[speculative_id] = start_speculation(speculative_id, messages, speculative_input, run)
+                        logger.info(f"Node {node.id} started speculative node {speculative_id}")
+
+                if speculation is not None:
+                    results = replay_speculation(speculation, node, messages, input)
+                else:
+                    results = node.process(messages, input)
+                async for intermediate_result in results:
+                    result_queue.put_nowait(intermediate_result)
                     result = intermediate_result
+                finished_at = time.perf_counter()
+                timings.finish_node(run)
                 logger.info(f"Node finished processing: {node.id}")
 
                 # now check redis to see if the node should continue based on the redis cluster
@@ -81,12 +245,25 @@ class Graph:
                 else:
                     logger.info(f"Node {node.id} has been cancelled, returning no successors")
                     successors = []
-                
+
+                # speculative successors which were not chosen never emit anything, stop them before waiting on the chosen ones
+                chosen = {node_id for (node_id, _) in successors}
+                for node_id in [i for i in speculations if i not in chosen]:
+                    speculations.pop(node_id).discard()
+                for pending in speculations.values():
+                    pending.parent_finished_at = finished_at
+
                 # continue processing the successors of the node if it hasn't been cancelled
                 if successors:
-                    logger.info('Successors: %s', [self.G.nodes[node_id]['node'].id for (node_id, input) in successors])
-                    # Create tasks for each successor
-                    tasks = [asyncio.create_task(execute_node(node_id, messages, input)) for (node_id, input) in successors]
+                    logger.info('Successors: %s', [node_id for (node_id, input) in successors])
+                    unknown = [node_id for (node_id, input) in successors if node_id not in nodes]
+                    if unknown:
+                        raise KeyError(f"Node {node.id} returned unknown successors: {unknown}")
+                    # Create tasks for each successor, reusing speculative work when there is some
+                    tasks = [
+                        start_node(node_id, messages, input, speculations.pop(node_id, None), run)
+                        for (node_id, input) in successors
+                    ]
                     
                     # Wait for all tasks to complete
                     await asyncio.gather(*tasks)
@@ -97,32 +274,69 @@ class Graph:
             except Exception as e:
                 error_message = f"An error occurred in node {node.id}"
                 logger.exception(error_message)
-                await result_queue.put({'error': error_message})
+                result_queue.put_nowait({'error': error_message})
                 await redis_client.set('task-' + task_id, 'finished-with-error')
-                tasks_done.set()
             finally:
+                if run is not None:
+                    timings.finish_node(run)
+                # speculations left by a failed or cancelled node never emit anything
+                for leftover in speculations.values():
+                    leftover.discard()
                 active_tasks -= 1
                 if active_tasks == 0:
-                    tasks_done.set()
+                    # wake up the consumer, every node of the traversal has finished
+                    result_queue.put_nowait(_TRAVERSAL_DONE)
+
+        def track(coroutine):
+            task = asyncio.create_task(coroutine)
+            running_tasks.add(task)
+            task.add_done_callback(running_tasks.discard)
+            if cancellation.cancelled:
+                task.cancel()
+            return task
+
+        def start_node(node_id, messages, input=None, speculation=None, parent=None):
+            return track(execute_node(node_id, messages, input, speculation, time.perf_counter(), parent))
+
+        def start_speculation(node_id, messages, input, parent):
+            speculation_stats.started += 1
+            speculation = Speculation(node_id, input.get('memory'))
+            speculation.task = track(run_speculative(speculation, messages, input, parent))
+            return speculation
+
+        # nodes are started after the deadline, cancellation and timings, so each of them runs with them in its context
+        start_turn_deadline(latency_budget)
+        timings = start_turn_timings()
+        cancellation = start_turn_cancellation(task_id, running_tasks, lambda: result_queue.put_nowait(_TRAVERSAL_CANCELLED))
 
         # Start the execution of the initial node
-        asyncio.create_task(execute_node(start_node_id, messages, input))
+        start_node(start_node_id, messages, input)
 
-        # Iterate over the results in the queue
-        while not tasks_done.is_set() or not result_queue.empty():
-            if not result_queue.empty():
+        # Block on the queue until a node yields a result or the traversal is done
+        try:
+            while True:
                 result = await result_queue.get()
+                if result is _TRAVERSAL_DONE or result is _TRAVERSAL_CANCELLED:
+                    break
                 if 'error' in result:
                     logger.info(f"Yielding error result from traverse: {result}")
                     yield result
                     return
-                from pprint import pformat
-                logger.info(f"Yielding result from traverse:\n{pformat(result, indent=2, width=100)}")
+                log_payload(logger, result.get('node', 'traverse'), 'result', result=result)
                 yield result
-            else:
-                await asyncio.sleep(0.01)
+        finally:
+            # stop any node still running when the consumer leaves early (error or closed stream)
+            for task in list(running_tasks):
+                task.cancel()
+            stop_turn_cancellation(cancellation)
+            timings.finish()
+            export_turn_trace(timings, task_id)
+
+        if cancellation.cancelled:
+            await asyncio.gather(*running_tasks, return_exceptions=True)
+            cancellation.stopped()
+            return
 
-        # Wait for all tasks to be done
-        await tasks_done.wait()
-        await result_queue.put(None)
+        if speculative:
+            logger.info(f"Speculation stats: {speculation_stats}")
         await redis_client.set('task-' + task_id, 'finished-with-success')
@@ -1,7 +1,9 @@
 import asyncio
 from .base import *
+from .memory import Memory
 from .nodes.routing import Routing
 from .nodes.choose_tool import ChooseTool
+from .nodes.choose_tool_with_params import ChooseToolWithParams
 from .nodes.customer_response import CustomerResponse
 from .nodes.convert_natural_language import ConvertNaturalLanguage
 from .nodes.identify_tool_params import IdentifyToolParams
@@ -9,8 +11,13 @@ from .nodes.execute_tool import ExecuteTool
 from .nodes.widget import Widget
 from .nodes.task_description_response import TaskDescriptionResponse
 
+from agent.config import speculative_tool_choice, frontend_action_mode, turn_latency_budget
+from agent.utils.prompts import start_turn_prompt
+from agent.utils.compaction import compact_messages
+from agent.utils.response_cache import response_cache, TurnRecorder
+from agent.utils.redis_pool import get_async_redis
+from agent.context_manager import session_var
 import logging
-import json
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -26,33 +33,29 @@ Parameters: {parameters}
 <awaiting next steps>
 '''
 
-async def agent_graph(messages, task_id='', action={}, memory=None):
-
-    # define all nodes
-    node_routing = Routing('Routing', {})
-    node_choose_tool = ChooseTool('ChooseTool', {})
-    node_convert_natural_language = ConvertNaturalLanguage('ConvertNaturalLanguage', {})
-    node_identify_tool_params = IdentifyToolParams('IdentifyToolParams', {})
-    node_execute_tool = ExecuteTool('ExecuteTool', {})
-    node_customer_response = CustomerResponse('CustomerResponse', {})
-    node_widget = Widget('Widget', {})
-    node_task_description = TaskDescriptionResponse('TaskDescriptionResponse', {})
-
-    # define the graph by putting all nodes in the graph construct DO NOT FORGET THIS
+def build_agent_graph():
+    """Builds and compiles the agent graph. Nodes are stateless and shared by every request."""
     graph = Graph()
-    graph.add_node(node_routing)
-    graph.add_node(node_choose_tool)
-    graph.add_node(node_customer_response)
-    graph.add_node(node_convert_natural_language)
-    graph.add_node(node_identify_tool_params)
-    graph.add_node(node_execute_tool)
-    graph.add_node(node_widget)
-    graph.add_node(node_task_description)
+    graph.add_node(Routing('Routing', {}))
+    graph.add_node(ChooseTool('ChooseTool', {}))
+    graph.add_node(ChooseToolWithParams('ChooseToolWithParams', {}))
+    graph.add_node(CustomerResponse('CustomerResponse', {}))
+    graph.add_node(ConvertNaturalLanguage('ConvertNaturalLanguage', {}))
+    graph.add_node(IdentifyToolParams('IdentifyToolParams', {}))
+    graph.add_node(ExecuteTool('ExecuteTool', {}))
+    graph.add_node(Widget('Widget', {}))
+    graph.add_node(TaskDescriptionResponse('TaskDescriptionResponse', {}))
+    return graph.compile()
+
+# compiled once per process, per-turn setup only picks the starting node
+AGENT_GRAPH = build_agent_graph()
+
+async def agent_graph(messages, task_id='', action={}, memory=None):
 
     # decide where to enter the graph if there is a tool call
     if action == {}:
-        starting_node = node_routing.id
-        input_dict = {'memory': memory}
+        starting_node = 'Routing'
+        input_dict = {'memory': Memory.of(memory)}
     
     elif action['type'] == 'tool':
         # add the user message to the message chain
@@ -65,19 +68,46 @@ async def agent_graph(messages, task_id='', action={}, memory=None):
                 'content': user_prompt
             },
         )
-        starting_node = node_execute_tool.id
+        starting_node = 'ExecuteTool'
 
         # add the tool call to the input dict which will be sent to the graph
-        input_dict = {'memory': memory}
+        input_dict = {'memory': Memory.of(memory)}
         input_dict['tool'] = action['details']['tool']
         input_dict['parameters'] = action['details']['parameters']
+
+        # the action is fully specified by the frontend, skip the LLM nodes unless the tool fails
+        input_dict['fast-path'] = frontend_action_mode == 'fast'
     logger.info(f"Starting traversal at node: {starting_node}")
 
+    # replace the older turns of long conversations with the rolling summary
+    messages = await compact_messages(messages, session_var.get())
+
+    # answer repeated catalog questions from the response cache
+    cache_key = await response_cache.key(messages) if action == {} else None
+    if cache_key is not None:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            for result in response_cache.results(cached):
+                yield result
+            await get_async_redis().set('task-' + task_id, 'finished-with-success')
+            return
+    recorder = TurnRecorder(response_cache.tools)
+
+    # every node of the turn renders its prompt from the same conversation
+    start_turn_prompt(messages)
+
     # start the graph traversal
     try:
-        async for result in graph.traverse(task_id, starting_node, messages, input_dict):
-            logger.info(f"Result: {result}")
-            yield json.dumps(result)
+        async for result in AGENT_GRAPH.traverse(
+            task_id, starting_node, messages, input_dict,
+            speculative=speculative_tool_choice, latency_budget=turn_latency_budget,
+        ):
+            recorder.add(result)
+            yield result
     except Exception as e:
         logger.exception(f"An error occurred during graph traversal")
         raise e
+
+    entry = recorder.entry() if cache_key is not None else None
+    if entry is not None:
+        await response_cache.set(cache_key, entry)
@@ -0,0 +1,78 @@
+class FrozenDict(dict):
+    """A dict which cannot be changed once it is created.
+
+    It is still a dict, so it serializes to JSON and reads like the plain dicts it replaces.
+    Copies return the same object, there is nothing a copy could protect.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is immutable, use its methods returning an updated copy")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class Memory(FrozenDict):
+    """The graph state a node hands to its successors.
+
+    Memory is persistent: updates return a new Memory which shares every unchanged value with the
+    old one, so handing it to any number of successors needs no copy and a branch can never see
+    the changes of another. Lists are stored as tuples, `append` shares the existing entries.
+
+    Example:
+    >>> memory = Memory()
+    >>> branch = memory.append('tool-output-cache', {'tool': 'get_products'})
+    >>> memory.get('tool-output-cache', ()), len(branch['tool-output-cache'])
+    ((), 1)
+    """
+
+    @classmethod
+    def of(cls, value) -> 'Memory':
+        """Returns the value as Memory, wrapping a plain dict of a caller which does not use Memory yet."""
+        if isinstance(value, Memory):
+            return value
+        memory = {}
+        for key, item in (value or {}).items():
+            if isinstance(item, list):
+                item = tuple(FrozenDict(entry) if isinstance(entry, dict) else entry for entry in item)
+            memory[key] = item
+        return cls(memory)
+
+    def set(self, key: str, value) -> 'Memory':
+        if self.get(key) is value:
+            return self
+        return Memory({**self, key: value})
+
+    def append(self, key: str, item) -> 'Memory':
+        item = FrozenDict(item) if isinstance(item, dict) else item
+        return Memory({**self, key: self.get(key, ()) + (item,)})
+
+    def merge(self, *branches) -> 'Memory':
+        """Combines the memories of branches which all started from this one.
+
+        Entries appended to a list by the branches are kept after this memory's entries, in the
+        order the branches are given. For any other key the last given branch which changed the
+        value wins. The result only depends on the order of the branches, never on timing.
+        """
+        merged = dict(self)
+        for branch in branches:
+            for key, value in branch.items():
+                base = self.get(key)
+                if value is base:
+                    continue
+                base = () if base is None and isinstance(value, tuple) else base
+                appended = isinstance(value, tuple) and isinstance(base, tuple) and value[:len(base)] == base
+                if appended and isinstance(merged.get(key, ()), tuple):
+                    merged[key] = merged.get(key, ()) + value[len(base):]
+                else:
+                    merged[key] = value
+        return Memory(merged)
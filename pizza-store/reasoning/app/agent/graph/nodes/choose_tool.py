@@ -2,18 +2,23 @@ from ..base import Node
 import os
 import asyncio
 import logging
-import json
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
-from agent.config import tools_desc
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
+from agent.config import tools_desc, tools_dict
 import openai
-from pprint import pformat
+from agent.utils.payload_logging import log_payload
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -53,12 +58,17 @@ and place a blank string "" in the 'tool' key.
 - If you're unsure about any information, use the appropriate tool to verify rather than making assumptions.
 '''.replace('{tools}', tools_desc)
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('choose_tool', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'tool': {'type': 'string', 'enum': list(tools_dict.keys()) + ['']},
+    },
+    'required': ['reason', 'tool'],
+})
 
 class ChooseTool(Node):
     def __init__(self, name, attributes):
@@ -69,26 +79,16 @@ class ChooseTool(Node):
     @observability_decorator('ChooseTool')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"ChooseTool processing messages: {messages}")
-            logger.info(f"ChooseTool processing input: {pformat(input, indent=2, width=100)}")
+            log_payload(logger, self.id, 'processing', messages=messages, input=input)
             
-            # make a  copy of the system prompt
-            single_system_prompt = SYSTEM_PROMPT
-
-            # retrieve all tool calls which have been made and make the string if there are any
+            # retrieve all tool calls which have been made
             tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
 
-            # create the conversation variable
-            conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-            # add tool call cache to the conversation if it exists
-            if len(tool_output_cache) > 0:
-                tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                conversation += single_tool_cache_prompt
+            # render the conversation and tool call cache, shared by every node of this turn
+            conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
 
             # add the conversation to the system prompt
-            single_system_prompt = SYSTEM_PROMPT.replace('{conversation}', conversation)
+            single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
 
             # create the messages format
             input_messages = [
@@ -103,25 +103,24 @@ class ChooseTool(Node):
             })
 
             # call the LLM
-            logger.debug(f"ChooseTool input messages:\n{pformat(input_messages, indent=2, width=100)}")
+            logger.debug("ChooseTool input messages: %s", input_messages)
             try:
                 response = await self.llm_client.chat.completions.create(
+                    node=self.id,
                     model=self.llm_model_id,
                     messages=input_messages,
                     temperature=0.9,
-                    response_format={ "type": "json_object" },
+                    response_format=OUTPUT_SCHEMA.response_format(),
                 )
-                tool_output = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError:
-                logger.warning("Failed to parse JSON response. Attempting to fix with json_fixer.")
-                tool_output = await json_fixer(response.choices[0].message.content)
+                record_llm_usage(self.id, response)
+                generation = response.choices[0].message.content
             except openai.BadRequestError as e:
                 if e.code == 'json_validate_failed':
-                    logger.warning("JSON validation failed. Attempting to fix with json_fixer.")
-                    tool_output = await json_fixer(e.response.json()['error']['failed_generation'])
+                    generation = e.response.json()['error']['failed_generation']
                 else:
                     raise e
-            logger.info(f"ChooseTool tool_output: {tool_output}")
+            tool_output = await OUTPUT_SCHEMA.parse(self.id, generation)
+            log_payload(logger, self.id, 'output', tool_output=tool_output)
 
             # send the data back to the endpoint
             await asyncio.sleep(0) 
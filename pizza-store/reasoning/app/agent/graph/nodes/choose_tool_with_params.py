@@ -0,0 +1,204 @@
+from ..base import Node
+import os
+import asyncio
+import logging
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
+from agent.config import tools_desc, tools_dict, tool_param_desc, tool_signatures
+from agent.utils.tools import validate_tool_parameters
+import openai
+from agent.utils.payload_logging import log_payload
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# set up llm
+LLM_CLIENT = get_llm_gateway()
+LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
+
+SYSTEM_PROMPT = '''\
+You are an expert at deciding which tool to use to generate a response to the customer from the assistant \
+and at mapping the parameters of that tool from the conversation and memory.
+If the tool output is already in the conversation, don't use the tool again.
+Keep track of previous tool calls and their results. If a tool call fails or produces unexpected results, do not repeat the same call without modification. Instead, analyze the error, report it to the user, and suggest an alternative action.
+Maintain awareness of the full conversation history. Use this context to avoid repeating information or asking for details that have already been provided.
+
+## Tools
+You have access to the following tools.
+
+{tools}
+
+## Tool Signatures
+These are the exact parameters and types of each tool.
+
+{signatures}
+
+## Historical Conversation
+
+Here is the conversation so far:
+
+{conversation}
+
+## Output Format
+You must return a perfectly formatted JSON object which can be serialized with the following keys:
+- 'reason': a string explaining which tool is the correct tool for the situation and why you chose the value for each parameter.
+- 'tool': a string representing the tool to use.
+- 'parameters': a dictionary representing the parameter keys and values of the tool.
+
+The 'reason' string should follow a pattern like below:
+"The previous tool calls accomplished <diagnosis of previous tool calls here>. \
+Based on these previous actions, the correct tool to call is <tool name here>. \
+The parameters are <description of each parameter value and where it comes from>"
+
+If it is clear that a tool should not be called in this situation, simply state why in the 'reason' key, \
+place a blank string "" in the 'tool' key and an empty dictionary in the 'parameters' key.
+
+The 'parameters' key must contain the exact type of parameter as defined in the tool signature. \
+For instance, if the tool signature specifies an integer, you must return a single integer. \
+Returning a list of integers would be incorrect because the tool expects a single integer, not a list of integers.
+
+## Rules
+- Never assume an id input if it is not provided in the context or previous tool calls.
+- Always use the exact values returned by the previous tools. Do not modify or create new values.
+- Provide all information in the JSON object. Any other text is strictly forbidden.
+- If you're unsure about any information, use the appropriate tool to verify rather than making assumptions.
+'''.replace('{tools}', tools_desc).replace('{signatures}', '\n'.join([
+    f"{tool}({', '.join([f'{desc}' for param, desc in tool_param_desc[tool].items()])})"
+    for tool in tools_dict.keys()
+]))
+
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'], layout=prompt_layout)
+
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('choose_tool_with_params', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'tool': {'type': 'string', 'enum': list(tools_dict.keys()) + ['']},
+        'parameters': {'type': 'object'},
+    },
+    'required': ['reason', 'tool', 'parameters'],
+})
+
+class ChooseToolWithParams(Node):
+    """Chooses the tool and identifies its parameters in a single LLM call.
+
+    The parameters are validated against the tool signature. Only when the validation
+    fails does the graph fall back to the two step ChooseTool / IdentifyToolParams path.
+    """
+    def __init__(self, name, attributes):
+        super().__init__(name, attributes)
+        self.llm_client = LLM_CLIENT
+        self.llm_model_id = LLM_MODEL_ID
+
+    @observability_decorator('ChooseToolWithParams')
+    async def process(self, messages: list, input: dict):
+        try:
+            log_payload(logger, self.id, 'processing', messages=messages)
+
+            # retrieve all tool calls which have been made
+            tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
+
+            # render the conversation and tool call cache, shared by every node of this turn
+            conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
+
+            # add the conversation to the system prompt
+            single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
+
+            # create the messages format
+            input_messages = [
+                {
+                    "role": "system",
+                    "content": single_system_prompt
+                }
+            ]
+            input_messages.append({
+                "role": "user",
+                "content": '<awaiting your next JSON response>'
+            })
+
+            # call the LLM
+            try:
+                response = await self.llm_client.chat.completions.create(
+                    node=self.id,
+                    model=self.llm_model_id,
+                    messages=input_messages,
+                    temperature=0.9,
+                    response_format=OUTPUT_SCHEMA.response_format(),
+                )
+                record_llm_usage(self.id, response)
+                generation = response.choices[0].message.content
+            except openai.BadRequestError as e:
+                if e.code == 'json_validate_failed':
+                    generation = e.response.json()['error']['failed_generation']
+                else:
+                    raise e
+            tool_output = await OUTPUT_SCHEMA.parse(self.id, generation)
+            log_payload(logger, self.id, 'output', tool_output=tool_output)
+
+            # format the tool if the model outputs a tool with parameters
+            tool = tool_output.get('tool', '') or ''
+            if '(' in tool:
+                tool = tool.split('(')[0]
+
+            # validate the parameters against the tool signature
+            errors = []
+            parameters = tool_output.get('parameters', {})
+            if tool and tool not in tool_signatures:
+                errors.append(f"unknown tool '{tool}'")
+            elif tool:
+                parameters, errors = validate_tool_parameters(tool_signatures[tool], parameters)
+            if errors:
+                logger.warning(f"ChooseToolWithParams validation failed for {tool}: {errors}")
+
+            await asyncio.sleep(0)
+            yield {
+                'node': self.id,
+                'reason': tool_output.get('reason', ''),
+                'tool': tool,
+                'output': parameters,
+                'errors': errors,
+                'memory': input.get('memory', {})
+            }
+            logger.info("ChooseToolWithParams finished processing")
+        except Exception as e:
+            logger.exception(f"An error occurred in ChooseToolWithParams")
+            raise e
+
+    async def get_successors(self, result: dict):
+        successors = []
+        tool = result.get('tool', '')
+        reason = result.get('reason', '')
+        memory = result.get('memory', {})
+        errors = result.get('errors', [])
+
+        if tool == '':
+            successors.append(("CustomerResponse", {
+                'reason': reason,
+                'memory': memory
+            }))
+        elif tool not in tool_signatures:
+            # fall back to choosing the tool again with the two step path
+            successors.append(("ChooseTool", {
+                'memory': memory
+            }))
+        elif errors:
+            # the tool is right but the parameters are not, identify them with the two step path
+            successors.append(("IdentifyToolParams", {
+                'tool': tool,
+                'reason': reason,
+                'memory': memory
+            }))
+        else:
+            successors.append(("ExecuteTool", {
+                'tool': tool,
+                'parameters': result.get('output', {}),
+                'memory': memory
+            }))
+        return successors
@@ -1,19 +1,28 @@
 from ..base import Node
+from ..memory import Memory
 import os
 import asyncio
 import logging
 import json
 import asyncio
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout, frontend_action_acknowledgement, tool_description_templates
+from agent.tools.descriptions import describe_tool_call, render_tool_description, acknowledge_tool_call
 from agent.config import tools_dict, tool_param_desc
 import openai
+from agent.utils.payload_logging import log_payload
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -59,12 +68,17 @@ should not include a dictionary of information, it should read like a sentence a
 - Your response must ONLY be JSON output. Any other text is strictly forbidden.
 '''
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['tool', 'tool_output', 'tool_input', 'conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('convert_natural_language', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'description': {'type': 'string'},
+    },
+    'required': ['reason', 'description'],
+})
 
 class ConvertNaturalLanguage(Node):
 
@@ -76,72 +90,38 @@ class ConvertNaturalLanguage(Node):
     @observability_decorator('ConvertNaturalLanguage')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"ConvertNaturalLanguage messages: {messages}")
-            logger.info(f"ConvertNaturalLanguage input: {input}")
+            log_payload(logger, self.id, 'processing', messages=messages, input=input)
 
-            # add the tool information to the system prompts
             tool = input['tool']
             tool_output_str = json.dumps(input['output'])
             tool_input_str = json.dumps(input['parameters'])
-            single_system_prompt = SYSTEM_PROMPT.replace('{tool}', tool)
-            single_system_prompt = single_system_prompt.replace('{tool_output}', tool_output_str)
-            single_system_prompt = single_system_prompt.replace('{tool_input}', tool_input_str)
-
-            # retrieve all tool calls which have been made and make the string if there are any
-            tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
-
-            # create the conversation variable
-            conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-            # add tool call cache to the conversation if it exists
-            if len(tool_output_cache) > 0:
-                tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                conversation += single_tool_cache_prompt
-
-            # add the conversation to the system prompt
-            single_system_prompt = single_system_prompt.replace('{conversation}', conversation)
-
-            # create the messages format
-            input_messages = [
-                {
-                    "role": "system",
-                    "content": single_system_prompt
+            fast_path = input.get('fast-path', False)
+
+            # the known tools are described by their renderer, the LLM is only used for the others
+            description = render_tool_description(tool, input['parameters'], input['output']) if tool_description_templates else None
+            if description is not None:
+                convert_to_natural_language_output = {
+                    'reason': 'templated description of the tool output',
+                    'description': description,
                 }
-            ]
-            input_messages.append({
-                "role": "user",
-                "content": '<awaiting your next JSON response>'
-            })
+            # actions taken on the frontend are described with a template instead of the LLM
+            elif fast_path:
+                convert_to_natural_language_output = {
+                    'reason': 'templated description of an action taken on the frontend',
+                    'description': describe_tool_call(tool, input['parameters'], input['output']),
+                }
+            else:
+                convert_to_natural_language_output = await self.describe_with_llm(messages, input, tool, tool_input_str, tool_output_str)
 
-            try:
-                response = await self.llm_client.chat.completions.create(
-                    model=self.llm_model_id,
-                    messages=input_messages,
-                    temperature=0.9,
-                    response_format={ "type": "json_object" },
-                )
-                convert_to_natural_language_output = json.loads(response.choices[0].message.content)
-            except openai.BadRequestError as e:
-                if e.code == 'json_validate_failed':
-                    convert_to_natural_language_output = await json_fixer(e.response.json()['error']['failed_generation'])
-                else:
-                    raise e
-
-            logger.info(f"ConvertNaturalLanguage output: {convert_to_natural_language_output}")
-
-            tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
-            tool_output_cache.append({
+            log_payload(logger, self.id, 'output', output=convert_to_natural_language_output)
+
+            memory = Memory.of(input.get('memory')).append('tool-output-cache', {
                 'tool': tool,
                 'input': tool_input_str,
                 'output': tool_output_str,
                 'description': convert_to_natural_language_output.get('description', ''),
             })
-            logger.info(f"ConvertNaturalLanguage tool_output_cache: {tool_output_cache}")
-
-            memory = input.get('memory', {})
-            memory['tool-output-cache'] = tool_output_cache
-            logger.info(f"ConvertNaturalLanguage memory: {memory}")
+            log_payload(logger, self.id, 'memory', memory=memory)
 
             await asyncio.sleep(0)
             yield {
@@ -149,6 +129,8 @@ class ConvertNaturalLanguage(Node):
                 'reason': convert_to_natural_language_output.get('reason', ''),
                 'tool': input.get('tool', ''),
                 'output': convert_to_natural_language_output.get('description', ''),
+                'fast-path': fast_path,
+                'tool_output': input['output'],
                 'memory': memory
             }
 
@@ -157,8 +139,61 @@ class ConvertNaturalLanguage(Node):
             logger.exception(f"An error occurred in ConvertNaturalLanguage")
             raise e
 
+    async def describe_with_llm(self, messages: list, input: dict, tool: str, tool_input_str: str, tool_output_str: str) -> dict:
+        # retrieve all tool calls which have been made
+        tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
+
+        # render the conversation and tool call cache, shared by every node of this turn
+        conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
+
+        # add the tool information and the conversation to the system prompt
+        single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(
+            tool=tool,
+            tool_output=tool_output_str,
+            tool_input=tool_input_str,
+            conversation=conversation,
+        )
+
+        # create the messages format
+        input_messages = [
+            {
+                "role": "system",
+                "content": single_system_prompt
+            }
+        ]
+        input_messages.append({
+            "role": "user",
+            "content": '<awaiting your next JSON response>'
+        })
+
+        try:
+            response = await self.llm_client.chat.completions.create(
+                node=self.id,
+                model=self.llm_model_id,
+                messages=input_messages,
+                temperature=0.9,
+                response_format=OUTPUT_SCHEMA.response_format(),
+            )
+            record_llm_usage(self.id, response)
+            generation = response.choices[0].message.content
+        except openai.BadRequestError as e:
+            if e.code == 'json_validate_failed':
+                generation = e.response.json()['error']['failed_generation']
+            else:
+                raise e
+        convert_to_natural_language_output = await OUTPUT_SCHEMA.parse(self.id, generation)
+        return convert_to_natural_language_output
+
     async def get_successors(self, result: dict):
         successors = []
+        if result.get('fast-path', False):
+            if frontend_action_acknowledgement:
+                successors.append(("CustomerResponse", {
+                    'acknowledgement': acknowledge_tool_call(result.get('tool', ''), result.get('tool_output', '')),
+                    'memory': result.get('memory', {})
+                }))
+            return successors
+
         successors.append(("Routing", {
             'cnl_output': {
                 'tool': result.get('tool', ''),
@@ -2,18 +2,25 @@ from ..base import Node
 import os
 import asyncio
 import logging
-import json
 import asyncio
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
 import openai
-from agent.config import store_info, customer_service_task
+from agent.utils.payload_logging import log_payload
+from agent.config import store_info, customer_service_task, customer_response_streaming
+from agent.utils.streaming import JsonStringFieldExtractor, SentenceChunker
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -84,12 +91,17 @@ will result in a penalty.
 
 SYSTEM_PROMPT = SYSTEM_PROMPT.replace('{store_info}', store_info).replace('{customer_service_task}', customer_service_task)
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('customer_response', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'response': {'type': 'string'},
+    },
+    'required': ['reason', 'response'],
+})
 
 
 class CustomerResponse(Node):
@@ -101,26 +113,28 @@ class CustomerResponse(Node):
     @observability_decorator('CustomerResponse')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"CustomerResponse processing messages: {messages}")
-
-            # make a single system prompt which has the conversation if needed
-            single_system_prompt = SYSTEM_PROMPT
-            
+            log_payload(logger, self.id, 'processing', messages=messages)
+
+            # actions taken on the frontend are acknowledged with a template
+            if input.get('acknowledgement'):
+                await asyncio.sleep(0)
+                yield {
+                    'node': self.id,
+                    'reason': 'templated acknowledgement of an action taken on the frontend',
+                    'output': input['acknowledgement'],
+                    'memory': input.get('memory', {})
+                }
+                logger.info("CustomerResponse finished processing")
+                return
 
-            # retrieve all tool calls which have been made and make the string if there are any
+            # retrieve all tool calls which have been made
             tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
 
-            # create the conversation variable
-            conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-            # add tool call cache to the conversation if it exists
-            if len(tool_output_cache) > 0:
-                tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                conversation += single_tool_cache_prompt
+            # render the conversation and tool call cache, shared by every node of this turn
+            conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
 
             # add the conversation to the system prompt
-            single_system_prompt = single_system_prompt.replace('{conversation}', conversation)
+            single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
 
             # create the messages format
             input_messages = [
@@ -134,20 +148,30 @@ class CustomerResponse(Node):
                 "content": '<awaiting your next JSON response>'
             })
 
+            # stream sentence sized chunks so text to speech can start while the model is generating
+            if customer_response_streaming:
+                async for result in self.stream_response(input_messages, input):
+                    yield result
+                logger.info("CustomerResponse finished processing")
+                return
+
             # call the LLM
             try:
                 response = await self.llm_client.chat.completions.create(
+                    node=self.id,
                     model=self.llm_model_id,
                     messages=input_messages,
                     temperature=0.9,
-                    response_format={ "type": "json_object" },
+                    response_format=OUTPUT_SCHEMA.response_format(),
                 )
-                customer_response_output = json.loads(response.choices[0].message.content)
+                record_llm_usage(self.id, response)
+                generation = response.choices[0].message.content
             except openai.BadRequestError as e:
                 if e.code == 'json_validate_failed':
-                    customer_response_output = await json_fixer(e.response.json()['error']['failed_generation'])
+                    generation = e.response.json()['error']['failed_generation']
                 else:
                     raise e
+            customer_response_output = await OUTPUT_SCHEMA.parse(self.id, generation)
 
             await asyncio.sleep(0)
             yield {
@@ -161,5 +185,60 @@ class CustomerResponse(Node):
             logger.exception(f"An error occurred in CustomerResponse")
             raise e
 
+    async def stream_response(self, input_messages: list, input: dict):
+        """Yields the 'response' field of the streamed JSON completion one sentence at a time.
+
+        Every chunk result carries the new text in 'output', the text streamed so far in
+        'response' and 'final' set on the last result, which also holds the full 'reason'.
+        """
+        extractor = JsonStringFieldExtractor('response')
+        chunker = SentenceChunker()
+        completion = []
+
+        # JSON mode is not available for streamed completions on every provider, the prompt enforces JSON
+        stream = await self.llm_client.chat.completions.create(
+            node=self.id,
+            model=self.llm_model_id,
+            messages=input_messages,
+            temperature=0.9,
+            stream=True,
+            # OpenAI compatible providers only report the usage of a streamed completion when asked
+            stream_options={'include_usage': True},
+        )
+        async for chunk in stream:
+            # the usage comes with the last chunk, which has no choices
+            record_llm_usage(self.id, chunk)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ''
+            completion.append(delta)
+            for sentence in chunker.feed(extractor.feed(delta)):
+                yield {
+                    'node': self.id,
+                    'reason': '',
+                    'output': sentence,
+                    'response': extractor.value,
+                    'final': False,
+                    'memory': input.get('memory', {})
+                }
+
+        # parse the whole completion to recover the reason and any response the extractor missed
+        completion = ''.join(completion)
+        customer_response_output = await OUTPUT_SCHEMA.parse(self.id, completion)
+        remaining = chunker.flush()
+        response = extractor.value
+        if not extractor.done and not response:
+            response = customer_response_output.get('response', '')
+            remaining = response
+
+        yield {
+            'node': self.id,
+            'reason': customer_response_output.get('reason', ''),
+            'output': remaining,
+            'response': response,
+            'final': True,
+            'memory': input.get('memory', {})
+        }
+
     async def get_successors(self, result: dict):
         return []
@@ -3,8 +3,11 @@ import asyncio
 import logging
 import json
 from agent.config import tools_dict, tool_param_desc
+from agent.tools.runner import run_tool
+from agent.tools.descriptions import tool_call_failed
 from agent_framework import observability_decorator
 import copy
+from agent.utils.payload_logging import log_payload
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -17,15 +20,25 @@ class ExecuteTool(Node):
     @observability_decorator('ExecuteTool')
     async def process(self, messages: list, input: dict, context=None):
         try:
-            logger.info(f"ExecuteTool is executing input {input}")
+            log_payload(logger, self.id, 'processing', input=input)
             tool = input.get('tool','')
             tool_arguments = input.get('parameters',{})
-            tool_response = tools_dict[tool].call(**tool_arguments)
-            
+            fast_path = input.get('fast-path', False)
+            failed = False
             try:
-                tool_call_output = json.loads(tool_response.content)
-            except json.JSONDecodeError:
-                tool_call_output = tool_response.content
+                tool_response = await run_tool(tool, tool_arguments)
+                try:
+                    tool_call_output = json.loads(tool_response.content)
+                except json.JSONDecodeError:
+                    tool_call_output = tool_response.content
+                failed = tool_call_failed(tool, tool_call_output)
+            except Exception as e:
+                # a failed frontend action is handed to the full reasoning path instead of ending the turn
+                if not fast_path:
+                    raise e
+                logger.warning(f"Tool {tool} failed on the fast path, falling back to full reasoning: {e}")
+                tool_call_output = f"The tool {tool} failed with: {e}"
+                failed = True
 
             await asyncio.sleep(0)
             yield {
@@ -34,9 +47,11 @@ class ExecuteTool(Node):
                 'output': tool_call_output,
                 'tool': input['tool'],
                 'parameters': input.get('parameters', {}),
+                'fast-path': fast_path,
+                'failed': failed,
                 'memory': input.get('memory', {})
             }
-            logger.info(f"ExecuteTool finished processing Tool output: {tool_call_output}")
+            log_payload(logger, self.id, 'output', tool_output=tool_call_output)
         except Exception as e:
             logger.exception(f"An error occurred in ExecuteTool")
             raise e
@@ -44,10 +59,14 @@ class ExecuteTool(Node):
     async def get_successors(self, result: dict):
         successors = []
         
-        # output has to be copied to avoid overwriting in memory
         output = result.get('output', '')
+        fast_path = result.get('fast-path', False)
+        failed = result.get('failed', False)
 
-        if result.get('tool', '') in [
+        # a failed frontend action has no widget, its failure is explained by the full reasoning path
+        if fast_path and failed:
+            pass
+        elif result.get('tool', '') in [
             'get_products',
             'get_product_details',
             'add_item_to_cart',
@@ -56,17 +75,19 @@ class ExecuteTool(Node):
             'submit_cart_for_order',
             'get_order_status',
         ]:
-            successors.append(("Widget", copy.deepcopy({
-                'output': output,
+            # the widget adds images to the tool output, so it gets its own copy; memory is immutable and shared
+            successors.append(("Widget", {
+                'output': copy.deepcopy(output),
                 'tool': result.get('tool',''),
                 'parameters': result.get('parameters',{}),
                 'memory': result.get('memory', {}),
-            })))
+            }))
         
-        successors.append(("ConvertNaturalLanguage", copy.deepcopy({
+        successors.append(("ConvertNaturalLanguage", {
             'output': output,
             'tool': result.get('tool',''),
             'parameters': result.get('parameters',{}),
+            'fast-path': fast_path and not failed,
             'memory': result.get('memory', {}),
-        })))
+        }))
         return successors
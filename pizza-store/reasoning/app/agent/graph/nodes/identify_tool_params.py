@@ -1,19 +1,24 @@
 from ..base import Node
 import os
 import logging
-import json
 import asyncio
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
 from agent.config import tools_dict, tool_param_desc
 import openai
-from pprint import pformat
+from agent.utils.payload_logging import log_payload
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -46,12 +51,17 @@ For example, if the parameters required to identify are "product_id: int" and "p
 - Incorrect: { "product_id": [5, 10, 15], "product_name": "Pizza" }
 '''
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['parameters', 'tool', 'reason', 'conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('identify_tool_params', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'parameters': {'type': 'object'},
+    },
+    'required': ['reason', 'parameters'],
+})
 
 
 class IdentifyToolParams(Node):
@@ -64,30 +74,28 @@ class IdentifyToolParams(Node):
     @observability_decorator('IdentifyToolParams')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"IdentifyToolParams for tool {input} processing messages: {messages}")
+            log_payload(logger, self.id, 'processing', input=input, messages=messages)
 
             tool = input.get('tool', '')
             reason = input.get('reason', 'No reason provided')  # Get the reason from input
 
             if len(tool_param_desc[tool].items()) > 0:
                 tool_param_desc_str = ''.join([f"{v}\n" for k, v in tool_param_desc[tool].items()]) or 'no parameters required'
-                single_system_prompt = SYSTEM_PROMPT.replace('{parameters}', tool_param_desc_str).replace('{tool}', tool).replace('{reason}', reason)
                 
-                # retrieve all tool calls which have been made and make the string if there are any
+                # retrieve all tool calls which have been made
                 tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
 
-                # create the conversation variable
-                conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-                # add tool call cache to the conversation if it exists
-                if len(tool_output_cache) > 0:
-                    tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                    single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                    conversation += single_tool_cache_prompt
+                # render the conversation and tool call cache, shared by every node of this turn
+                conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
 
-                # add the conversation to the system prompt
-                single_system_prompt = single_system_prompt.replace('{conversation}', conversation)
-                logger.info(f"single_system_prompt: {single_system_prompt}")
+                # add the parameters, tool, reason and conversation to the system prompt
+                single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(
+                    parameters=tool_param_desc_str,
+                    tool=tool,
+                    reason=reason,
+                    conversation=conversation,
+                )
+                log_payload(logger, self.id, 'prompt', system_prompt=single_system_prompt)
 
                 # create the messages format
                 input_messages = [
@@ -103,20 +111,23 @@ class IdentifyToolParams(Node):
 
                 try:
                     response = await self.llm_client.chat.completions.create(
+                        node=self.id,
                         model=self.llm_model_id,
                         messages=input_messages,
                         temperature=0.9,
-                        response_format={ "type": "json_object" },
+                        response_format=OUTPUT_SCHEMA.response_format(),
                     )
-                    identify_tool_params_output = json.loads(response.choices[0].message.content)
+                    record_llm_usage(self.id, response)
+                    generation = response.choices[0].message.content
                 except openai.BadRequestError as e:
                     if e.code == 'json_validate_failed':
-                        identify_tool_params_output = await json_fixer(e.response.json()['error']['failed_generation'])
+                        generation = e.response.json()['error']['failed_generation']
                     else:
                         raise e
+                identify_tool_params_output = await OUTPUT_SCHEMA.parse(self.id, generation)
             else:
                 identify_tool_params_output = {}
-            logger.info(f"IdentifyToolParams output: {identify_tool_params_output}")
+            log_payload(logger, self.id, 'output', output=identify_tool_params_output)
 
             await asyncio.sleep(0)
             yield {
@@ -1,21 +1,27 @@
 from ..base import Node
+from ..memory import Memory
 from datetime import datetime
 import os
 import logging
 import asyncio
-import json
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
 from agent.config import tools_dict, tool_param_desc
-from agent.config import store_info, customer_service_task
+from agent.config import store_info, customer_service_task, tool_choice_node
 import openai
-import copy
+from agent.utils.payload_logging import log_payload
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -57,12 +63,17 @@ Whenever a customer is asking questions about something in the shop, you should
 '''.replace('{tools}','\n'.join([f"{tool}({', '.join([f'{desc}' for param, desc in tool_param_desc[tool].items()])})" for tool in tools_dict.keys()]) )
 SYSTEM_PROMPT = SYSTEM_PROMPT.replace('{store_info}', store_info).replace('{customer_service_task}', customer_service_task)
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('routing', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'next-action': {'type': 'string', 'enum': ['call-tool', 'respond-to-customer']},
+    },
+    'required': ['reason', 'next-action'],
+})
 
 class Routing(Node):
     def __init__(self, name, attributes):
@@ -73,26 +84,16 @@ class Routing(Node):
     @observability_decorator('Routing')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"Router processing messages: {messages}")
-            logger.info(f"Router processing input: {input}")
+            log_payload(logger, self.id, 'processing', messages=messages, input=input)
 
-            # make a copy of the system prompt
-            single_system_prompt = SYSTEM_PROMPT
-
-            # retrieve all tool calls which have been made and make the string if there are any
+            # retrieve all tool calls which have been made
             tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
 
-            # create the conversation variable
-            conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-            # add tool call cache to the conversation if it exists
-            if len(tool_output_cache) > 0:
-                tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                conversation += single_tool_cache_prompt
+            # render the conversation and tool call cache, shared by every node of this turn
+            conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
 
             # add the conversation to the system prompt
-            single_system_prompt = single_system_prompt.replace('{conversation}', conversation)
+            single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
 
             # create the messages format
             input_messages = [
@@ -108,18 +109,21 @@ class Routing(Node):
 
             try:
                 response = await self.llm_client.chat.completions.create(
+                    node=self.id,
                     model=self.llm_model_id,
                     messages=input_messages,
                     temperature=0.9,
-                    response_format={ "type": "json_object" },
+                    response_format=OUTPUT_SCHEMA.response_format(),
                 )
-                routing_output = json.loads(response.choices[0].message.content)
+                record_llm_usage(self.id, response)
+                generation = response.choices[0].message.content
             except openai.BadRequestError as e:
                 if e.code == 'json_validate_failed':
-                    routing_output = await json_fixer(e.response.json()['error']['failed_generation'])
+                    generation = e.response.json()['error']['failed_generation']
                 else:
                     raise e
-            logger.info(f"Routing output: {routing_output}")
+            routing_output = await OUTPUT_SCHEMA.parse(self.id, generation)
+            log_payload(logger, self.id, 'output', output=routing_output)
 
             await asyncio.sleep(0)
             yield {
@@ -133,29 +137,32 @@ class Routing(Node):
             logger.exception(f"An error occurred in Routing")
             raise e
 
+    async def speculate(self, input: dict):
+        # most turns call a tool, so the tool choice can start while routing is still deciding
+        return [(tool_choice_node, {
+            'memory': input.get('memory', {})
+        })]
+
     async def get_successors(self, result: dict):
         successors = []
         next_action = result.get('output', [])
-        memory = result.get('memory', {})
+        memory = Memory.of(result.get('memory'))
 
         if 'respond-to-customer' in next_action:
-            successors.append(("CustomerResponse", copy.deepcopy({
+            successors.append(("CustomerResponse", {
                 'memory': memory
-            })))
+            }))
         
         # when a tool is called, we need to tell the customer that we are working on their request
         tool_output_cache = memory.get('tool-output-cache', [])
-        if len(tool_output_cache) == 0:
-            memory['task-description-to-customer'] = True
-        else:
-            memory['task-description-to-customer'] = False
+        memory = memory.set('task-description-to-customer', len(tool_output_cache) == 0)
 
         if 'call-tool' in next_action:
-            successors.append(("TaskDescriptionResponse", copy.deepcopy({
+            successors.append(("TaskDescriptionResponse", {
                 'memory': memory
-            })))
-            successors.append(("ChooseTool", copy.deepcopy({
+            }))
+            successors.append((tool_choice_node, {
                 'memory': memory
-            })))
+            }))
         
         return successors
\ No newline at end of file
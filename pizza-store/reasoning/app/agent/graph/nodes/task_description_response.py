@@ -2,10 +2,16 @@ from ..base import Node
 import os
 import asyncio
 import logging
-import json
-from agent_framework import observability_decorator, initialize_async_llm_client, json_fixer
+from agent_framework import observability_decorator
+from agent.utils.prompts import PromptTemplate, get_turn_prompt
+from agent.utils.llm_gateway import get_llm_gateway
+from agent.utils.usage import record_llm_usage
+from agent.utils.json_output import OutputSchema
+from agent.utils.compaction import conversation_token_budget
+from agent.config import prompt_layout
 from agent.config import tools_dict, tool_param_desc
 import openai
+from agent.utils.payload_logging import log_payload
 from datetime import datetime, timedelta
 
 # Configure logger
@@ -13,7 +19,7 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # set up llm
-LLM_CLIENT = initialize_async_llm_client()
+LLM_CLIENT = get_llm_gateway()
 LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID', '')
 
 SYSTEM_PROMPT = '''\
@@ -55,12 +61,17 @@ If tool calls have been made, use this information to make your response more sp
 without revealing exact details of the operations being performed.
 '''.replace('{tools}','\n'.join([f"{tool}({', '.join([f'{desc}' for param, desc in tool_param_desc[tool].items()])})" for tool in tools_dict.keys()]) )
 
-TOOL_CACHE_PROMPT = '''
-assistant:
-### Tools Used Before Responding to Customer
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'], layout=prompt_layout)
 
-{tool_output_cache}
-'''
+# the keys the node reads from the JSON output of the LLM
+OUTPUT_SCHEMA = OutputSchema('task_description_response', {
+    'type': 'object',
+    'properties': {
+        'reason': {'type': 'string'},
+        'response': {'type': 'string'},
+    },
+    'required': ['reason', 'response'],
+})
 
 class TaskDescriptionResponse(Node):
     def __init__(self, name, attributes):
@@ -71,31 +82,22 @@ class TaskDescriptionResponse(Node):
     @observability_decorator('TaskDescriptionResponse')
     async def process(self, messages: list, input: dict):
         try:
-            logger.info(f"TaskDescriptionResponse processing messages: {messages}")
+            log_payload(logger, self.id, 'processing', messages=messages)
 
             should_proceed = input.get('memory', {}).get('task-description-to-customer', False)
             if not should_proceed:
-                logger.info(f"TaskDescriptionResponse not responding to customer based on memory: {input.get('memory', {})}")
+                log_payload(logger, self.id, 'not responding', memory=input.get('memory', {}))
                 return
-            logger.info(f"TaskDescriptionResponse responding to customer based on memory: {input.get('memory', {})}")
+            log_payload(logger, self.id, 'responding', memory=input.get('memory', {}))
 
-            # start with a blank system prompt
-            single_system_prompt = SYSTEM_PROMPT
-
-            # retrieve all tool calls which have been made and make the string if there are any
+            # retrieve all tool calls which have been made
             tool_output_cache = input.get('memory', {}).get('tool-output-cache', [])
 
-            # create the conversation variable
-            conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
-
-            # add tool call cache to the conversation if it exists
-            if len(tool_output_cache) > 0:
-                tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
-                single_tool_cache_prompt = TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
-                conversation += single_tool_cache_prompt
+            # render the conversation and tool call cache, shared by every node of this turn
+            conversation = get_turn_prompt(messages).conversation(tool_output_cache, conversation_token_budget(self.id))
 
             # add the conversation to the system prompt
-            single_system_prompt = single_system_prompt.replace('{conversation}', conversation)
+            single_system_prompt = SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
 
             # create the messages format
             input_messages = [
@@ -112,17 +114,20 @@ class TaskDescriptionResponse(Node):
 
             try:
                 response = await self.llm_client.chat.completions.create(
+                    node=self.id,
                     model=self.llm_model_id,
                     messages=input_messages,
                     temperature=0.7,
-                    response_format={ "type": "json_object" },
+                    response_format=OUTPUT_SCHEMA.response_format(),
                 )
-                task_description_output = json.loads(response.choices[0].message.content)
+                record_llm_usage(self.id, response)
+                generation = response.choices[0].message.content
             except openai.BadRequestError as e:
                 if e.code == 'json_validate_failed':
-                    task_description_output = await json_fixer(e.response.json()['error']['failed_generation'])
+                    generation = e.response.json()['error']['failed_generation']
                 else:
                     raise e
+            task_description_output = await OUTPUT_SCHEMA.parse(self.id, generation)
 
             await asyncio.sleep(0)
             yield {
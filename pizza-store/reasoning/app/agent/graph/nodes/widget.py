@@ -1,7 +1,6 @@
 from ..base import Node
 import logging
 import os
-import json
 from agent_framework import observability_decorator
 from agent.utils.shopify import (
     populate_images_for_product_list,
@@ -13,13 +12,13 @@ from agent.utils.shopify import (
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def match_widget_to_tool(tool, tool_output):
+async def match_widget_to_tool(tool, tool_output):
     widget_output = {}
     if tool == 'get_products':
-        tool_output = populate_images_for_product_list(tool_output)
+        tool_output = await populate_images_for_product_list(tool_output)
         widget_output = {
             'type': 'shopify-product-list',
-            'details': json.dumps(tool_output),
+            'details': tool_output,
             'available-tools': [
                 {
                     'tool': 'get_product_details',
@@ -30,10 +29,10 @@ def match_widget_to_tool(tool, tool_output):
             ]
         }
     elif tool == 'get_product_details':
-        tool_output = populate_images_for_product_details(tool_output)
+        tool_output = await populate_images_for_product_details(tool_output)
         widget_output = {
             'type': 'shopify-product-details',
-            'details': json.dumps(tool_output),
+            'details': tool_output,
             'available-tools': [
                 {
                     'tool': 'add_item_to_cart',
@@ -44,10 +43,10 @@ def match_widget_to_tool(tool, tool_output):
             ]
         }
     elif tool in ['add_item_to_cart', 'delete_item_from_cart', 'get_cart_summary']:
-        tool_output = populate_images_for_cart_summary(tool_output)
+        tool_output = await populate_images_for_cart_summary(tool_output)
         widget_output = {
             'type': 'shopify-cart-summary',
-            'details': json.dumps(tool_output),
+            'details': tool_output,
             'available-tools': [
                 {
                     'tool': 'submit_cart_for_order',
@@ -65,10 +64,10 @@ def match_widget_to_tool(tool, tool_output):
                     'confirmation_link': f'https://shopify.com/{os.getenv("SHOPIFY_SHOP_GID")}/account/orders/{confirmation_number}',
                 }
             else:
-                widget_details = tool_output
+                widget_details = {'message': tool_output}
             widget_output = {
                 'type': 'shopify-order-confirmation',
-                'details': json.dumps(widget_details),
+                'details': widget_details,
                 'available-tools': [
                     {
                         'tool': 'get_order_status',
@@ -88,10 +87,10 @@ def match_widget_to_tool(tool, tool_output):
                     'confirmation_link': f'https://shopify.com/{os.getenv("SHOPIFY_SHOP_GID")}/account/orders/{confirmation_number}',
                 }
             else:
-                widget_details = tool_output
+                widget_details = {'message': tool_output}
             widget_output = {
                 'type': 'shopify-order-status',
-                'details': json.dumps(widget_details),
+                'details': widget_details,
             }
         except Exception as e:
             logger.exception(f"An error occurred in match_widget_to_tool: {e}")
@@ -111,7 +110,7 @@ class Widget(Node):
             memory = input.get('memory', {})
 
             # Create the output similar to the data object
-            widget_output = match_widget_to_tool(tool, tool_output)
+            widget_output = await match_widget_to_tool(tool, tool_output)
             full_output = {
                 'node': self.id,
                 'reason': "hard coded widget creation",
@@ -0,0 +1,132 @@
+import json
+import logging
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# tools whose successful output is a JSON object, any other output means the call failed
+JSON_OUTPUT_TOOLS = [
+    'get_products',
+    'get_product_details',
+    'add_item_to_cart',
+    'delete_item_from_cart',
+    'get_cart_summary',
+]
+
+# spoken to the customer after an action taken on the frontend
+ACKNOWLEDGEMENTS = {
+    'get_products': "Here's everything we have on the menu right now.",
+    'get_product_details': "Here are the details and options for that item.",
+    'add_item_to_cart': "Done, I've added that to your cart.",
+    'delete_item_from_cart': "Done, I've taken that out of your cart.",
+    'get_cart_summary': "Here's what's in your cart right now.",
+    'submit_cart_for_order': "Your order has been placed, the confirmation number is on your screen.",
+    'get_order_status': "Your order is confirmed and being processed.",
+}
+
+# the order widget shows the confirmation number, other outputs of these tools are spoken as they are
+ORDER_TOOLS = ['submit_cart_for_order', 'get_order_status']
+
+
+# renderers turning the output of a tool into the description kept in the tool output cache
+DESCRIPTION_RENDERERS = {}
+
+
+def description_renderer(*tools):
+    """Registers a function rendering the description of a tool call from its parameters and output."""
+    def decorator(func):
+        for tool in tools:
+            DESCRIPTION_RENDERERS[tool] = func
+        return func
+    return decorator
+
+
+def format_parameters(parameters: dict) -> str:
+    if not parameters:
+        return ''
+    return ' with ' + ' and '.join(f"{name} {value}" for name, value in parameters.items())
+
+
+@description_renderer('get_products')
+def describe_products(tool: str, parameters: dict, output: dict) -> str:
+    products = [
+        f"{product['product_title']} (product_id {product['product_id']}"
+        + (f", options: {', '.join(option['option_title'] for option in product['options'])})" if product['options'] else ')')
+        for product in output.values()
+    ]
+    if not products:
+        return f"Calling {tool} returned no products."
+    return f"Calling {tool} returned {len(products)} products: {'; '.join(products)}."
+
+
+@description_renderer('get_product_details')
+def describe_product_details(tool: str, parameters: dict, output: dict) -> str:
+    variants = [
+        f"{variant['variant_name']} (variant_id {variant['variant_id']}, price {variant['price']}, "
+        f"SKU {variant['product_variant_sku'] or 'none'})"
+        for variant in output['product_variants']
+    ]
+    return (
+        f"Calling {tool}{format_parameters(parameters)} returned the product {output['product_title']} "
+        f"(product_id {output['product_id']}) with {len(variants)} variants: {'; '.join(variants)}."
+    )
+
+
+@description_renderer('add_item_to_cart', 'delete_item_from_cart', 'get_cart_summary')
+def describe_cart_summary(tool: str, parameters: dict, output: dict) -> str:
+    cart_summary = output['cart_summary']
+    if not cart_summary['line_items']:
+        return f"Calling {tool}{format_parameters(parameters)} returned the cart summary. The cart is empty."
+    line_items = [
+        f"{item['quantity']} x {item['name']}"
+        + (f" - {item['variant_title']}" if item.get('variant_title') else '')
+        + f" (variant_id {item['variant_id']}, product_id {item['product_id']}, price {item['price']}, "
+        f"SKU {item['item_variant_sku'] or 'none'})"
+        for item in cart_summary['line_items']
+    ]
+    return (
+        f"Calling {tool}{format_parameters(parameters)} returned the cart summary. The cart has a total price of "
+        f"{cart_summary['total_price']} and contains: {'; '.join(line_items)}."
+    )
+
+
+@description_renderer('submit_cart_for_order', 'get_order_status')
+def describe_message(tool: str, parameters: dict, output: str) -> str:
+    return f"Calling {tool}{format_parameters(parameters)} returned: {output}"
+
+
+def render_tool_description(tool: str, parameters: dict, output):
+    """Renders the description of a tool call with its registered renderer.
+
+    Returns None when the tool has no renderer or its output does not have the expected
+    shape, the description then has to be written by the LLM.
+    """
+    renderer = DESCRIPTION_RENDERERS.get(tool)
+    if renderer is None or tool_call_failed(tool, output):
+        return None
+    try:
+        return renderer(tool, parameters, output)
+    except (KeyError, TypeError, AttributeError):
+        logger.warning(f"Unexpected output of {tool}, describing it with the LLM")
+        return None
+
+
+def tool_call_failed(tool: str, output) -> bool:
+    """Returns True when a tool returned a message instead of its regular output."""
+    return tool in JSON_OUTPUT_TOOLS and not isinstance(output, dict)
+
+
+def describe_tool_call(tool: str, parameters: dict, output) -> str:
+    """Describes a tool call for the tool output cache without an LLM call.
+
+    The input and output are copied verbatim, so every id stays exact.
+    """
+    output_str = output if isinstance(output, str) else json.dumps(output)
+    return f"Calling {tool} with input {json.dumps(parameters)} returned {output_str}"
+
+
+def acknowledge_tool_call(tool: str, output) -> str:
+    if tool in ORDER_TOOLS and isinstance(output, str) and 'confirmation number' not in output:
+        return output
+    return ACKNOWLEDGEMENTS.get(tool, "Done.")
@@ -0,0 +1,68 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent.config import (
+    tools_dict,
+    tool_thread_pool_size,
+    tool_default_concurrency,
+    tool_concurrency_limits,
+    tool_default_timeout,
+    tool_timeouts,
+)
+from agent.utils.timings import record_tool_call
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# the tools make blocking HTTP calls, so they run on a bounded pool instead of the event loop
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=tool_thread_pool_size, thread_name_prefix='tool')
+
+_tool_semaphores = {}
+
+
+class ToolTimeoutError(Exception):
+    pass
+
+
+def _get_semaphore(tool: str) -> asyncio.Semaphore:
+    if tool not in _tool_semaphores:
+        _tool_semaphores[tool] = asyncio.Semaphore(tool_concurrency_limits.get(tool, tool_default_concurrency))
+    return _tool_semaphores[tool]
+
+
+async def run_tool(tool: str, arguments: dict):
+    """Runs a tool on the tool thread pool without blocking the event loop.
+
+    The call runs in a copy of the current context, so `session_var` is available to the tool.
+    Tools update the session by mutating the session dict in place, which stays visible to the
+    caller. A tool which runs longer than its timeout raises ToolTimeoutError; its thread keeps
+    running in the background until the blocking call returns.
+
+    Args:
+    tool (str): The name of the tool in `tools_dict`.
+    arguments (dict): The keyword arguments of the tool.
+
+    Returns:
+    The output of the tool call.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    timeout = tool_timeouts.get(tool, tool_default_timeout)
+    start = time.perf_counter()
+
+    async with _get_semaphore(tool):
+        future = loop.run_in_executor(
+            TOOL_EXECUTOR,
+            functools.partial(context.run, tools_dict[tool].call, **arguments),
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Tool {tool} timed out after {timeout} seconds")
+            raise ToolTimeoutError(f"Tool {tool} did not finish within {timeout} seconds")
+        finally:
+            record_tool_call(tool, time.perf_counter() - start)
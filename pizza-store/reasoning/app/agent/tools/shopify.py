@@ -1,11 +1,11 @@
-import os
-import shopify
-from shopify.resources import LineItem
 from ..utils.shopify import (
-    init_shopify_connect,
     get_cart_summary_from_object,
     make_new_blank_cart,
+    get_draft_order,
+    update_draft_order_line_items,
 )
+from ..utils.shopify_client import get_shopify_client
+from ..utils.catalog import catalog
 from ..context_manager import session_var
 from agent_framework import observability_decorator
 from dotenv import load_dotenv
@@ -13,11 +13,6 @@ import json
 
 load_dotenv()
 
-SHOP = init_shopify_connect()
-API_KEY = os.environ.get('SHOPIFY_API_KEY', '')
-PASSWORD = os.environ.get('SHOPIFY_TOKEN', '')
-SHOP_NAME = os.environ.get('SHOPIFY_SHOP', '')
-
 @observability_decorator(name="get_products")
 def get_products():
     """
@@ -36,21 +31,21 @@ def get_products():
       - 'option_title' (str): The name of the product option. Examples might include Size, Flavor, Color, etc.
     """
     try:
-        products = shopify.Product.find()
+        products = catalog.get_products()
         product_dict = {}
         for product in products:
-            if product.status.lower() == 'active':
+            if product['status'].lower() == 'active':
                 product_dict_item = {
-                    'product_id': product.id,
-                    'product_title': product.title,
+                    'product_id': product['id'],
+                    'product_title': product['title'],
                     'options': []
                 }
-                for option in product.options:
+                for option in product['options']:
                     option_info = {
-                        'option_title': option.name,
+                        'option_title': option['name'],
                     }
                     product_dict_item['options'].append(option_info)
-                product_dict[str(product.id)] = product_dict_item
+                product_dict[str(product['id'])] = product_dict_item
         return json.dumps(product_dict)
     except Exception as e:
         raise e
@@ -81,22 +76,22 @@ def get_product_details(product_id: int):
       - 'product_variant_sku' (str): The SKU of the variant.
     """
     try:
-        product = shopify.Product.find(product_id)
+        product = catalog.get_product(product_id)
         if not product:
             return f"Product with ID {product_id} not found."
 
         product_item_details = {
-            'product_id': product.id,
-            'product_title': product.title,
+            'product_id': product['id'],
+            'product_title': product['title'],
             'product_variants': []
         }
 
-        for variant in product.variants:
+        for variant in product['variants']:
             variant_info = {
-                'variant_id': variant.id,
-                'variant_name': variant.title,
-                'price': variant.price,
-                'product_variant_sku': variant.sku,
+                'variant_id': variant['id'],
+                'variant_name': variant['title'],
+                'price': variant['price'],
+                'product_variant_sku': variant['sku'],
             }
             product_item_details['product_variants'].append(variant_info)
 
@@ -137,33 +132,22 @@ def add_item_to_cart(variant_id: int, quantity: int):
       - 'product_variant_sku' (str): The SKU of the product variant.
     """
     try:
-        shop_url = f"https://{API_KEY}:{PASSWORD}@{SHOP_NAME}.myshopify.com/admin"
-        session = shopify.Session(shop_url, '2024-04', PASSWORD)
-        shopify.ShopifyResource.activate_session(session)
-
         session_data = session_var.get()
         cart_id = session_data.get('cart_id')
 
         if 'cart_id' not in session_data.keys():
-            cart_id = make_new_blank_cart(variant_id, quantity)
+            cart = make_new_blank_cart(variant_id, quantity)
+            cart_id = cart['id']
             session_data['cart_id'] = cart_id
             print(f'No cart id was found in the session input. Creating a new cart id: {cart_id}')
-            cart = shopify.DraftOrder.find(cart_id)
-            cart.line_items = [{
-                "variant_id": variant_id,
-                "quantity": quantity,
-            }]
-            cart.save()
-            cart_id = cart.id
             session_var.set(session_data)
         else:
-            cart = shopify.DraftOrder.find(cart_id)
-            new_line_item = LineItem({
+            cart = get_draft_order(cart_id)
+            line_items = cart['line_items'] + [{
                 "variant_id": variant_id,
                 "quantity": quantity
-            })
-            cart.line_items.append(new_line_item)
-            cart.save()
+            }]
+            cart = update_draft_order_line_items(cart_id, line_items)
 
         summary = get_cart_summary_from_object(cart)
         return json.dumps(summary)
@@ -198,22 +182,18 @@ def delete_item_from_cart(variant_id: int):
       - 'product_variant_sku' (str): The SKU of the product variant.
     """
     try:
-        shop_url = f"https://{API_KEY}:{PASSWORD}@{SHOP_NAME}.myshopify.com/admin"
-        session = shopify.Session(shop_url, '2024-04', PASSWORD)
-        shopify.ShopifyResource.activate_session(session)
-
         session_data = session_var.get()
         cart_id = session_data.get('cart_id')
 
         if not cart_id:
             return "No cart exists to delete items from. Please add items to the cart first."
 
-        cart = shopify.DraftOrder.find(cart_id)
+        cart = get_draft_order(cart_id)
         
-        cart.line_items = [line_item for line_item in cart.line_items if line_item.variant_id != variant_id]
-        if not cart.line_items:
+        line_items = [line_item for line_item in cart['line_items'] if line_item['variant_id'] != variant_id]
+        if not line_items:
             # Delete the cart if it's empty
-            cart.destroy()
+            get_shopify_client().delete(f'draft_orders/{cart_id}.json')
             session_data = session_var.get()
             session_data.pop('cart_id', None)
             session_var.set(session_data)
@@ -225,7 +205,7 @@ def delete_item_from_cart(variant_id: int):
                     }   
             })
                                 
-        cart.save()
+        cart = update_draft_order_line_items(cart_id, line_items)
         summary = get_cart_summary_from_object(cart)
         return json.dumps(summary)
     except Exception as e:
@@ -264,7 +244,7 @@ def get_cart_summary():
             }
             return json.dumps(cart_summary)
 
-        cart = shopify.DraftOrder.find(cart_id)
+        cart = get_draft_order(cart_id)
         summary = get_cart_summary_from_object(cart)
         return json.dumps(summary)
     except Exception as e:
@@ -294,17 +274,16 @@ def submit_cart_for_order():
         if not cart_id:
             return "No cart exists to complete. Please add items to the cart first."
 
-        cart = shopify.DraftOrder.find(cart_id)
-        cart.complete()
-
         submitted_order_id = session_data.get('submitted_order_id')
         if submitted_order_id:
             return 'Your cart has already been submitted with confirmation number: ' + str(submitted_order_id)
 
-        session_data['submitted_order_id'] = cart.order_id
+        cart = get_shopify_client().put(f'draft_orders/{cart_id}/complete.json')['draft_order']
+
+        session_data['submitted_order_id'] = cart['order_id']
         session_var.set(session_data)
 
-        return 'Your cart has been submitted with confirmation number: ' + str(cart.order_id)
+        return 'Your cart has been submitted with confirmation number: ' + str(cart['order_id'])
     except Exception as e:
         raise e
 
@@ -329,8 +308,8 @@ def get_order_status():
         submitted_order_id = session_data.get('submitted_order_id')
 
         if submitted_order_id:
-            order = shopify.Order.find(submitted_order_id)
-            if not order.fulfillment_status:
+            order = get_shopify_client().get(f'orders/{submitted_order_id}.json')['order']
+            if not order.get('fulfillment_status'):
                 return 'The order is confirmed and being processed with confirmation number: ' + str(submitted_order_id)
             else:
                 return 'The order has been delivered.'
@@ -0,0 +1,220 @@
+import time
+import asyncio
+import logging
+import contextvars
+from dataclasses import dataclass
+from agent.config import cancellation_mode
+from .redis_pool import get_async_redis
+from .usage import usage_tracker
+from .metrics import registry
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+TASK_KEY_PREFIX = 'task-'
+# keyspace notifications of the task status keys, sent when the cancel endpoint sets 'cancelled'
+KEYSPACE_PATTERN = f'__keyspace@0__:{TASK_KEY_PREFIX}*'
+# publishers can also cancel a task directly by publishing on its channel
+CANCEL_CHANNEL_PREFIX = 'task-cancel:'
+# K: keyspace events, $: string commands, A: every command class (includes $)
+KEYSPACE_EVENT_FLAGS = 'K$'
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+@dataclass
+class CancellationStats:
+    cancellations: int = 0
+    llm_calls_cancelled: int = 0
+    # completion tokens the cancelled LLM calls would have generated, from the mean of their node
+    tokens_saved: int = 0
+    interrupt_latency_seconds_total: float = 0.0
+    interrupt_latency_seconds_max: float = 0.0
+
+    @property
+    def mean_interrupt_latency_seconds(self) -> float:
+        return self.interrupt_latency_seconds_total / self.cancellations if self.cancellations else 0.0
+
+
+cancellation_stats = CancellationStats()
+
+
+@registry.collector
+def cancellation_metrics():
+    yield 'xrx_cancellations_total', 'counter', 'Turns stopped by a cancellation.', [({}, cancellation_stats.cancellations)]
+    yield 'xrx_cancelled_llm_calls_total', 'counter', 'LLM calls stopped by a cancellation.', [({}, cancellation_stats.llm_calls_cancelled)]
+
+
+class TurnCancellation:
+    """Cancels the running tasks of a turn as soon as the turn is cancelled.
+
+    `watched` is set while the cancellation watcher receives the notifications of the task,
+    otherwise cancellation is only noticed by polling its status at node boundaries.
+    """
+
+    def __init__(self, task_id: str, tasks: set, on_cancel=None):
+        self.task_id = task_id
+        self.tasks = tasks
+        self.on_cancel = on_cancel
+        self.watched = False
+        self.cancelled = False
+        self.cancelled_at = None
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.cancelled_at = time.perf_counter()
+        logger.info(f"Task {self.task_id} was cancelled, stopping {len(self.tasks)} running tasks")
+        for task in list(self.tasks):
+            task.cancel()
+        if self.on_cancel is not None:
+            self.on_cancel()
+
+    def stopped(self):
+        """Records the time from the cancellation until every task of the turn has stopped."""
+        latency = time.perf_counter() - self.cancelled_at
+        cancellation_stats.cancellations += 1
+        cancellation_stats.interrupt_latency_seconds_total += latency
+        cancellation_stats.interrupt_latency_seconds_max = max(cancellation_stats.interrupt_latency_seconds_max, latency)
+        logger.info(
+            f"Task {self.task_id} stopped {latency * 1000:.1f} ms after its cancellation, "
+            f"{cancellation_stats.tokens_saved} LLM tokens saved by cancellations so far"
+        )
+
+
+turn_cancellation_var = contextvars.ContextVar('turn_cancellation', default=None)
+
+
+def record_cancelled_llm_call(node: str, generated_tokens: int = 0):
+    """Records an LLM call stopped by the cancellation of its turn."""
+    cancellation = turn_cancellation_var.get()
+    if cancellation is None or not cancellation.cancelled:
+        return
+    stats = usage_tracker.nodes.get(node)
+    expected = stats.completion_tokens / stats.calls if stats is not None and stats.calls else 0
+    cancellation_stats.llm_calls_cancelled += 1
+    cancellation_stats.tokens_saved += max(int(expected) - generated_tokens, 0)
+
+
+class CancellationWatcher:
+    """Receives the cancellations of every task of the process on one redis pub/sub connection.
+
+    The watcher subscribes to the task cancel channels and, once redis confirms the keyspace
+    notification flags, to the keyspace notifications of the task status keys. It starts with
+    the first turn and reconnects after a failure. Turns only stop polling their status while
+    the keyspace notifications are received, since the cancel endpoint only sets the status key.
+    """
+
+    def __init__(self):
+        self.turns = {}
+        self.connected = False
+        self._task = None
+        self._status_checks = set()
+
+    def register(self, cancellation: TurnCancellation):
+        self.turns[cancellation.task_id] = cancellation
+        cancellation.watched = self.connected
+        if self._task is None or self._task.done():
+            # the watcher outlives the turn starting it, so it must not keep that turn's context alive
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+        # the task may have been cancelled before it was registered, no notification is coming for that
+        check = asyncio.create_task(self._check_status(get_async_redis(), cancellation))
+        self._status_checks.add(check)
+        check.add_done_callback(self._status_checks.discard)
+
+    def unregister(self, cancellation: TurnCancellation):
+        if self.turns.get(cancellation.task_id) is cancellation:
+            del self.turns[cancellation.task_id]
+
+    async def _run(self):
+        redis_client = get_async_redis()
+        while self.turns:
+            pubsub = redis_client.pubsub()
+            try:
+                if await self._enable_keyspace_events(redis_client):
+                    await pubsub.psubscribe(KEYSPACE_PATTERN, CANCEL_CHANNEL_PREFIX + '*')
+                    self.connected = True
+                    for cancellation in list(self.turns.values()):
+                        cancellation.watched = True
+                        # catches cancellations set between the registration of the turn and the subscription
+                        await self._check_status(redis_client, cancellation)
+                else:
+                    # cancel channels still stop turns right away, the status keys are polled
+                    await pubsub.psubscribe(CANCEL_CHANNEL_PREFIX + '*')
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                    if message is not None:
+                        await self._dispatch(redis_client, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cancellation watcher lost its redis connection, polling until it reconnects")
+            finally:
+                self.connected = False
+                for cancellation in self.turns.values():
+                    cancellation.watched = False
+                await pubsub.aclose()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def _dispatch(self, redis_client, message: dict):
+        channel = message['channel'].decode('utf-8')
+        if channel.startswith(CANCEL_CHANNEL_PREFIX):
+            cancellation = self.turns.get(channel[len(CANCEL_CHANNEL_PREFIX):])
+            if cancellation is not None:
+                cancellation.cancel()
+            return
+
+        task_id = channel.split(':', 1)[1][len(TASK_KEY_PREFIX):]
+        cancellation = self.turns.get(task_id)
+        if cancellation is None or message['data'] != b'set':
+            return
+        await self._check_status(redis_client, cancellation)
+
+    async def _check_status(self, redis_client, cancellation: TurnCancellation):
+        try:
+            if await redis_client.get(TASK_KEY_PREFIX + cancellation.task_id) == b'cancelled':
+                cancellation.cancel()
+        except Exception:
+            logger.exception(f"Could not read the status of task {cancellation.task_id}")
+
+    async def _keyspace_flags(self, redis_client) -> str:
+        config = await redis_client.config_get('notify-keyspace-events')
+        flags = config.get('notify-keyspace-events', config.get(b'notify-keyspace-events', ''))
+        return flags.decode('utf-8') if isinstance(flags, bytes) else flags
+
+    async def _enable_keyspace_events(self, redis_client) -> bool:
+        """Returns whether redis sends the keyspace notifications of the task status keys."""
+        try:
+            flags = await self._keyspace_flags(redis_client)
+            if 'K' in flags and ('$' in flags or 'A' in flags):
+                return True
+            await redis_client.config_set('notify-keyspace-events', ''.join(sorted(set(flags + KEYSPACE_EVENT_FLAGS))))
+            # managed redis services can accept the command without applying it
+            flags = await self._keyspace_flags(redis_client)
+            if 'K' in flags and ('$' in flags or 'A' in flags):
+                logger.info("Enabled redis keyspace notifications for the task status keys")
+                return True
+        except Exception:
+            pass
+        logger.warning(
+            "Could not enable redis keyspace notifications, polling the task status keys. Start redis with "
+            f"--notify-keyspace-events {KEYSPACE_EVENT_FLAGS} or publish cancellations on {CANCEL_CHANNEL_PREFIX}<task id>"
+        )
+        return False
+
+
+cancellation_watcher = CancellationWatcher()
+
+
+def start_turn_cancellation(task_id: str, tasks: set, on_cancel=None) -> TurnCancellation:
+    """Starts watching a turn for cancellation, tasks started afterwards can check it."""
+    cancellation = TurnCancellation(task_id, tasks, on_cancel)
+    if cancellation_mode == 'push' and task_id:
+        cancellation_watcher.register(cancellation)
+    turn_cancellation_var.set(cancellation)
+    return cancellation
+
+
+def stop_turn_cancellation(cancellation: TurnCancellation):
+    cancellation_watcher.unregister(cancellation)
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+import redis
+from dotenv import load_dotenv
+from .shopify_client import get_shopify_client, ShopifyAPIError
+from .metrics import registry
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'true').lower() == 'true'
+CATALOG_TTL_SECONDS = float(os.getenv('CATALOG_TTL_SECONDS', '300'))
+# snapshots older than this are refreshed in the background while still being served
+CATALOG_REFRESH_AFTER_SECONDS = float(os.getenv('CATALOG_REFRESH_AFTER_SECONDS', str(CATALOG_TTL_SECONDS * 0.8)))
+# share snapshots between reasoning processes through redis
+CATALOG_REDIS_SHARED = os.getenv('CATALOG_REDIS_SHARED', 'false').lower() == 'true'
+CATALOG_REDIS_KEY = 'catalog-snapshot'
+
+redis_host = os.getenv('REDIS_HOST', 'localhost')
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    products: dict
+    fetched_at: float
+    version: str
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    @classmethod
+    def from_products(cls, products: list, fetched_at: float = None):
+        payload = json.dumps(products, sort_keys=True)
+        return cls(
+            products={product['id']: product for product in products},
+            fetched_at=fetched_at or time.time(),
+            version=hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12],
+        )
+
+
+@dataclass
+class CatalogStats:
+    hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    background_refreshes: int = 0
+    redis_loads: int = 0
+    refresh_errors: int = 0
+    last_staleness_seconds: float = 0.0
+    max_staleness_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CatalogCache:
+    """In-process snapshot of the store catalog: products, options, variants, prices, SKUs and images.
+
+    Tool calls are served from memory. A snapshot older than `refresh_after` is refreshed on a
+    background thread while the old one keeps being served, and one older than `ttl` is refreshed
+    before it is served. When `shared` is set, snapshots are exchanged through redis so that only
+    one reasoning process has to fetch the catalog from Shopify. `invalidate()` is called through
+    `POST /catalog/invalidate`, e.g. from a Shopify products webhook.
+    """
+
+    def __init__(self, ttl: float, refresh_after: float, shared: bool = False, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.shared = shared
+        self.redis_client = redis.Redis(host=redis_host, port=6379, db=0) if shared else None
+        self.stats = CatalogStats()
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+
+    def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age > self.ttl:
+            self.stats.misses += 1
+            snapshot = self.refresh(stale=snapshot)
+        else:
+            self.stats.hits += 1
+            if snapshot.age > self.refresh_after:
+                self.refresh_in_background()
+
+        staleness = snapshot.age
+        self.stats.last_staleness_seconds = staleness
+        self.stats.max_staleness_seconds = max(self.stats.max_staleness_seconds, staleness)
+        return snapshot
+
+    def get_products(self) -> list:
+        return list(self.get().products.values())
+
+    def get_product(self, product_id: int):
+        """Returns the product dict, or None when the product does not exist."""
+        if self.enabled:
+            product = self.get().products.get(int(product_id))
+            if product is not None:
+                return product
+        # the product may have been created after the snapshot was taken, without the cache only this product is fetched
+        try:
+            return get_shopify_client().get(f'products/{product_id}.json')['product']
+        except ShopifyAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise e
+
+    def refresh(self, stale: CatalogSnapshot = None) -> CatalogSnapshot:
+        with self._lock:
+            # another thread may have refreshed the snapshot while this one waited for the lock
+            if self._snapshot is not None and self._snapshot is not stale and self._snapshot.age <= self.ttl:
+                return self._snapshot
+            try:
+                snapshot = self._load_shared() or self._fetch()
+            except Exception:
+                self.stats.refresh_errors += 1
+                if self._snapshot is None:
+                    raise
+                logger.exception("Failed to refresh the catalog snapshot, serving the stale snapshot")
+                return self._snapshot
+            self._snapshot = snapshot
+            return snapshot
+
+    def refresh_in_background(self):
+        if self._refreshing.is_set():
+            return
+        self._refreshing.set()
+
+        def run():
+            try:
+                self.stats.background_refreshes += 1
+                self.refresh(stale=self._snapshot)
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=run, name='catalog-refresh', daemon=True).start()
+
+    def invalidate(self):
+        """Drops the snapshot so the next access fetches the catalog again."""
+        with self._lock:
+            self._snapshot = None
+            if self.redis_client is not None:
+                self.redis_client.delete(CATALOG_REDIS_KEY)
+        logger.info("Catalog snapshot invalidated")
+
+    def _fetch(self) -> CatalogSnapshot:
+        products = get_shopify_client().get('products.json', {'limit': 250})['products']
+        snapshot = CatalogSnapshot.from_products(products)
+        self.stats.refreshes += 1
+        logger.info(f"Fetched catalog snapshot {snapshot.version} with {len(products)} products")
+        if self.redis_client is not None:
+            self.redis_client.set(
+                CATALOG_REDIS_KEY,
+                json.dumps({'fetched_at': snapshot.fetched_at, 'products': products}),
+                ex=max(1, int(self.ttl)),
+            )
+        return snapshot
+
+    def _load_shared(self):
+        if self.redis_client is None:
+            return None
+        cached = self.redis_client.get(CATALOG_REDIS_KEY)
+        if not cached:
+            return None
+        cached = json.loads(cached)
+        snapshot = CatalogSnapshot.from_products(cached['products'], cached['fetched_at'])
+        if snapshot.age > self.refresh_after:
+            return None
+        self.stats.redis_loads += 1
+        return snapshot
+
+
+catalog = CatalogCache(
+    ttl=CATALOG_TTL_SECONDS if CATALOG_CACHE_ENABLED else 0,
+    refresh_after=CATALOG_REFRESH_AFTER_SECONDS if CATALOG_CACHE_ENABLED else 0,
+    shared=CATALOG_REDIS_SHARED and CATALOG_CACHE_ENABLED,
+    enabled=CATALOG_CACHE_ENABLED,
+)
+
+
+@registry.collector
+def catalog_metrics():
+    stats = catalog.stats
+    yield 'xrx_catalog_hits_total', 'counter', 'Catalog reads served from the snapshot.', [({}, stats.hits)]
+    yield 'xrx_catalog_misses_total', 'counter', 'Catalog reads which had to refresh the snapshot first.', [({}, stats.misses)]
+    yield 'xrx_catalog_refreshes_total', 'counter', 'Catalog snapshots fetched from Shopify.', [({}, stats.refreshes)]
+    yield 'xrx_catalog_refresh_errors_total', 'counter', 'Failed catalog snapshot refreshes.', [({}, stats.refresh_errors)]
+    yield 'xrx_catalog_staleness_seconds', 'gauge', 'Age of the catalog snapshot at the last read.', [({}, stats.last_staleness_seconds)]
+    yield 'xrx_catalog_max_staleness_seconds', 'gauge', 'Largest age of the catalog snapshot at a read.', [({}, stats.max_staleness_seconds)]
@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import asyncio
+import logging
+from agent.config import (
+    compaction_enabled,
+    compaction_keep_turns,
+    compaction_min_summary_tokens,
+    compaction_summary_ttl_seconds,
+    compaction_token_budget,
+    compaction_node_token_budgets,
+)
+from .prompts import PromptTemplate, estimate_tokens
+from .usage import record_llm_usage
+from .llm_gateway import get_llm_gateway
+from .deadlines import turn_deadline_var
+from .redis_pool import get_async_redis
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# set up llm
+LLM_CLIENT = get_llm_gateway()
+LLM_MODEL_ID = os.environ.get('LLM_MODEL_ID_SUMMARY', os.environ.get('LLM_MODEL_ID', ''))
+
+# the summary outlives the turn which wrote it, so it is kept in redis rather than in the session of that turn
+SUMMARY_KEY_PREFIX = 'conversation-summary'
+SUMMARY_MAX_WORDS = 200
+# ids of each kind kept in the summary, the most recent ones win
+MAX_IDS_PER_KIND = 50
+
+SUMMARY_PROMPT = '''\
+You keep a running summary of a conversation between a customer and the assistant of a store.
+Update the current summary with the new messages. Keep what the customer asked for, the products \
+they looked at, what was added to or removed from the cart, the decisions made and any open questions. \
+Leave out greetings and small talk. Do not repeat ids, they are kept separately.
+Return only the updated summary as plain text of at most {max_words} words.
+
+## Current summary
+{summary}
+
+## New messages
+{messages}
+'''
+SUMMARY_TEMPLATE = PromptTemplate(SUMMARY_PROMPT, ['max_words', 'summary', 'messages'])
+
+# "variant_id 123", "variant ids: 123, 456 and 789", "cart ID 123"
+ID_PATTERN = re.compile(
+    r'\b(variant|product|order|cart)[ _-]?ids?\b[^\d\n]{0,5}((?:\d{3,}(?:\s*(?:,|and)\s*)?)+)',
+    re.IGNORECASE,
+)
+ID_KINDS = {'variant': 'variant_ids', 'product': 'product_ids', 'order': 'order_ids', 'cart': 'cart_ids'}
+
+# summaries in flight, by session guid
+_summary_tasks = {}
+
+
+def conversation_token_budget(node: str):
+    """Returns the conversation token budget of a node, None when it is not limited."""
+    return compaction_node_token_budgets.get(node, compaction_token_budget)
+
+
+def window_start(messages: list, keep_turns: int) -> int:
+    """Index of the first message of the last `keep_turns` turns, a turn starts with a user message."""
+    user_indexes = [i for i, message in enumerate(messages) if message['role'] == 'user']
+    if len(user_indexes) <= keep_turns:
+        return 0
+    return user_indexes[-keep_turns]
+
+
+def extract_ids(messages: list, ids: dict = None) -> dict:
+    """Collects the ids mentioned in the messages exactly as they were written."""
+    ids = {kind: dict.fromkeys(values) for kind, values in (ids or {}).items()}
+    for message in messages:
+        for kind, numbers in ID_PATTERN.findall(message['content']):
+            found = ids.setdefault(ID_KINDS[kind.lower()], {})
+            for number in re.findall(r'\d{3,}', numbers):
+                # move ids mentioned again to the end so the most recent ones are kept
+                found.pop(number, None)
+                found[number] = None
+    return {kind: list(values)[-MAX_IDS_PER_KIND:] for kind, values in ids.items()}
+
+
+def summary_message(summary: dict, session: dict) -> dict:
+    lines = []
+    # the session holds the authoritative cart and order
+    if session.get('cart_id'):
+        lines.append(f"- current cart id: {session['cart_id']}")
+    if session.get('submitted_order_id'):
+        lines.append(f"- submitted order confirmation number: {session['submitted_order_id']}")
+    for kind, values in summary.get('ids', {}).items():
+        if values:
+            lines.append(f"- {kind.replace('_', ' ')} mentioned: {', '.join(values)}")
+    content = f"### Summary of the earlier conversation\n\n{summary.get('summary', '')}\n"
+    if lines:
+        content += "\n### Exact ids from the earlier conversation\n\n" + '\n'.join(lines) + '\n'
+    return {'role': 'system', 'content': content, 'compacted': True}
+
+
+def summary_key(guid: str) -> str:
+    return f"{SUMMARY_KEY_PREFIX}:{guid}"
+
+
+async def load_summary(guid: str) -> dict:
+    try:
+        stored = await get_async_redis().get(summary_key(guid))
+    except Exception:
+        logger.exception("Failed to load the conversation summary, keeping the messages verbatim")
+        return {}
+    return json.loads(stored) if stored is not None else {}
+
+
+async def compact_messages(messages: list, session: dict) -> list:
+    """Replaces the turns before the last `compaction_keep_turns` turns with the rolling summary.
+
+    Messages which are not summarized yet are kept verbatim. Once enough of them have fallen
+    out of the window they are summarized in the background and the summary is stored in redis
+    under the session guid, so the summarization never delays a response and a summary
+    finishing after the turn is still there for the next one.
+    """
+    if not compaction_enabled or not session or not session.get('guid'):
+        return messages
+
+    summary = await load_summary(session['guid'])
+    summarized = summary.get('message-count', 0)
+    if summarized > len(messages):
+        # the conversation was restarted
+        summary, summarized = {}, 0
+
+    boundary = window_start(messages, compaction_keep_turns)
+    unsummarized = messages[summarized:boundary]
+    if unsummarized and estimate_tokens(''.join(m['content'] for m in unsummarized)) >= compaction_min_summary_tokens:
+        schedule_summary(session, summary, messages[:boundary])
+
+    if not summarized:
+        return messages
+    return [summary_message(summary, session)] + messages[summarized:]
+
+
+def schedule_summary(session: dict, summary: dict, messages: list):
+    key = session['guid']
+    task = _summary_tasks.get(key)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(update_summary(key, summary, messages))
+    _summary_tasks[key] = task
+    task.add_done_callback(lambda done: _summary_tasks.pop(key, None) if _summary_tasks.get(key) is done else None)
+
+
+async def update_summary(guid: str, summary: dict, messages: list):
+    """Folds the messages after the current summary into it and stores the result in redis."""
+    summarized = summary.get('message-count', 0)
+    new_messages = messages[summarized:]
+    # the summary runs in the background, it is not bound by the deadline of the turn which started it
+    turn_deadline_var.set(None)
+    try:
+        response = await LLM_CLIENT.chat.completions.create(
+            node='ConversationSummary',
+            model=LLM_MODEL_ID,
+            messages=[
+                {
+                    "role": "system",
+                    "content": SUMMARY_TEMPLATE.render(
+                        max_words=str(SUMMARY_MAX_WORDS),
+                        summary=summary.get('summary', '') or 'There is no summary yet.',
+                        messages=''.join(f"{i['role']}: {i['content']}\n" for i in new_messages),
+                    )
+                },
+                {
+                    "role": "user",
+                    "content": '<awaiting the updated summary>'
+                },
+            ],
+            temperature=0.2,
+        )
+        record_llm_usage('ConversationSummary', response)
+    except Exception:
+        logger.exception("Failed to summarize the conversation, keeping the messages verbatim")
+        return
+
+    updated = {
+        'summary': response.choices[0].message.content.strip(),
+        'message-count': len(messages),
+        'ids': extract_ids(new_messages, summary.get('ids')),
+    }
+    try:
+        await get_async_redis().set(summary_key(guid), json.dumps(updated), ex=compaction_summary_ttl_seconds)
+    except Exception:
+        logger.exception("Failed to store the conversation summary")
+        return
+    logger.info(f"Conversation summary now covers {len(messages)} messages")
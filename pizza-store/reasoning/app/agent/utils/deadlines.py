@@ -0,0 +1,34 @@
+import time
+import contextvars
+
+
+class TurnDeadline:
+    """The latency budget of one turn, every LLM call of the turn has to finish before it expires."""
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+turn_deadline_var = contextvars.ContextVar('turn_deadline', default=None)
+
+
+def start_turn_deadline(budget_seconds: float = None) -> TurnDeadline:
+    """Starts the deadline of a turn, nodes started afterwards share it. No budget means no deadline."""
+    deadline = TurnDeadline(budget_seconds) if budget_seconds else None
+    turn_deadline_var.set(deadline)
+    return deadline
+
+
+def call_timeout(max_seconds: float = None):
+    """Seconds left for a call: the rest of the turn budget, capped at `max_seconds`. None is unlimited."""
+    deadline = turn_deadline_var.get()
+    timeouts = [t for t in (deadline.remaining() if deadline else None, max_seconds) if t is not None]
+    return min(timeouts) if timeouts else None
@@ -0,0 +1,80 @@
+import json
+import time
+from dataclasses import dataclass
+from .metrics import registry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EVENT_ENCODE_DURATION = registry.histogram(
+    'xrx_event_encode_seconds', 'Time to encode an event of the agent stream.', ('node',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+EVENT_BYTES = registry.counter('xrx_event_bytes_total', 'Encoded size of the events of the agent stream.', ('node',))
+
+
+def _default(value):
+    # tool outputs may hold values JSON has no type for
+    return str(value)
+
+
+def encode_event(event: dict, node: str = '') -> str:
+    """Encodes an event of the agent stream, with orjson when it is installed."""
+    start = time.perf_counter()
+    if orjson is not None:
+        data = orjson.dumps(event, default=_default)
+        size, encoded = len(data), data.decode('utf-8')
+    else:
+        # ASCII only, one byte per character
+        encoded = json.dumps(event, default=_default)
+        size = len(encoded)
+    EVENT_ENCODE_DURATION.observe(time.perf_counter() - start, node=node)
+    EVENT_BYTES.inc(size, node=node)
+    return encoded
+
+
+@dataclass
+class AgentEvent:
+    """An event of the agent stream, built from a graph result.
+
+    Results travel from the nodes to the executor as plain objects; the event is encoded once,
+    when run_agent hands it to the stream. Widget details stay objects inside the event.
+    """
+    node: str
+    output: object
+    reason: str
+    final: bool
+    messages: list
+    session: dict
+    # where the time of the turn went, on the final response
+    timings: dict = None
+
+    def to_dict(self) -> dict:
+        event = {
+            'messages': self.messages,
+            'session': self.session,
+            'node': self.node,
+            'output': self.output,
+            'reason': self.reason,
+            'final': self.final,
+        }
+        if self.timings is not None:
+            event['timings'] = self.timings
+        return event
+
+    def encode(self) -> str:
+        return encode_event(self.to_dict(), self.node)
+
+
+@dataclass
+class ErrorEvent:
+    error: str
+    traceback: str = None
+
+    def encode(self) -> str:
+        event = {'error': self.error}
+        if self.traceback is not None:
+            event['traceback'] = self.traceback
+        return encode_event(event, 'error')
@@ -0,0 +1,105 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from .redis_pool import get_async_redis
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv('IMAGE_CACHE_TTL_SECONDS', '86400'))
+# products without an image are remembered for a shorter time
+IMAGE_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('IMAGE_CACHE_NEGATIVE_TTL_SECONDS', '300'))
+IMAGE_CACHE_LRU_SIZE = int(os.getenv('IMAGE_CACHE_LRU_SIZE', '1024'))
+IMAGE_CACHE_LRU_TTL_SECONDS = float(os.getenv('IMAGE_CACHE_LRU_TTL_SECONDS', '300'))
+
+# stored in place of an image url for products and variants which have no image
+NO_IMAGE = '__no-image__'
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Small in-process LRU cache with a per entry expiry."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._entries[key] = (value, time.monotonic() + min(ttl or self.ttl, self.ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class ProductImageCache:
+    """Two level cache of product image urls: an in-process LRU in front of redis.
+
+    `get_many` returns the cached url for every known key, None for keys known to have no
+    image (negative caching) and leaves unknown keys out.
+    """
+
+    def __init__(self):
+        self.lru = LRUCache(IMAGE_CACHE_LRU_SIZE, IMAGE_CACHE_LRU_TTL_SECONDS)
+        self.redis_client = get_async_redis()
+
+    async def get_many(self, keys: list) -> dict:
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self.lru.get(key)
+            if value is _MISSING:
+                remote_keys.append(key)
+            else:
+                found[key] = value
+        if not remote_keys:
+            return found
+
+        try:
+            cached = await self.redis_client.mget(remote_keys)
+        except Exception as e:
+            logger.warning(f"Error reading product images from redis: {str(e)}")
+            return found
+        for key, value in zip(remote_keys, cached):
+            if value is None:
+                continue
+            value = value.decode('utf-8')
+            value = None if value == NO_IMAGE else value
+            self.lru.set(key, value, IMAGE_CACHE_LRU_TTL_SECONDS if value else IMAGE_CACHE_NEGATIVE_TTL_SECONDS)
+            found[key] = value
+        return found
+
+    async def set_many(self, images: dict):
+        """Stores image urls, None values are stored as negative entries."""
+        if not images:
+            return
+        for key, value in images.items():
+            self.lru.set(key, value, IMAGE_CACHE_LRU_TTL_SECONDS if value else IMAGE_CACHE_NEGATIVE_TTL_SECONDS)
+        try:
+            # write all entries back in a single round trip
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key, value in images.items():
+                if value:
+                    pipeline.set(key, value, ex=IMAGE_CACHE_TTL_SECONDS)
+                else:
+                    pipeline.set(key, NO_IMAGE, ex=IMAGE_CACHE_NEGATIVE_TTL_SECONDS)
+            await pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Error writing product images to redis: {str(e)}")
+
+
+product_image_cache = ProductImageCache()
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+from agent.config import json_output_mode
+from .metrics import registry
+from .usage import record_llm_usage
+from .llm_gateway import get_llm_gateway
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+JSON_FIXER_MODEL_ID = os.environ.get('LLM_MODEL_ID_JSON_FIXER', os.environ.get('LLM_MODEL_ID', ''))
+
+JSON_FIXER_PROMPT = '''\
+The text below was meant to be a JSON object matching this JSON schema, but {problem}.
+Return only the corrected JSON object, keeping every value the text intended.
+
+Schema:
+{schema}
+
+Text:
+{text}'''
+
+
+class NodeOutputError(Exception):
+    """Raised when the output of a node does not match its schema, even after the json fixer."""
+
+    def __init__(self, node: str, errors: list):
+        super().__init__(f"{node} output does not match its schema: {errors}")
+        self.node = node
+        self.errors = errors
+
+PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+CLOSERS = {'{': '}', '[': ']'}
+
+
+def repair_json(text: str):
+    """Repairs the usual defects of a JSON object generated by an LLM, without another LLM call.
+
+    Text around the object (code fences, explanations) is dropped, single quoted strings and
+    Python literals are converted and trailing commas are removed. A truncated object is cut
+    back to its last complete value and closed; a truncated string value is kept up to where
+    it was cut. Returns None when the text holds no object.
+
+    Example:
+    >>> repair_json("Here you go: {'reason': 'ok', 'tool': 'get_products',}")
+    '{"reason": "ok", "tool": "get_products"}'
+    >>> repair_json('{"reason": "the cart is emp')
+    '{"reason": "the cart is emp"}'
+    >>> repair_json('{"reason": "ok", "parameters": {"quantity": 1')
+    '{"reason": "ok", "parameters": {}}'
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    out = []
+    # each open container with whether it expects a key next
+    stack = []
+    # output length and open brackets after the last complete value, the object can be closed there
+    checkpoint = (0, [])
+    quote = None
+    escape = False
+    string_is_key = False
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if escape:
+                escape = False
+                # an escaped single quote is a plain character in JSON
+                out.append("'" if char == "'" else '\\' + char)
+            elif char == '\\':
+                escape = True
+            elif char == quote:
+                quote = None
+                out.append('"')
+                if not string_is_key:
+                    checkpoint = (len(out), [bracket for bracket, _ in stack])
+            elif char == '"':
+                out.append('\\"')
+            elif char == '\n':
+                out.append('\\n')
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char in '"\'':
+            quote = char
+            string_is_key = bool(stack) and stack[-1][1]
+            out.append('"')
+        elif char in '{[':
+            stack.append([char, char == '{'])
+            out.append(char)
+            checkpoint = (len(out), [bracket for bracket, _ in stack])
+        elif char in '}]':
+            while out and out[-1] in ', \n\t\r':
+                out.pop()
+            if not stack:
+                break
+            stack.pop()
+            out.append(char)
+            checkpoint = (len(out), [bracket for bracket, _ in stack])
+            if not stack:
+                return ''.join(out)
+        elif char == ',':
+            out.append(char)
+            if stack and stack[-1][0] == '{':
+                stack[-1][1] = True
+        elif char == ':':
+            out.append(char)
+            if stack:
+                stack[-1][1] = False
+        elif char.isalnum() or char in '-+.':
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] in '-+._'):
+                end += 1
+            word = text[i:end]
+            out.append(PYTHON_LITERALS.get(word, word))
+            # a number at the end of the text may have been cut
+            if end < len(text):
+                checkpoint = (len(out), [bracket for bracket, _ in stack])
+            i = end
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if quote is not None and not string_is_key:
+        # keep the truncated string value
+        out.append('"')
+        brackets = [bracket for bracket, _ in stack]
+    else:
+        length, brackets = checkpoint
+        out = out[:length]
+    while out and out[-1] in ', \n\t\r':
+        out.pop()
+    return ''.join(out) + ''.join(CLOSERS[bracket] for bracket in reversed(brackets))
+
+
+JSON_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'number': (int, float),
+    'integer': int,
+    'boolean': bool,
+    'null': type(None),
+}
+
+
+def matches_type(value, type_name: str) -> bool:
+    # bool is a subclass of int, but not a JSON number
+    if isinstance(value, bool):
+        return type_name == 'boolean'
+    return isinstance(value, JSON_TYPES[type_name])
+
+
+def schema_errors(value, schema: dict, path: str = '$') -> list:
+    """Checks a value against the subset of JSON schema used by the node output schemas."""
+    errors = []
+    types = schema.get('type')
+    if types is not None:
+        types = types if isinstance(types, list) else [types]
+        if not any(matches_type(value, t) for t in types):
+            return [f"{path} is not of type {' or '.join(types)}"]
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append(f"{path} is not one of {schema['enum']}")
+    if isinstance(value, dict):
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append(f"{path} is missing '{key}'")
+        for key, property_schema in schema.get('properties', {}).items():
+            if key in value:
+                errors.extend(schema_errors(value[key], property_schema, f"{path}.{key}"))
+    return errors
+
+
+@dataclass
+class RepairPathStats:
+    count: int = 0
+    seconds_total: float = 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.seconds_total / self.count if self.count else 0.0
+
+
+class RepairTracker:
+    """How the JSON output of each node was obtained and how long it took.
+
+    Paths: 'direct' (valid as generated), 'repaired' (fixed locally), 'schema-mismatch' (valid
+    JSON not matching the schema, fixed by the json fixer LLM call), 'llm-fixer' (invalid JSON
+    fixed by the json fixer LLM call) and 'failed' (still not matching the schema after the fixer).
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def record(self, node: str, path: str, seconds: float):
+        stats = self.nodes.setdefault(node, {}).setdefault(path, RepairPathStats())
+        stats.count += 1
+        stats.seconds_total += seconds
+
+    def rate(self, node: str, path: str) -> float:
+        paths = self.nodes.get(node, {})
+        total = sum(stats.count for stats in paths.values())
+        return paths[path].count / total if path in paths else 0.0
+
+    def summary(self) -> dict:
+        return {
+            node: {
+                path: {
+                    'count': stats.count,
+                    'rate': round(self.rate(node, path), 4),
+                    'mean_seconds': round(stats.mean_seconds, 6),
+                }
+                for path, stats in paths.items()
+            }
+            for node, paths in self.nodes.items()
+        }
+
+
+repair_tracker = RepairTracker()
+
+
+@registry.collector
+def repair_metrics():
+    yield 'xrx_json_output_total', 'counter', 'Node JSON outputs by the path which produced them.', [
+        ({'node': node, 'path': path}, stats.count) for node, paths in repair_tracker.nodes.items() for path, stats in paths.items()
+    ]
+
+
+class OutputSchema:
+    """The JSON schema of the output of a node.
+
+    `response_format()` asks the provider for schema constrained decoding when
+    `json_output_mode` is 'json-schema', and for plain JSON mode otherwise. `parse()` turns a
+    generation into the output dict, repairing it locally before falling back to `fix_json()`.
+    """
+
+    def __init__(self, name: str, schema: dict):
+        self.name = name
+        self.schema = schema
+
+    def response_format(self) -> dict:
+        if json_output_mode == 'json-schema':
+            return {'type': 'json_schema', 'json_schema': {'name': self.name, 'schema': self.schema}}
+        return {'type': 'json_object'}
+
+    def validate(self, output) -> list:
+        return schema_errors(output, self.schema)
+
+    async def fix_json(self, node: str, generation: str, errors: list = None) -> dict:
+        """Asks the json fixer model for the corrected output, through the shared LLM gateway."""
+        fixer_node = f'{node}JsonFixer'
+        problem = f"it does not match the schema: {'; '.join(errors)}" if errors else 'it is not valid JSON'
+        response = await get_llm_gateway().chat.completions.create(
+            node=fixer_node,
+            model=JSON_FIXER_MODEL_ID,
+            messages=[
+                {
+                    "role": "user",
+                    "content": JSON_FIXER_PROMPT.format(problem=problem, schema=json.dumps(self.schema), text=generation or ''),
+                },
+            ],
+            response_format={'type': 'json_object'},
+            temperature=0,
+        )
+        record_llm_usage(fixer_node, response)
+        try:
+            return json.loads(response.choices[0].message.content)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    async def parse(self, node: str, generation: str) -> dict:
+        """Returns the output of the node matching the schema, or raises NodeOutputError."""
+        start = time.perf_counter()
+        errors = None
+        try:
+            output = json.loads(generation)
+            errors = self.validate(output)
+            path = 'direct' if not errors else 'schema-mismatch'
+        except (json.JSONDecodeError, TypeError):
+            output, path = None, None
+
+        if path is None:
+            repaired = repair_json(generation or '')
+            try:
+                output = json.loads(repaired) if repaired is not None else None
+            except json.JSONDecodeError:
+                output = None
+            # a repair which does not match the schema (a cut enum value, a lost key) is not trusted
+            path = 'repaired' if output is not None and not self.validate(output) else 'llm-fixer'
+
+        if path in ('schema-mismatch', 'llm-fixer'):
+            logger.warning(f"{node} output is not valid, fixing it with the LLM" + (f": {errors}" if errors else ''))
+            output = await self.fix_json(node, generation, errors)
+            fixed_errors = self.validate(output) if output is not None else ['not valid JSON']
+            if fixed_errors:
+                repair_tracker.record(node, 'failed', time.perf_counter() - start)
+                raise NodeOutputError(node, fixed_errors)
+
+        repair_tracker.record(node, path, time.perf_counter() - start)
+        if path != 'direct':
+            logger.warning(f"{node} JSON output took the {path} path, node {path} rate {repair_tracker.rate(node, path):.2f}")
+        return output
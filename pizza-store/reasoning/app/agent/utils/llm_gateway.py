@@ -0,0 +1,301 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+import httpx
+from agent_framework import initialize_async_llm_client
+from agent.config import (
+    llm_max_connections,
+    llm_max_concurrency,
+    llm_model_concurrency,
+    llm_max_queue,
+    llm_queue_warning_seconds,
+    llm_call_timeout_seconds,
+    llm_hedging,
+    llm_hedge_percentile,
+    llm_hedge_min_samples,
+    llm_hedge_min_delay_seconds,
+)
+from .deadlines import call_timeout
+from .cancellation import record_cancelled_llm_call
+from .metrics import registry
+from .timings import record_llm_call
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class LLMGatewayBusyError(Exception):
+    pass
+
+
+class LLMDeadlineExceededError(Exception):
+    pass
+
+
+@dataclass
+class GatewayStats:
+    requests: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    max_waiting: int = 0
+    rejected: int = 0
+    errors: int = 0
+    queue_wait_seconds_total: float = 0.0
+    queue_wait_seconds_max: float = 0.0
+
+    @property
+    def mean_queue_wait_seconds(self) -> float:
+        return self.queue_wait_seconds_total / self.requests if self.requests else 0.0
+
+
+@dataclass
+class NodeCallStats:
+    calls: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    # hedged calls answered by the duplicate request
+    hedge_wins: int = 0
+
+    @property
+    def timeout_rate(self) -> float:
+        return self.timeouts / self.calls if self.calls else 0.0
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedges / self.calls if self.calls else 0.0
+
+
+class LatencyWindow:
+    """The latencies of the most recent calls of a node."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class LLMGateway:
+    """Process wide entry point for LLM calls.
+
+    Wraps one async client, so every node shares a single pool of keep-alive connections.
+    A call first waits for a slot of its model and then for a global slot. Calls waiting for
+    a slot are queued; when `max_queue` calls are already waiting, new calls are rejected
+    with LLMGatewayBusyError instead of piling up. Streamed completions hold their slots
+    until the stream is consumed.
+
+    Each call has to finish within the rest of the turn latency budget (see
+    `agent.utils.deadlines`), capped at `llm_call_timeout_seconds`, or it raises
+    LLMDeadlineExceededError. With hedging enabled, a call which is still running after the
+    recent p90 latency of its node (`llm_hedge_percentile`) is sent a second time and the
+    first answer wins. Streamed
+    completions are not hedged and the deadline only covers the wait for the stream to start.
+
+    Exposes `chat.completions.create` like the client it wraps, plus a `node` argument naming
+    the calling node for the per node timeout and hedge rates.
+    """
+
+    def __init__(self, client, max_concurrency: int, model_concurrency: dict = None, max_queue: int = 0):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency or {}
+        self.max_queue = max_queue
+        self.stats = GatewayStats()
+        self.model_stats = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._model_semaphores = {}
+        self.node_stats = {}
+        self._latencies = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat_completion))
+
+    async def create_chat_completion(self, node: str = 'unknown', **kwargs):
+        stats = self.node_stats.setdefault(node, NodeCallStats())
+        stats.calls += 1
+        timeout = call_timeout(llm_call_timeout_seconds)
+        start = time.monotonic()
+        try:
+            if kwargs.get('stream'):
+                return await asyncio.wait_for(self._call(kwargs, node, start), timeout)
+            response = await asyncio.wait_for(self._hedged_call(node, kwargs), timeout)
+        except asyncio.CancelledError:
+            record_cancelled_llm_call(node)
+            raise
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.error(f"{node} LLM call timed out after {timeout:.2f}s, node timeout rate {stats.timeout_rate:.2f}")
+            raise LLMDeadlineExceededError(f"{node} LLM call did not finish within {timeout:.2f} seconds")
+        latency = time.monotonic() - start
+        self._latencies.setdefault(node, LatencyWindow()).add(latency)
+        record_llm_call(node, latency, kwargs.get('model', ''))
+        return response
+
+    def hedge_delay(self, node: str):
+        """Seconds after which a call of the node is hedged, None while hedging is off or unsure."""
+        latencies = self._latencies.get(node)
+        if not llm_hedging or latencies is None or len(latencies.samples) < llm_hedge_min_samples:
+            return None
+        return max(latencies.percentile(llm_hedge_percentile), llm_hedge_min_delay_seconds)
+
+    async def _hedged_call(self, node: str, kwargs: dict):
+        delay = self.hedge_delay(node)
+        primary = asyncio.ensure_future(self._call(kwargs, node))
+        tasks = {primary}
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                stats = self.node_stats[node]
+                stats.hedges += 1
+                logger.info(f"{node} LLM call still running after {delay:.2f}s, hedging it, node hedge rate {stats.hedge_rate:.2f}")
+                tasks.add(asyncio.ensure_future(self._call(kwargs, node)))
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.node_stats[node].hedge_wins += 1
+                        return task.result()
+            # both requests failed
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, kwargs: dict, node: str, started_at: float = None):
+        model = kwargs.get('model', '')
+        model_semaphore = await self._acquire(model)
+        try:
+            response = await self.client.chat.completions.create(**kwargs)
+        except BaseException as e:
+            # a call cancelled by its deadline or a winning hedge gives its slot back too
+            if isinstance(e, Exception):
+                self.stats.errors += 1
+                self._model_stats(model).errors += 1
+            self._release(model, model_semaphore)
+            raise
+        if kwargs.get('stream'):
+            return self._gated_stream(response, model, model_semaphore, node, started_at)
+        self._release(model, model_semaphore)
+        return response
+
+    def node_summary(self) -> dict:
+        return {
+            node: {
+                'calls': stats.calls,
+                'timeouts': stats.timeouts,
+                'timeout_rate': round(stats.timeout_rate, 4),
+                'hedges': stats.hedges,
+                'hedge_rate': round(stats.hedge_rate, 4),
+                'hedge_wins': stats.hedge_wins,
+            }
+            for node, stats in self.node_stats.items()
+        }
+
+    def _model_stats(self, model: str) -> GatewayStats:
+        if model not in self.model_stats:
+            self.model_stats[model] = GatewayStats()
+        return self.model_stats[model]
+
+    async def _acquire(self, model: str) -> asyncio.Semaphore:
+        model_stats = self._model_stats(model)
+        if self.max_queue and self.stats.waiting >= self.max_queue:
+            self.stats.rejected += 1
+            model_stats.rejected += 1
+            raise LLMGatewayBusyError(f"{self.stats.waiting} LLM calls are already waiting for a slot")
+
+        if model not in self._model_semaphores:
+            self._model_semaphores[model] = asyncio.Semaphore(self.model_concurrency.get(model, self.max_concurrency))
+        model_semaphore = self._model_semaphores[model]
+
+        for stats in (self.stats, model_stats):
+            stats.waiting += 1
+            stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        start = time.monotonic()
+        try:
+            # the model slot comes first so calls to a saturated model do not hold global slots
+            await model_semaphore.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                model_semaphore.release()
+                raise
+        finally:
+            for stats in (self.stats, model_stats):
+                stats.waiting -= 1
+
+        wait = time.monotonic() - start
+        for stats in (self.stats, model_stats):
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.queue_wait_seconds_total += wait
+            stats.queue_wait_seconds_max = max(stats.queue_wait_seconds_max, wait)
+        if wait > llm_queue_warning_seconds:
+            logger.warning(f"LLM call to {model} waited {wait:.2f}s for a slot, {self.stats.in_flight} calls in flight")
+        return model_semaphore
+
+    def _release(self, model: str, model_semaphore: asyncio.Semaphore):
+        self._semaphore.release()
+        model_semaphore.release()
+        self.stats.in_flight -= 1
+        self._model_stats(model).in_flight -= 1
+
+    async def _gated_stream(self, stream, model: str, model_semaphore: asyncio.Semaphore, node: str, started_at: float = None):
+        chunks = 0
+        try:
+            async for chunk in stream:
+                chunks += 1
+                yield chunk
+        except asyncio.CancelledError:
+            # about one token per chunk was already generated
+            record_cancelled_llm_call(node, chunks)
+            raise
+        finally:
+            self._release(model, model_semaphore)
+            if started_at is not None:
+                record_llm_call(node, time.monotonic() - started_at, model)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Returns the process wide LLM gateway, creating it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                client = initialize_async_llm_client()
+                # size the keep-alive pool of the OpenAI compatible client to the gateway concurrency
+                if hasattr(client, 'with_options'):
+                    limits = httpx.Limits(max_connections=llm_max_connections, max_keepalive_connections=llm_max_connections)
+                    client = client.with_options(http_client=httpx.AsyncClient(limits=limits))
+                _gateway = LLMGateway(client, llm_max_concurrency, llm_model_concurrency, llm_max_queue)
+    return _gateway
+
+
+@registry.collector
+def gateway_metrics():
+    if _gateway is None:
+        return
+    models = _gateway.model_stats.items()
+    nodes = _gateway.node_stats.items()
+    yield 'xrx_llm_gateway_in_flight', 'gauge', 'LLM calls holding a gateway slot.', [({'model': model}, stats.in_flight) for model, stats in models]
+    yield 'xrx_llm_gateway_waiting', 'gauge', 'LLM calls waiting for a gateway slot.', [({'model': model}, stats.waiting) for model, stats in models]
+    yield 'xrx_llm_gateway_rejected_total', 'counter', 'LLM calls rejected by a full gateway queue.', [({'model': model}, stats.rejected) for model, stats in models]
+    yield 'xrx_llm_gateway_queue_wait_seconds_total', 'counter', 'Time LLM calls waited for a gateway slot.', [
+        ({'model': model}, stats.queue_wait_seconds_total) for model, stats in models
+    ]
+    yield 'xrx_llm_timeouts_total', 'counter', 'LLM calls which exceeded their deadline.', [({'node': node}, stats.timeouts) for node, stats in nodes]
+    yield 'xrx_llm_hedges_total', 'counter', 'LLM calls sent a second time by hedging.', [({'node': node}, stats.hedges) for node, stats in nodes]
@@ -0,0 +1,90 @@
+import random
+import logging
+import reprlib
+from agent.config import log_payload_mode, log_node_payload_modes, log_field_max_chars, log_payload_sample_rate
+
+SCALARS = (str, int, float, bool, type(None))
+
+
+class BoundedRepr(reprlib.Repr):
+    """A repr which stops after a few items per container, so its cost does not grow with the payload."""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.maxlevel = 2
+        self.maxdict = 6
+        self.maxlist = self.maxtuple = 3
+        # the whole field is cut to max_chars, its nested strings get a share of it
+        self.maxstring = self.maxother = max(max_chars // 4, 20)
+
+    # Memory and its entries are dicts, a plain repr of them would format every value
+    def repr_Memory(self, x, level):
+        return self.repr_dict(x, level)
+
+    repr_FrozenDict = repr_MappingProxyType = repr_Memory
+
+
+_bounded = BoundedRepr(log_field_max_chars)
+
+
+def format_field(value, full: bool = False) -> str:
+    if full:
+        return repr(value)
+    if isinstance(value, SCALARS):
+        text = str(value)
+        if len(text) > log_field_max_chars:
+            text = f"{text[:log_field_max_chars]}...(+{len(text) - log_field_max_chars} chars)"
+        return repr(text) if isinstance(value, str) else text
+    if isinstance(value, (list, tuple)) and len(value) > _bounded.maxlist:
+        # the latest messages and tool calls tell the most about a turn
+        text = '[..., ' + _bounded.repr(list(value[-_bounded.maxlist:]))[1:]
+    else:
+        text = _bounded.repr(value)
+    text = text[:log_field_max_chars]
+    return f"{type(value).__name__}[{len(value)}]:{text}" if hasattr(value, '__len__') else text
+
+
+class Fields:
+    """Key=value log fields, formatted only when the log record is emitted."""
+    __slots__ = ('fields', 'full')
+
+    def __init__(self, fields: dict, full: bool = False):
+        self.fields = fields
+        self.full = full
+
+    def __str__(self):
+        return ' '.join(f"{key}={format_field(value, self.full)}" for key, value in self.fields.items())
+
+
+class Verbose:
+    """Fields logged whole, as the nodes have always logged them, formatted only when emitted."""
+    __slots__ = ('fields',)
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def __str__(self):
+        return ' '.join(f"{key}={value}" for key, value in self.fields.items())
+
+
+def payload_mode(node: str) -> str:
+    return log_node_payload_modes.get(node, log_payload_mode)
+
+
+def log_payload(logger: logging.Logger, node: str, event: str, **fields):
+    """Logs the payloads of a node event (messages, inputs, outputs, results) at INFO level.
+
+    Nothing is formatted unless the record is emitted. In the 'structured' mode each field is cut
+    to `log_field_max_chars` and containers show their size and first items (long lists their last
+    ones); a sample of the events (`log_payload_sample_rate`) is logged whole for debugging. For example
+
+        log_payload(logger, self.id, 'processing', messages=messages, input=input)
+    """
+    mode = payload_mode(node)
+    if mode == 'off' or not logger.isEnabledFor(logging.INFO):
+        return
+    if mode == 'verbose':
+        logger.info("%s %s: %s", node, event, Verbose(fields))
+        return
+    full = log_payload_sample_rate > 0 and random.random() < log_payload_sample_rate
+    logger.info("node=%s event=%s %s", node, event, Fields(fields, full))
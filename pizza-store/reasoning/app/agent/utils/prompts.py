@@ -0,0 +1,163 @@
+import re
+import contextvars
+
+TOOL_CACHE_PROMPT = '''
+assistant:
+### Tools Used Before Responding to Customer
+
+{tool_output_cache}
+'''
+
+
+# markdown sections of the node system prompts start with a level two heading
+SECTION_PATTERN = re.compile(r'^(?=## )', re.MULTILINE)
+
+
+def prefix_cache_layout(template: str, fields: list) -> str:
+    """Moves the sections holding per-turn placeholders after the static sections.
+
+    The static sections (store info, tools, output format, rules) then form a prefix which
+    is identical for every call of a node and can be served from the provider prompt cache.
+    The relative order of the static and of the per-turn sections is kept.
+    """
+    placeholders = ['{' + field + '}' for field in fields]
+    sections = SECTION_PATTERN.split(template)
+    static = [section for section in sections if not any(p in section for p in placeholders)]
+    dynamic = [section for section in sections if any(p in section for p in placeholders)]
+    # the last prompt section usually ends without a blank line
+    if dynamic and static and not static[-1].endswith('\n\n'):
+        static[-1] += '\n'
+    return ''.join(static + dynamic)
+
+
+class PromptTemplate:
+    """A system prompt split at its placeholders once, so each render is a single join.
+
+    Only the given fields are treated as placeholders, any other braces in the prompt are
+    kept as they are. Values are inserted verbatim and never scanned for placeholders again.
+    With the 'prefix-cache' layout the sections holding the fields are moved to the end of
+    the prompt, see `prefix_cache_layout`.
+
+    Example:
+    >>> template = PromptTemplate('Tool {tool} returned {tool_output} {not_a_field}', ['tool', 'tool_output'])
+    >>> template.render(tool='get_products', tool_output='{tool}')
+    'Tool get_products returned {tool} {not_a_field}'
+    """
+
+    def __init__(self, template: str, fields: list, layout: str = 'default'):
+        if layout == 'prefix-cache':
+            template = prefix_cache_layout(template, fields)
+        self.template = template
+        pattern = re.compile('|'.join(re.escape('{' + field + '}') for field in fields))
+        self._parts = []
+        self._fields = []
+        position = 0
+        for match in pattern.finditer(template):
+            self._parts.append(template[position:match.start()])
+            self._fields.append(match.group()[1:-1])
+            position = match.end()
+        self._tail = template[position:]
+
+    def render(self, **values) -> str:
+        rendered = []
+        for part, field in zip(self._parts, self._fields):
+            rendered.append(part)
+            rendered.append(values[field])
+        rendered.append(self._tail)
+        return ''.join(rendered)
+
+
+TOOL_CACHE_TEMPLATE = PromptTemplate(TOOL_CACHE_PROMPT, ['tool_output_cache'])
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text, about four characters per token for English."""
+    return len(text) // 4 + 1
+
+
+class TurnPrompt:
+    """Renders the conversation and the tool output cache of one turn for every node.
+
+    Each message and each tool output cache entry is rendered once, later nodes of the
+    turn reuse the rendered text. Messages are only ever appended to, so new messages
+    are rendered incrementally.
+
+    With a token budget only the most recent messages which fit the budget are rendered.
+    A leading compacted summary message (see `agent.utils.compaction`) and the last
+    message are always kept. The tool output cache of the turn is not part of the budget.
+    """
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self._lines = []
+        self._conversation = ''
+        self._budgeted = {}
+        self._rendered_entries = {}
+        self._with_tool_cache = {}
+
+    def conversation_text(self, token_budget: int = None) -> str:
+        if len(self._lines) < len(self.messages):
+            lines = [f"{i['role']}: {i['content']}\n" for i in self.messages[len(self._lines):]]
+            self._lines.extend(lines)
+            self._conversation += ''.join(lines)
+        if token_budget is None:
+            return self._conversation
+
+        key = (token_budget, len(self._lines))
+        text = self._budgeted.get(key)
+        if text is None:
+            text = self._budgeted[key] = self._fit_to_budget(token_budget)
+        return text
+
+    def _fit_to_budget(self, token_budget: int) -> str:
+        pinned = self._lines[:1] if self.messages and self.messages[0].get('compacted') else []
+        used = sum(estimate_tokens(line) for line in pinned)
+        kept = []
+        for line in reversed(self._lines[len(pinned):]):
+            cost = estimate_tokens(line)
+            if kept and used + cost > token_budget:
+                break
+            kept.append(line)
+            used += cost
+        return ''.join(pinned + kept[::-1])
+
+    def tool_output_cache_text(self, tool_output_cache: list) -> str:
+        rendered = []
+        for entry in tool_output_cache:
+            key = (entry['tool'], entry['description'])
+            text = self._rendered_entries.get(key)
+            if text is None:
+                text = self._rendered_entries[key] = f"* {entry['tool']}: {entry['description']}\n"
+            rendered.append(text)
+        return ''.join(rendered)
+
+    def conversation(self, tool_output_cache: list = None, token_budget: int = None) -> str:
+        """Returns the conversation followed by the tool output cache, if there is one."""
+        conversation = self.conversation_text(token_budget)
+        if not tool_output_cache:
+            return conversation
+        key = (len(self._lines), token_budget) + tuple((entry['tool'], entry['description']) for entry in tool_output_cache)
+        text = self._with_tool_cache.get(key)
+        if text is None:
+            text = self._with_tool_cache[key] = conversation + TOOL_CACHE_TEMPLATE.render(
+                tool_output_cache=self.tool_output_cache_text(tool_output_cache)
+            )
+        return text
+
+
+turn_prompt_var = contextvars.ContextVar('turn_prompt', default=None)
+
+
+def start_turn_prompt(messages: list) -> TurnPrompt:
+    """Creates the prompt renderer for a turn, nodes started afterwards share it."""
+    turn_prompt = TurnPrompt(messages)
+    turn_prompt_var.set(turn_prompt)
+    return turn_prompt
+
+
+def get_turn_prompt(messages: list) -> TurnPrompt:
+    """Returns the prompt renderer of the current turn, or a new one for other messages."""
+    turn_prompt = turn_prompt_var.get()
+    if turn_prompt is None or turn_prompt.messages is not messages:
+        turn_prompt = start_turn_prompt(messages)
+    return turn_prompt
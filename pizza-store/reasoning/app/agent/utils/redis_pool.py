@@ -0,0 +1,17 @@
+import os
+import redis
+
+redis_host = os.getenv('REDIS_HOST', 'localhost')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+
+# one connection pool for every async redis user on the event loop
+ASYNC_REDIS_POOL = redis.asyncio.ConnectionPool(
+    host=redis_host,
+    port=6379,
+    db=0,
+    max_connections=REDIS_MAX_CONNECTIONS,
+)
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    return redis.asyncio.Redis(connection_pool=ASYNC_REDIS_POOL)
@@ -0,0 +1,172 @@
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from agent.config import response_cache_enabled, response_cache_ttl_seconds, response_cache_tools
+from .catalog import catalog
+from .metrics import registry
+from .redis_pool import get_async_redis
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+RESPONSE_CACHE_KEY_PREFIX = 'response-cache'
+
+CONTRACTIONS = {"what's": 'what is', "how's": 'how is', "i'd": 'i would', "i'm": 'i am', "you've": 'you have'}
+# words which do not change what is asked
+FILLER_WORDS = {
+    'please', 'hi', 'hey', 'hello', 'um', 'uh', 'so', 'ok', 'okay', 'just', 'thanks', 'thank', 'you',
+    'can', 'could', 'would', 'tell', 'me', 'the', 'a', 'an', 'currently', 'right', 'now',
+}
+# questions with these words refer to earlier turns and are never answered from the cache
+CONTEXT_WORDS = {'it', 'that', 'this', 'those', 'these', 'them', 'one', 'ones', 'same', 'else', 'other', 'again', 'my', 'cart', 'order'}
+# answers to a question of the assistant, questions made only of these are never answered from the cache
+REPLY_WORDS = {
+    'yes', 'yeah', 'yep', 'sure', 'no', 'nope', 'nah', 'fine', 'great', 'good', 'cool', 'alright', 'go', 'ahead',
+    'small', 'medium', 'large', 'regular', 'both', 'neither', 'all', 'none', 'first', 'second', 'last',
+}
+
+
+def normalize_intent(text: str):
+    """Normalizes a customer question for the cache key, None when it depends on the conversation.
+
+    Example:
+    >>> normalize_intent("Hey, what's on the menu?")
+    'what is on menu'
+    >>> normalize_intent('What is on the menu please')
+    'what is on menu'
+    >>> normalize_intent('How much is that one?') is None
+    True
+    >>> normalize_intent('Yes please, large') is None
+    True
+    """
+    words = []
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        words.extend(CONTRACTIONS.get(word, word.strip("'")).split())
+    if not words or CONTEXT_WORDS.intersection(words) or REPLY_WORDS.union(FILLER_WORDS).issuperset(words):
+        return None
+    return ' '.join(word for word in words if word not in FILLER_WORDS) or None
+
+
+@dataclass
+class ResponseCacheStats:
+    lookups: int = 0
+    hits: int = 0
+    # questions which depend on the conversation and are never looked up
+    uncacheable: int = 0
+    stores: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class ResponseCache:
+    """Answers repeated catalog questions without running the graph.
+
+    A turn is stored when it was started by a customer question, only called cart independent
+    tools (`response_cache_tools`) and none of them failed. The entry holds the tool output cache
+    entries, widgets and final response of the turn. Keys combine the normalized question, the
+    previous assistant message (which also lists the tools used before it) and the catalog snapshot
+    version. A question is only answered from turns asked in the same context, and a catalog change
+    starts a new set of keys while older entries expire.
+    """
+
+    def __init__(self, enabled: bool, ttl: int, tools: list):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.tools = set(tools)
+        self.stats = ResponseCacheStats()
+
+    async def key(self, messages: list):
+        if not self.enabled or not messages or messages[-1]['role'] != 'user':
+            return None
+        intent = normalize_intent(messages[-1]['content'])
+        if intent is None:
+            self.stats.uncacheable += 1
+            return None
+        try:
+            # the catalog snapshot may have to be fetched from Shopify
+            snapshot = await asyncio.to_thread(catalog.get)
+        except Exception:
+            logger.exception("Failed to load the catalog version, answering without the response cache")
+            return None
+        previous = next((m['content'] for m in reversed(messages[:-1]) if m['role'] == 'assistant'), '')
+        digest = hashlib.sha1(f"{previous}\n{intent}".encode('utf-8')).hexdigest()[:16]
+        return f"{RESPONSE_CACHE_KEY_PREFIX}:{snapshot.version}:{digest}"
+
+    async def get(self, key: str):
+        self.stats.lookups += 1
+        cached = await get_async_redis().get(key)
+        if cached is not None:
+            self.stats.hits += 1
+        logger.info(f"Response cache {'hit' if cached else 'miss'} for {key}, hit rate {self.stats.hit_rate:.2f}")
+        return json.loads(cached) if cached is not None else None
+
+    async def set(self, key: str, entry: dict):
+        await get_async_redis().set(key, json.dumps(entry), ex=self.ttl)
+        self.stats.stores += 1
+
+    def results(self, entry: dict) -> list:
+        """The graph results replaying a cached turn."""
+        memory = {'tool-output-cache': entry['tool-output-cache']}
+        results = [
+            {'node': 'Widget', 'reason': 'cached response', 'output': widget, 'memory': memory}
+            for widget in entry['widgets']
+        ]
+        results.append({
+            'node': 'CustomerResponse',
+            'reason': entry['reason'],
+            'output': entry['response'],
+            'response': entry['response'],
+            'final': True,
+            'memory': memory,
+        })
+        return results
+
+
+class TurnRecorder:
+    """Collects the results of a turn and builds its cache entry when the turn can be cached."""
+
+    def __init__(self, tools: set):
+        self.tools = tools
+        self.cacheable = True
+        self.called_tool = False
+        self.widgets = []
+        self.final = None
+
+    def add(self, result: dict):
+        node = result.get('node')
+        if 'error' in result:
+            self.cacheable = False
+        elif node == 'ExecuteTool':
+            self.called_tool = True
+            if result.get('tool') not in self.tools or result.get('failed'):
+                self.cacheable = False
+        elif node == 'Widget':
+            self.widgets.append(result.get('output'))
+        elif node == 'CustomerResponse' and result.get('final', True):
+            self.final = result
+
+    def entry(self):
+        if not (self.cacheable and self.called_tool and self.final is not None):
+            return None
+        return {
+            'tool-output-cache': self.final.get('memory', {}).get('tool-output-cache', []),
+            'widgets': self.widgets,
+            'reason': self.final.get('reason', ''),
+            'response': self.final.get('response', self.final.get('output', '')),
+        }
+
+
+response_cache = ResponseCache(response_cache_enabled, response_cache_ttl_seconds, response_cache_tools)
+
+
+@registry.collector
+def response_cache_metrics():
+    stats = response_cache.stats
+    yield 'xrx_response_cache_lookups_total', 'counter', 'Response cache lookups.', [({}, stats.lookups)]
+    yield 'xrx_response_cache_hits_total', 'counter', 'Turns answered from the response cache.', [({}, stats.hits)]
@@ -1,36 +1,115 @@
-import shopify
-import os
-import json
 from dotenv import load_dotenv
+from .shopify_client import get_shopify_client, ShopifyAPIError
+from .image_cache import product_image_cache
 load_dotenv()
 
-import redis
 
-# set up the redis client
-redis_host = os.getenv('REDIS_HOST', 'localhost')
-redis_client = redis.Redis(host=redis_host, port=6379, db=0)
+PRODUCT_IMAGES_QUERY = """
+query($ids: [ID!]!) {
+    nodes(ids: $ids) {
+        ... on Product {
+            id
+            images(first: 1) {
+                edges {
+                    node {
+                        url
+                    }
+                }
+            }
+            variants(first: 100) {
+                edges {
+                    node {
+                        id
+                        image {
+                            url
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+def _image_key(product_id, variant_id=None) -> str:
+    return f'product-image-{product_id}{"-" + str(variant_id) if variant_id else ""}'
 
-API_KEY = os.environ.get('SHOPIFY_API_KEY', '')
-PASSWORD = os.environ.get('SHOPIFY_TOKEN', '')
-SHOP_NAME = os.environ.get('SHOPIFY_SHOP', '')
-SHOP_GID = os.environ.get('SHOPIFY_SHOP_GID', '')
+async def fetch_product_images(product_ids) -> dict:
+    """Fetches the images of many products with a single GraphQL query.
 
-def init_shopify_connect():
-    if not API_KEY or not PASSWORD or not SHOP_NAME or not SHOP_GID:
-        raise ValueError("API_KEY, PASSWORD, SHOP_NAME, and SHOP_GID environment variables must be set.")
-    shop_url = f"https://{API_KEY}:{PASSWORD}@{SHOP_NAME}.myshopify.com/admin"
-    shopify.ShopifyResource.set_site(shop_url)
-    return shopify.Shop.current()
+    Returns:
+    dict: Maps product ids to a dict with the first product image 'src' and the image url of
+    each variant under 'variants', keyed by variant id. 'src' is None for products without an
+    image, products which do not exist are left out.
+    """
+    product_ids = [int(product_id) for product_id in product_ids]
+    data = await get_shopify_client().agraphql(PRODUCT_IMAGES_QUERY, {
+        'ids': [f'gid://shopify/Product/{product_id}' for product_id in product_ids]
+    })
+    images = {}
+    for node in data['nodes']:
+        if not node:
+            continue
+        product_id = int(node['id'].replace('gid://shopify/Product/', ''))
+        image_edges = node['images']['edges']
+        images[product_id] = {
+            'src': image_edges[0]['node']['url'] if image_edges else None,
+            'variants': {
+                int(edge['node']['id'].replace('gid://shopify/ProductVariant/', '')): (edge['node'].get('image') or {}).get('url')
+                for edge in node['variants']['edges']
+            },
+        }
+    return images
 
-# TODO: This has to be reused in the tools.py file and its not optimal to have it how it is now
-def init_shopify_graphql_client():
-    shop_url = f"https://{API_KEY}:{PASSWORD}@{SHOP_NAME}.myshopify.com/admin"
-    session = shopify.Session(shop_url, '2024-04', PASSWORD)
-    shopify.ShopifyResource.activate_session(session)
-    return shopify.GraphQL()
+async def resolve_product_images(image_requests) -> dict:
+    """Resolves the images for many products and variants with one cache lookup and one GraphQL query.
 
+    Args:
+    image_requests (list): (product_id, variant_id) pairs, variant_id may be None.
 
-def get_product_image(product_id: int, variant_id: int | None = None) -> str:
+    Returns:
+    dict: Maps every (product_id, variant_id) pair to the image url, or None if no image is found.
+    Variants without an image of their own use the first product image.
+    """
+    image_requests = list(dict.fromkeys((product_id, variant_id) for product_id, variant_id in image_requests))
+    if not image_requests:
+        return {}
+    keys = {request: _image_key(*request) for request in image_requests}
+
+    cached = await product_image_cache.get_many(list(keys.values()))
+    resolved = {}
+    misses = []
+    for request, key in keys.items():
+        if key in cached:
+            resolved[request] = cached[key]
+        else:
+            misses.append(request)
+    if not misses:
+        return resolved
+
+    try:
+        images = await fetch_product_images({product_id for product_id, _ in misses})
+    except Exception as e:
+        print(f"Error fetching product images for product_ids {[p for p, _ in misses]}: {str(e)}")
+        return resolved
+
+    fetched = {}
+    for product_id, variant_id in misses:
+        product_images = images.get(int(product_id))
+        image_src = None
+        if product_images:
+            image_src = product_images['src']
+            # a variant can have an image even when its product has none
+            if variant_id:
+                image_src = product_images['variants'].get(int(variant_id)) or image_src
+        resolved[(product_id, variant_id)] = image_src
+        fetched[keys[(product_id, variant_id)]] = image_src
+
+    # products without an image are cached as well so they are not fetched on every widget
+    await product_image_cache.set_many(fetched)
+    return resolved
+
+async def get_product_image(product_id: int, variant_id: int | None = None) -> str:
     """
     Get the first image associated with a specific variant of a product.
     
@@ -41,80 +120,62 @@ def get_product_image(product_id: int, variant_id: int | None = None) -> str:
     Returns:
     str: The URL of the first image associated with the variant, or None if no image is found.
     """
-    try:        
-        img_key = f'product-image-{product_id}{"-" + str(variant_id) if variant_id else ""}'
-        cached_result = redis_client.get(img_key)
-        if cached_result:
-            return cached_result.decode('utf-8')
-        
-        product = shopify.Product.find(product_id)
-        if not product.images:
-            return None
-        
-        image_src = product.images[0].src
-        
-        if variant_id:
-            variant = next((v for v in product.variants if v.id == variant_id), None)
-            if variant and variant.image_id:
-                variant_image = next((img for img in product.images if img.id == variant.image_id), None)
-                if variant_image:
-                    image_src = variant_image.src
-        redis_client.set(img_key, image_src)
-        return image_src
-    except Exception as e:
-        error_message = f"Error fetching product image for product_id: {product_id}{', variant_id: ' + variant_id if variant_id else ''}"
-        error_message += f": {str(e)}"
-        print(error_message)
-        return None
+    return (await resolve_product_images([(product_id, variant_id)])).get((product_id, variant_id))
 
-def populate_images_for_product_list(products):
+async def populate_images_for_product_list(products):
+    images = await resolve_product_images([(product_id, None) for product_id in products.keys()])
     for product_id, product_info in products.items():
-        product_image = get_product_image(product_id)
+        product_image = images.get((product_id, None))
         if product_image:
             product_info['product_image_src'] = product_image
-            continue
     return products
 
-def populate_images_for_product_details(product):
-    product['product_image_src'] = get_product_image(product['product_id'])
+async def populate_images_for_product_details(product):
+    product_id = product['product_id']
+    images = await resolve_product_images(
+        [(product_id, None)] + [(product_id, variant['variant_id']) for variant in product['product_variants']]
+    )
+    product['product_image_src'] = images.get((product_id, None))
     for variant in product['product_variants']:
-        variant['product_image_src'] = get_product_image(product['product_id'], variant['variant_id'])
+        variant['product_image_src'] = images.get((product_id, variant['variant_id']))
     return product
 
-def populate_images_for_cart_summary(cart_summary):
-    for item in cart_summary['cart_summary']['line_items']:
-        item['product_image_src'] = get_product_image(item['product_id'])
+async def populate_images_for_cart_summary(cart_summary):
+    line_items = cart_summary['cart_summary']['line_items']
+    images = await resolve_product_images([(item['product_id'], None) for item in line_items])
+    for item in line_items:
+        item['product_image_src'] = images.get((item['product_id'], None))
     return cart_summary
 
 def get_cart_summary_from_object(order):
-    """Returns a summary of the order with the total price and line items including SKU.
+    """Returns a summary of the draft order dict with the total price and line items including SKU.
     """
     order_summary = {
         'cart_summary':
             {
-                'total_price': order.total_price,
+                'total_price': order['total_price'],
                 'line_items': []
             }
     }
-    for line_item in order.line_items:
+    for line_item in order['line_items']:
         line_item_info = {
-            'name': line_item.title,
-            'quantity': line_item.quantity,
-            'price': line_item.price,
-            'variant_id': line_item.variant_id,
-            'product_id': line_item.product_id,
-            'item_variant_sku': line_item.sku,
-            "variant_title": line_item.variant_title if line_item.variant_title else None,
+            'name': line_item['title'],
+            'quantity': line_item['quantity'],
+            'price': line_item['price'],
+            'variant_id': line_item['variant_id'],
+            'product_id': line_item['product_id'],
+            'item_variant_sku': line_item['sku'],
+            "variant_title": line_item['variant_title'] if line_item.get('variant_title') else None,
         }
         order_summary['cart_summary']['line_items'].append(line_item_info)
     return order_summary
 
-def get_variant_id_from_sku(item_variant_sku, graphql_client):
+def get_variant_id_from_sku(item_variant_sku):
     """Returns the variant ID from the SKU.
     """
     query = """
-    {
-        productVariants(first: 1, query: "sku:%s") {
+    query($query: String!) {
+        productVariants(first: 1, query: $query) {
             edges {
                 node {
                     id
@@ -127,30 +188,56 @@ def get_variant_id_from_sku(item_variant_sku, graphql_client):
             }
         }
     }
-    """ % item_variant_sku
-    response = graphql_client.execute(query)
-    variants = json.loads(response)['data']['productVariants']['edges']
+    """
+    data = get_shopify_client().graphql(query, {'query': f'sku:{item_variant_sku}'})
+    variants = data['productVariants']['edges']
     variant_id = int(variants[0]['node']['id'].replace('gid://shopify/ProductVariant/', ''))
     return variant_id
 
 def make_new_blank_cart(variant_id, quantity):
-    """Creates a new draft order with no items in the cart.
+    """Creates a new draft order holding the given item and returns it.
     """
-
-    draft_order = shopify.DraftOrder.create({
-        "line_items": [
-            {
-                "variant_id": variant_id,
-                "quantity": quantity,
+    try:
+        draft_order = get_shopify_client().post('draft_orders.json', {
+            'draft_order': {
+                'line_items': [
+                    {
+                        'variant_id': variant_id,
+                        'quantity': quantity,
+                    }
+                ]
             }
-        ]
-    })
-
-    # Save the draft order
-    if draft_order.save():
-        print(f"Empty draft order created successfully. ID: {draft_order.id}")
-    else:
+        })['draft_order']
+    except ShopifyAPIError as e:
         print("Failed to create draft order.")
-        print(draft_order.errors.full_messages())
+        print(e.message)
+        raise e
+
+    print(f"Draft order created successfully. ID: {draft_order['id']}")
+    return draft_order
 
-    return draft_order.id
\ No newline at end of file
+def get_draft_order(cart_id):
+    """Returns the draft order dict for a cart id.
+    """
+    return get_shopify_client().get(f'draft_orders/{cart_id}.json')['draft_order']
+
+def update_draft_order_line_items(cart_id, line_items):
+    """Replaces the line items of a draft order and returns the updated draft order.
+    """
+    payload_items = []
+    for line_item in line_items:
+        if line_item.get('variant_id'):
+            payload_items.append({'variant_id': line_item['variant_id'], 'quantity': line_item['quantity']})
+        else:
+            # custom line items without a variant keep their title and price
+            payload_items.append({
+                'title': line_item['title'],
+                'price': line_item['price'],
+                'quantity': line_item['quantity'],
+            })
+    return get_shopify_client().put(f'draft_orders/{cart_id}.json', {
+        'draft_order': {
+            'id': cart_id,
+            'line_items': payload_items,
+        }
+    })['draft_order']
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+import threading
+import httpx
+from dotenv import load_dotenv
+load_dotenv()
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+PASSWORD = os.environ.get('SHOPIFY_TOKEN', '')
+SHOP_NAME = os.environ.get('SHOPIFY_SHOP', '')
+API_VERSION = os.environ.get('SHOPIFY_API_VERSION', '2024-04')
+
+# point the client at a local stand-in server (see test/shopify_stub_server.py) for tests and benchmarks
+API_BASE_URL = os.environ.get('SHOPIFY_API_BASE_URL', '')
+
+MAX_CONNECTIONS = int(os.environ.get('SHOPIFY_MAX_CONNECTIONS', '20'))
+TIMEOUT_SECONDS = float(os.environ.get('SHOPIFY_TIMEOUT_SECONDS', '10'))
+MAX_RATE_LIMIT_RETRIES = 2
+
+
+class ShopifyAPIError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Shopify API returned {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class ShopifyClient:
+    """Client for the Shopify Admin REST and GraphQL APIs.
+
+    Holds one pooled keep-alive connection set per process. The sync client is thread safe and
+    used by the tools running on the tool thread pool, the async client is used from the event
+    loop. Unlike the ShopifyAPI resources there is no global session state, so concurrent
+    conversations never interfere with each other.
+    """
+
+    def __init__(self, base_url: str, token: str):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {
+            'X-Shopify-Access-Token': token,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        self.limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=self.headers,
+            limits=self.limits,
+            timeout=TIMEOUT_SECONDS,
+        )
+        self._async_client = None
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=self.limits,
+                timeout=TIMEOUT_SECONDS,
+            )
+        return self._async_client
+
+    @staticmethod
+    def _parse(response: httpx.Response):
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('errors', response.text)
+            except ValueError:
+                message = response.text
+            raise ShopifyAPIError(response.status_code, message)
+        if not response.content:
+            return {}
+        return response.json()
+
+    def request(self, method: str, path: str, **kwargs):
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response = self.client.request(method, path, **kwargs)
+            if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                return self._parse(response)
+            retry_after = float(response.headers.get('Retry-After', '1'))
+            logger.warning(f"Shopify rate limit hit on {method} {path}, retrying in {retry_after}s")
+            time.sleep(retry_after)
+
+    async def arequest(self, method: str, path: str, **kwargs):
+        response = await self.async_client.request(method, path, **kwargs)
+        return self._parse(response)
+
+    def get(self, path: str, params: dict = None):
+        return self.request('GET', path, params=params)
+
+    def post(self, path: str, json: dict):
+        return self.request('POST', path, json=json)
+
+    def put(self, path: str, json: dict = None):
+        return self.request('PUT', path, json=json or {})
+
+    def delete(self, path: str):
+        return self.request('DELETE', path)
+
+    def graphql(self, query: str, variables: dict = None):
+        response = self.post('graphql.json', json={'query': query, 'variables': variables or {}})
+        if response.get('errors'):
+            raise ShopifyAPIError(200, response['errors'])
+        return response['data']
+
+    async def agraphql(self, query: str, variables: dict = None):
+        response = await self.arequest('POST', 'graphql.json', json={'query': query, 'variables': variables or {}})
+        if response.get('errors'):
+            raise ShopifyAPIError(200, response['errors'])
+        return response['data']
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_shopify_client() -> ShopifyClient:
+    """Returns the process wide Shopify client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not API_BASE_URL and (not PASSWORD or not SHOP_NAME):
+                    raise ValueError("SHOPIFY_TOKEN and SHOPIFY_SHOP environment variables must be set.")
+                base_url = API_BASE_URL or f"https://{SHOP_NAME}.myshopify.com/admin/api/{API_VERSION}"
+                _client = ShopifyClient(base_url, PASSWORD)
+    return _client
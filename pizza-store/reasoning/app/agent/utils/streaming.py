@@ -0,0 +1,138 @@
+import re
+
+# a sentence ends on . ! or ? (optionally followed by closing quotes/brackets) and then whitespace
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+["\')\]]*\s+')
+
+JSON_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class JsonStringFieldExtractor:
+    """Incrementally extracts the value of a top level string field from a streamed JSON object.
+
+    Feed the raw text deltas of the completion as they arrive. Each call returns the newly
+    decoded characters of the field value, so the caller never has to wait for valid JSON.
+
+    Example:
+    >>> extractor = JsonStringFieldExtractor('response')
+    >>> extractor.feed('{"reason": "x", "resp')
+    ''
+    >>> extractor.feed('onse": "Hi the')
+    'Hi the'
+    >>> extractor.feed('re!"}')
+    're!'
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.value = ''
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = None
+        self._string = []
+        self._last_key = None
+        self._expect_key = False
+        self._capturing = False
+
+    def feed(self, text: str) -> str:
+        emitted = []
+        for char in text:
+            if self._in_string:
+                decoded = self._consume_string_char(char)
+                if decoded is None:
+                    continue
+                if self._capturing:
+                    emitted.append(decoded)
+                else:
+                    self._string.append(decoded)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string = []
+                self._capturing = (
+                    not self._expect_key
+                    and self._depth == 1
+                    and self._last_key == self.field
+                    and not self.done
+                )
+            elif char in '{[':
+                self._depth += 1
+                self._expect_key = char == '{' and self._depth == 1
+            elif char in '}]':
+                self._depth -= 1
+            elif char == ',' and self._depth == 1:
+                self._expect_key = True
+            elif char == ':' and self._depth == 1:
+                self._expect_key = False
+
+        chunk = ''.join(emitted)
+        self.value += chunk
+        return chunk
+
+    def _consume_string_char(self, char):
+        """Returns the decoded character, or None when the character does not produce output."""
+        if self._escape is not None:
+            self._escape += char
+            if self._escape.startswith('u'):
+                if len(self._escape) < 5:
+                    return None
+                decoded = chr(int(self._escape[1:], 16))
+            else:
+                decoded = JSON_ESCAPES.get(self._escape, self._escape)
+            self._escape = None
+            return decoded
+        if char == '\\':
+            self._escape = ''
+            return None
+        if char == '"':
+            self._close_string()
+            return None
+        return char
+
+    def _close_string(self):
+        self._in_string = False
+        if self._capturing:
+            self._capturing = False
+            self.done = True
+        elif self._expect_key and self._depth == 1:
+            self._last_key = ''.join(self._string)
+            self._expect_key = False
+
+
+class SentenceChunker:
+    """Groups streamed text into sentence sized chunks for text to speech."""
+
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self._buffer = ''
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        chunks = []
+        search_from = 0
+        while True:
+            match = SENTENCE_END_PATTERN.search(self._buffer, search_from)
+            if not match:
+                break
+            # keep very short sentences ("Sure.") together with the next one
+            if match.end() < self.min_chars:
+                search_from = match.end()
+                continue
+            chunks.append(self._buffer[:match.end()].strip())
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+        return chunks
+
+    def flush(self) -> str:
+        chunk, self._buffer = self._buffer.strip(), ''
+        return chunk
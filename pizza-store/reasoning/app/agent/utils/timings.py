@@ -0,0 +1,156 @@
+import time
+import contextvars
+from dataclasses import dataclass, field, asdict
+from .metrics import registry
+
+NODE_DURATION = registry.histogram(
+    'xrx_node_duration_seconds', 'Time a node spent processing, from its start to its last result.', ('node',)
+)
+NODE_QUEUE = registry.histogram(
+    'xrx_node_queue_seconds', 'Time from scheduling a node until it started running on the event loop.', ('node',)
+)
+LLM_CALL_DURATION = registry.histogram(
+    'xrx_llm_call_duration_seconds', 'Duration of the LLM calls of a node, streamed calls until their last chunk.', ('node',)
+)
+TOOL_CALL_DURATION = registry.histogram(
+    'xrx_tool_call_duration_seconds', 'Duration of the tool calls, including the wait for a tool slot.', ('tool',)
+)
+TURN_DURATION = registry.histogram('xrx_turn_duration_seconds', 'Duration of the graph traversal of a turn.')
+
+
+@dataclass
+class CallSpan:
+    """An LLM or tool call made by a node run, times in seconds since the start of the turn."""
+    kind: str
+    name: str
+    started_at: float
+    seconds: float
+
+
+@dataclass
+class NodeRun:
+    """The timing of one run of a node within a turn, times in seconds.
+
+    Runs form the span tree of the turn: the parent of a run is the run whose `get_successors`
+    started it, or which started it speculatively. Runs of the starting node have no parent.
+    """
+    node: str
+    span_id: int
+    parent_id: int
+    # since the start of the turn
+    started_at: float
+    queue_seconds: float
+    # speculative runs are started ahead of time and may never be committed
+    speculative: bool = False
+    ended_at: float = None
+    wall_seconds: float = 0.0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: int = 0
+    tool_seconds: float = 0.0
+    calls: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            key: round(value, 4) if isinstance(value, float) else value
+            for key, value in asdict(self).items()
+            if key != 'calls'
+        }
+
+
+class TurnTimings:
+    """Where the time of a turn went: a NodeRun per node run, in the order the nodes started.
+
+    The traversal starts and finishes the node runs; LLM and tool calls are added to the run of
+    the node making them through `node_run_var`. Every measurement also goes to the process
+    metrics in `agent.utils.metrics`, and the runs can be exported as a trace of the turn
+    (`agent.utils.trace_export`).
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        # wall clock start, for trace formats with absolute timestamps
+        self.started_at_unix_ns = time.time_ns()
+        self.runs = []
+        self.finished_at = None
+
+    def start_node(self, node: str, scheduled_at: float, parent: NodeRun = None, speculative: bool = False) -> NodeRun:
+        """Starts the run of a node in the current task, `scheduled_at` is when it was scheduled."""
+        now = time.perf_counter()
+        parent_id = parent.span_id if parent is not None else None
+        run = NodeRun(node, len(self.runs) + 1, parent_id, now - self.started_at, now - scheduled_at, speculative)
+        self.runs.append(run)
+        NODE_QUEUE.observe(run.queue_seconds, node=node)
+        node_run_var.set(run)
+        return run
+
+    def finish_node(self, run: NodeRun):
+        if run.ended_at is not None:
+            return
+        run.ended_at = time.perf_counter() - self.started_at
+        run.wall_seconds = run.ended_at - run.started_at
+        NODE_DURATION.observe(run.wall_seconds, node=run.node)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        TURN_DURATION.observe(self.finished_at - self.started_at)
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def breakdown(self) -> dict:
+        """The timing breakdown of the turn so far."""
+        return {
+            'elapsed_seconds': round(self.seconds, 4),
+            'llm_seconds': round(sum(run.llm_seconds for run in self.runs), 4),
+            'tool_seconds': round(sum(run.tool_seconds for run in self.runs), 4),
+            'prompt_tokens': sum(run.prompt_tokens for run in self.runs),
+            'completion_tokens': sum(run.completion_tokens for run in self.runs),
+            'nodes': [run.as_dict() for run in self.runs],
+        }
+
+
+turn_timings_var = contextvars.ContextVar('turn_timings', default=None)
+node_run_var = contextvars.ContextVar('node_run', default=None)
+
+
+def start_turn_timings() -> TurnTimings:
+    """Starts timing a turn, nodes started afterwards record their runs in it."""
+    timings = TurnTimings()
+    turn_timings_var.set(timings)
+    return timings
+
+
+def _add_call(run: NodeRun, kind: str, name: str, seconds: float):
+    timings = turn_timings_var.get()
+    if timings is not None:
+        started_at = time.perf_counter() - seconds - timings.started_at
+        run.calls.append(CallSpan(kind, name, started_at, seconds))
+
+
+def record_llm_call(node: str, seconds: float, model: str = ''):
+    LLM_CALL_DURATION.observe(seconds, node=node)
+    run = node_run_var.get()
+    if run is not None:
+        run.llm_calls += 1
+        run.llm_seconds += seconds
+        _add_call(run, 'llm', model or node, seconds)
+
+
+def record_llm_tokens(prompt_tokens: int, completion_tokens: int):
+    run = node_run_var.get()
+    if run is not None:
+        run.prompt_tokens += prompt_tokens
+        run.completion_tokens += completion_tokens
+
+
+def record_tool_call(tool: str, seconds: float):
+    TOOL_CALL_DURATION.observe(seconds, tool=tool)
+    run = node_run_var.get()
+    if run is not None:
+        run.tool_calls += 1
+        run.tool_seconds += seconds
+        _add_call(run, 'tool', tool, seconds)
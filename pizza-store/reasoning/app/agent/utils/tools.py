@@ -0,0 +1,74 @@
+import inspect
+import typing
+
+# values the LLM tends to produce for a parameter which can safely be converted to the annotated type
+COERCIBLE_TYPES = (int, float, str, bool)
+
+
+def _coerce(value, annotation):
+    """Converts a single value to the annotated type. Raises ValueError when it cannot be done safely."""
+    if annotation is inspect.Parameter.empty or annotation is typing.Any:
+        return value
+
+    # Optional[X] / X | None
+    args = typing.get_args(annotation)
+    if args and type(None) in args:
+        if value is None:
+            return None
+        non_none = [a for a in args if a is not type(None)]
+        if len(non_none) == 1:
+            return _coerce(value, non_none[0])
+        return value
+
+    if annotation not in COERCIBLE_TYPES:
+        return value
+    if isinstance(value, annotation) and not (annotation is int and isinstance(value, bool)):
+        return value
+    if annotation is int:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+            return int(value.strip())
+    elif annotation is float:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            return float(value.strip())
+    elif annotation is str:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+    elif annotation is bool:
+        if isinstance(value, str) and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+    raise ValueError(f"expected {annotation.__name__}, got {type(value).__name__} {value!r}")
+
+
+def validate_tool_parameters(signature: inspect.Signature, parameters: dict):
+    """Validates LLM produced parameters against a tool signature.
+
+    Args:
+    signature (inspect.Signature): The signature of the tool function.
+    parameters (dict): The parameters produced by the LLM.
+
+    Returns:
+    A tuple of the parameters converted to the annotated types and a list of validation errors.
+    The parameters are only safe to use when the list of errors is empty.
+    """
+    if not isinstance(parameters, dict):
+        return {}, [f"parameters must be a JSON object, got {type(parameters).__name__}"]
+
+    errors = []
+    validated = {}
+    for name in parameters:
+        if name not in signature.parameters:
+            errors.append(f"unknown parameter '{name}'")
+    for name, param in signature.parameters.items():
+        if name not in parameters:
+            if param.default is inspect.Parameter.empty:
+                errors.append(f"missing required parameter '{name}'")
+            continue
+        try:
+            validated[name] = _coerce(parameters[name], param.annotation)
+        except (TypeError, ValueError) as e:
+            errors.append(f"parameter '{name}': {e}")
+    return validated, errors
@@ -0,0 +1,144 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+from agent.config import turn_trace_export, turn_trace_dir
+from .timings import TurnTimings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+SERVICE_NAME = 'pizza-store-reasoning'
+# span id of the turn itself, node runs are numbered from 1
+TURN_SPAN_ID = 0
+
+
+def _run_end(timings: TurnTimings, run) -> float:
+    return run.ended_at if run.ended_at is not None else timings.seconds
+
+
+def _lanes(timings: TurnTimings) -> dict:
+    """Assigns every node run a lane where it does not overlap another run, for trace viewers."""
+    lane_ends = []
+    lanes = {}
+    for run in sorted(timings.runs, key=lambda run: run.started_at):
+        for lane, end in enumerate(lane_ends):
+            if end <= run.started_at:
+                break
+        else:
+            lane = len(lane_ends)
+            lane_ends.append(0.0)
+        lane_ends[lane] = _run_end(timings, run)
+        lanes[run.span_id] = lane + 1
+    return lanes
+
+
+def chrome_trace(timings: TurnTimings, task_id: str) -> dict:
+    """The turn as Chrome trace events, viewable in chrome://tracing or Perfetto.
+
+    The turn is on lane 0, node runs on the lanes from 1 with their LLM and tool calls nested
+    in them. Span and parent ids are in the args of each node run.
+    """
+    def us(seconds):
+        return round(seconds * 1e6)
+
+    events = [{
+        'name': 'turn', 'cat': 'turn', 'ph': 'X', 'ts': 0, 'dur': us(timings.seconds), 'pid': 1, 'tid': 0,
+        'args': {'task_id': task_id, 'span_id': TURN_SPAN_ID},
+    }]
+    lanes = _lanes(timings)
+    for run in timings.runs:
+        events.append({
+            'name': run.node, 'cat': 'node', 'ph': 'X', 'ts': us(run.started_at),
+            'dur': us(_run_end(timings, run) - run.started_at), 'pid': 1, 'tid': lanes[run.span_id],
+            'args': {**run.as_dict(), 'parent_id': run.parent_id if run.parent_id is not None else TURN_SPAN_ID},
+        })
+        for call in run.calls:
+            events.append({
+                'name': call.name, 'cat': call.kind, 'ph': 'X', 'ts': us(call.started_at), 'dur': us(call.seconds),
+                'pid': 1, 'tid': lanes[run.span_id], 'args': {'node_span_id': run.span_id},
+            })
+    return {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'task_id': task_id, 'started_at_unix_ns': timings.started_at_unix_ns},
+    }
+
+
+def _otlp_attributes(values: dict) -> list:
+    attributes = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            attributes.append({'key': key, 'value': {'boolValue': value}})
+        elif isinstance(value, int):
+            attributes.append({'key': key, 'value': {'intValue': str(value)}})
+        elif isinstance(value, float):
+            attributes.append({'key': key, 'value': {'doubleValue': value}})
+        else:
+            attributes.append({'key': key, 'value': {'stringValue': str(value)}})
+    return attributes
+
+
+def otlp_trace(timings: TurnTimings, task_id: str) -> dict:
+    """The turn as an OTLP/JSON trace export request, with a span for the turn, its node runs and their calls."""
+    trace_id = uuid.uuid4().hex
+    start_ns = timings.started_at_unix_ns
+
+    def span_id(number):
+        return f'{number + 1:016x}'
+
+    def span(name, number, parent, started_at, ended_at, attributes):
+        return {
+            'traceId': trace_id,
+            'spanId': span_id(number),
+            'parentSpanId': span_id(parent) if parent is not None else '',
+            'name': name,
+            'kind': 1,
+            'startTimeUnixNano': str(start_ns + round(started_at * 1e9)),
+            'endTimeUnixNano': str(start_ns + round(ended_at * 1e9)),
+            'attributes': _otlp_attributes(attributes),
+        }
+
+    spans = [span('turn', TURN_SPAN_ID, None, 0.0, timings.seconds, {'xrx.kind': 'turn', 'xrx.task_id': task_id})]
+    # call spans are numbered after the node runs
+    number = len(timings.runs)
+    for run in timings.runs:
+        attributes = {f'xrx.{key}': value for key, value in run.as_dict().items() if value is not None}
+        parent = run.parent_id if run.parent_id is not None else TURN_SPAN_ID
+        spans.append(span(run.node, run.span_id, parent, run.started_at, _run_end(timings, run), {'xrx.kind': 'node', **attributes}))
+        for call in run.calls:
+            number += 1
+            spans.append(span(call.name, number, run.span_id, call.started_at, call.started_at + call.seconds, {'xrx.kind': call.kind}))
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+            'scopeSpans': [{'scope': {'name': 'agent.graph'}, 'spans': spans}],
+        }]
+    }
+
+
+TRACE_FORMATS = {'chrome': chrome_trace, 'otlp': otlp_trace}
+
+
+def _write_trace(path: str, trace: dict):
+    # runs on an executor thread whose future nobody awaits, so failures are logged here
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+    except Exception:
+        logger.exception(f"Failed to write the trace {path}")
+
+
+def export_turn_trace(timings: TurnTimings, task_id: str):
+    """Writes the trace of a finished turn in the `turn_trace_export` format, without blocking the turn."""
+    if turn_trace_export not in TRACE_FORMATS:
+        return
+    try:
+        trace = TRACE_FORMATS[turn_trace_export](timings, task_id)
+        name = f"{timings.started_at_unix_ns}-{task_id or uuid.uuid4().hex}.{turn_trace_export}.json"
+        asyncio.get_running_loop().run_in_executor(None, _write_trace, os.path.join(turn_trace_dir, name), trace)
+    except Exception:
+        logger.exception(f"Failed to export the trace of task {task_id}")
@@ -0,0 +1,96 @@
+import logging
+from dataclasses import dataclass
+from .metrics import registry
+from .timings import record_llm_tokens
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+@dataclass
+class NodeUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    # calls which were served at least partly from the provider prompt cache
+    cache_hits: int = 0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cache_hits / self.calls if self.calls else 0.0
+
+    @property
+    def cached_token_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+def cached_tokens_from_usage(usage) -> int:
+    """Returns the prompt tokens served from the provider prompt cache.
+
+    OpenAI compatible providers report them in `prompt_tokens_details.cached_tokens`,
+    others as `prompt_cache_hit_tokens`. Providers without prompt caching report neither.
+    """
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', None) if details is not None else None
+    if cached_tokens is None:
+        cached_tokens = getattr(usage, 'prompt_cache_hit_tokens', None)
+    return cached_tokens or 0
+
+
+class UsageTracker:
+    """Token usage and prompt cache hits of the LLM calls, per node."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def record(self, node: str, usage) -> NodeUsage:
+        stats = self.nodes.setdefault(node, NodeUsage())
+        cached_tokens = cached_tokens_from_usage(usage)
+        stats.calls += 1
+        stats.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+        stats.completion_tokens += getattr(usage, 'completion_tokens', 0) or 0
+        stats.cached_tokens += cached_tokens
+        stats.cache_hits += 1 if cached_tokens else 0
+        logger.info(
+            f"{node} LLM usage: prompt_tokens={getattr(usage, 'prompt_tokens', 0)} "
+            f"completion_tokens={getattr(usage, 'completion_tokens', 0)} cached_tokens={cached_tokens} "
+            f"node_cache_hit_rate={stats.cache_hit_rate:.2f} node_cached_token_ratio={stats.cached_token_ratio:.2f}"
+        )
+        return stats
+
+    def summary(self) -> dict:
+        return {
+            node: {
+                'calls': stats.calls,
+                'prompt_tokens': stats.prompt_tokens,
+                'completion_tokens': stats.completion_tokens,
+                'cached_tokens': stats.cached_tokens,
+                'cache_hit_rate': round(stats.cache_hit_rate, 4),
+                'cached_token_ratio': round(stats.cached_token_ratio, 4),
+            }
+            for node, stats in self.nodes.items()
+        }
+
+
+usage_tracker = UsageTracker()
+
+
+@registry.collector
+def usage_metrics():
+    nodes = usage_tracker.nodes.items()
+    yield 'xrx_llm_calls_total', 'counter', 'LLM calls with reported usage.', [({'node': node}, stats.calls) for node, stats in nodes]
+    yield 'xrx_llm_tokens_total', 'counter', 'Tokens of the LLM calls.', [
+        ({'node': node, 'type': token_type}, getattr(stats, f'{token_type}_tokens'))
+        for node, stats in nodes
+        for token_type in ('prompt', 'completion', 'cached')
+    ]
+
+
+def record_llm_usage(node: str, response):
+    """Records the usage of a chat completion, or of the streamed chunk which carries it."""
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        usage_tracker.record(node, usage)
+        record_llm_tokens(getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0)
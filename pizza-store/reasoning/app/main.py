@@ -1,9 +1,22 @@
-from agent_framework import xrx_reasoning, initialize_async_llm_client
+import asyncio
+from fastapi.responses import PlainTextResponse
+from agent_framework import xrx_reasoning
 from agent.executor import run_agent
-
-# The rest of the code remains the same
-llm_client = initialize_async_llm_client()
+from agent.utils.metrics import registry
+from agent.utils.catalog import catalog
 
 
 app = xrx_reasoning(run_agent=run_agent)()
 
+
+@app.get('/metrics')
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+@app.post('/catalog/invalidate')
+async def invalidate_catalog():
+    # drops the shared redis snapshot too, which is a blocking call
+    await asyncio.to_thread(catalog.invalidate)
+    return {'status': 'invalidated'}
+
@@ -0,0 +1,167 @@
+"""Offline critical path analysis of the turn traces exported by the reasoning agent.
+
+Reads the Chrome trace or OTLP JSON files written with TURN_TRACE_EXPORT and reports,
+across every turn:
+* critical path length: from the start of the turn to the end of the node run which
+  finished last, following the successor edges of the span tree
+* the most common critical paths
+* per node: how often it is on the critical path, its duration and its parallel slack,
+  the time it could have taken longer without delaying the turn
+
+Speculative runs are left out of the critical path, a committed speculation is on it
+through the run of the node which replayed it.
+
+Usage:
+    python analyze_traces.py ../reasoning/app/turn-traces --top 5
+"""
+import argparse
+import glob
+import json
+import os
+from collections import Counter, defaultdict
+
+
+def load_chrome(data):
+    spans = []
+    for event in data['traceEvents']:
+        if event.get('cat') != 'node':
+            continue
+        args = event['args']
+        spans.append({
+            'id': args['span_id'],
+            # 0 is the turn itself
+            'parent': args['parent_id'] or None,
+            'node': event['name'],
+            'start': event['ts'] / 1e6,
+            'end': (event['ts'] + event['dur']) / 1e6,
+            'speculative': args.get('speculative', False),
+        })
+    return spans
+
+
+def load_otlp(data):
+    raw = [span for resource in data['resourceSpans'] for scope in resource['scopeSpans'] for span in scope['spans']]
+    kinds = {span['spanId']: attribute_values(span).get('xrx.kind') for span in raw}
+    turn = next(span for span in raw if kinds[span['spanId']] == 'turn')
+    turn_start = int(turn['startTimeUnixNano'])
+    spans = []
+    for span in raw:
+        if kinds[span['spanId']] != 'node':
+            continue
+        parent = span.get('parentSpanId') or None
+        spans.append({
+            'id': span['spanId'],
+            'parent': parent if parent != turn['spanId'] else None,
+            'node': span['name'],
+            'start': (int(span['startTimeUnixNano']) - turn_start) / 1e9,
+            'end': (int(span['endTimeUnixNano']) - turn_start) / 1e9,
+            'speculative': attribute_values(span).get('xrx.speculative', False),
+        })
+    return spans
+
+
+def attribute_values(span):
+    return {attribute['key']: next(iter(attribute['value'].values())) for attribute in span.get('attributes', [])}
+
+
+def load_trace(path):
+    with open(path) as f:
+        data = json.load(f)
+    return load_chrome(data) if 'traceEvents' in data else load_otlp(data)
+
+
+def analyze_turn(spans):
+    """The critical path of a turn, its length and the slack of every node run."""
+    runs = {span['id']: span for span in spans if not span['speculative']}
+    children = defaultdict(list)
+    roots = []
+    for span in runs.values():
+        if span['parent'] in runs:
+            children[span['parent']].append(span)
+        else:
+            roots.append(span)
+
+    subtree_ends = {}
+
+    def subtree_end(span):
+        if span['id'] not in subtree_ends:
+            subtree_ends[span['id']] = max([span['end']] + [subtree_end(child) for child in children[span['id']]])
+        return subtree_ends[span['id']]
+
+    if not roots:
+        return None
+    span = max(roots, key=subtree_end)
+    length = subtree_end(span)
+    path = [span]
+    while children[span['id']]:
+        child = max(children[span['id']], key=subtree_end)
+        if subtree_end(child) <= span['end']:
+            break
+        span = child
+        path.append(span)
+
+    # the part of the critical path not spent in a node: scheduling, successor choice and status checks
+    gap = length - sum(span['end'] - span['start'] for span in path)
+    slack = {span['id']: length - subtree_end(span) for span in runs.values()}
+    return {'length': length, 'path': path, 'gap': gap, 'slack': slack, 'runs': runs}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+def report(turns, top):
+    lengths = [turn['length'] for turn in turns]
+    gaps = [turn['gap'] for turn in turns]
+    print(f"Turns: {len(turns)}")
+    print(
+        f"Critical path length: p50 {percentile(lengths, 0.5) * 1000:.1f} ms, "
+        f"p90 {percentile(lengths, 0.9) * 1000:.1f} ms, max {max(lengths) * 1000:.1f} ms"
+    )
+    print(f"Time between nodes on the critical path: p50 {percentile(gaps, 0.5) * 1000:.1f} ms, p90 {percentile(gaps, 0.9) * 1000:.1f} ms")
+
+    print("\nMost common critical paths:")
+    paths = Counter(' > '.join(span['node'] for span in turn['path']) for turn in turns)
+    for path, count in paths.most_common(top):
+        print(f"  {count / len(turns):6.1%}  {path}")
+
+    durations = defaultdict(list)
+    slacks = defaultdict(list)
+    critical = Counter()
+    for turn in turns:
+        on_path = {span['id'] for span in turn['path']}
+        for span_id, span in turn['runs'].items():
+            durations[span['node']].append(span['end'] - span['start'])
+            critical[span['node']] += span_id in on_path
+            if span_id not in on_path:
+                slacks[span['node']].append(turn['slack'][span_id])
+
+    print(f"\n{'node':<26}{'runs':>6}{'critical':>10}{'p50 ms':>9}{'p90 ms':>9}{'slack p50 ms':>14}")
+    for node in sorted(durations, key=lambda node: -critical[node]):
+        runs = len(durations[node])
+        slack = f"{percentile(slacks[node], 0.5) * 1000:.1f}" if slacks[node] else '-'
+        print(
+            f"{node:<26}{runs:>6}{critical[node] / runs:>10.1%}"
+            f"{percentile(durations[node], 0.5) * 1000:>9.1f}{percentile(durations[node], 0.9) * 1000:>9.1f}{slack:>14}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='trace files or directories of trace files')
+    parser.add_argument('--top', type=int, default=5, help='number of critical paths to list')
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.json'))) if os.path.isdir(path) else [path])
+    turns = [turn for turn in (analyze_turn(load_trace(path)) for path in files) if turn is not None]
+    if not turns:
+        print("No turns found")
+        return
+    report(turns, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Shared helpers for the reasoning agent microbenchmarks.
+
+The benchmarks import the reasoning app directly, so run them from the
+`test/benchmarks` directory with the same `.env` as the reasoning agent and
+the `xrx-core` submodule checked out.
+"""
+import os
+import sys
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REASONING_APP_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..', 'reasoning', 'app'))
+XRX_CORE_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..', 'xrx-core'))
+
+for path in (REASONING_APP_DIR, XRX_CORE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class InMemoryRedis:
+    """Async stand-in for the task status keys so engine timings exclude redis round trips."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value):
+        self.store[key] = value.encode('utf-8') if isinstance(value, str) else value
+        return True
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, values, unit='ms', scale=1000.0):
+    scaled = [v * scale for v in values]
+    print(
+        f"{name:<40} "
+        f"mean={statistics.mean(scaled):8.3f}{unit} "
+        f"p50={percentile(scaled, 50):8.3f}{unit} "
+        f"p99={percentile(scaled, 99):8.3f}{unit} "
+        f"n={len(scaled)}"
+    )
@@ -0,0 +1,99 @@
+"""Microbenchmark for the serialization of the agent stream events.
+
+Compares the previous path of a graph result to the stream (json.dumps in agent_graph,
+json.loads and json.dumps again in the executor, widget details as a JSON string inside
+the event) with building an AgentEvent and encoding it once, for a product list widget
+event and a streamed response chunk.
+
+Usage:
+    python event_benchmark.py --iterations 2000 --products 25
+"""
+import argparse
+import json
+import logging
+import time
+
+import bench_utils
+from agent.graph.memory import Memory
+from agent.utils.events import AgentEvent, orjson
+
+SESSION = {'guid': 'bench-session', 'cart_id': 'gid://shopify/DraftOrder/1234567890', 'summary': 'x' * 500}
+
+
+def make_results(products):
+    product_list = [
+        {
+            'product_id': 8498162335994 + i,
+            'product_title': f'Pizza {i}',
+            'product_variants': [{'variant_id': 46198934175994 + j, 'variant_name': f'Size {j}', 'price': '12.95'} for j in range(4)],
+            'image': f'https://cdn.shopify.com/s/files/pizza-{i}.png',
+        }
+        for i in range(products)
+    ]
+    memory = Memory.of({
+        'tool-output-cache': [{'tool': 'get_products', 'description': f'Calling get_products returned {products} products.'}]
+    })
+    widget = {'node': 'Widget', 'reason': 'hard coded widget creation', 'memory': memory, 'output': {
+        'type': 'shopify-product-list',
+        'details': product_list,
+    }}
+    chunk = {'node': 'CustomerResponse', 'reason': 'ok', 'output': 'We have pizza. ', 'response': 'We have pizza. ' * 4, 'final': False, 'memory': memory}
+    return widget, chunk
+
+
+def format_messages(result):
+    tool_output_cache = result.get('memory', {}).get('tool-output-cache', [])
+    content = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
+    return [{'role': 'assistant', 'content': content}]
+
+
+def legacy_event(result):
+    if result['node'] == 'Widget':
+        result = {**result, 'output': {**result['output'], 'details': json.dumps(result['output']['details'])}}
+    # agent_graph encoded every result, the executor decoded it to build the event
+    result = json.loads(json.dumps(result))
+    return json.dumps({
+        'messages': format_messages(result),
+        'session': SESSION,
+        'node': result.get('node', ''),
+        'output': result.get('output', ''),
+        'reason': result.get('reason', ''),
+        'final': result.get('final', True),
+    })
+
+
+def typed_event(result):
+    return AgentEvent(
+        node=result.get('node', ''),
+        output=result.get('output', ''),
+        reason=result.get('reason', ''),
+        final=result.get('final', True),
+        messages=format_messages(result),
+        session=SESSION,
+    ).encode()
+
+
+def measure(encode, result, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        encode(result)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(args):
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}")
+    widget, chunk = make_results(args.products)
+    for name, result in (('widget', widget), ('response chunk', chunk)):
+        bench_utils.summarize(f'double encoded {name} event', measure(legacy_event, result, args.iterations))
+        bench_utils.summarize(f'encoded once {name} event', measure(typed_event, result, args.iterations))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=25)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    main(args)
@@ -0,0 +1,136 @@
+"""Microbenchmark for the payload logging of one turn.
+
+Replays the payload log calls of a turn (Routing, ChooseTool, IdentifyToolParams,
+ExecuteTool, ConvertNaturalLanguage, Routing, a streamed CustomerResponse and the
+traversal logging every result) for conversations of growing length, and measures the
+CPU time per turn of the previous f-string and pformat logging against the `verbose`,
+`structured` and `off` payload logging modes. Records go to a handler which formats them
+and discards the text, so the numbers exclude disk I/O.
+
+Usage:
+    python logging_benchmark.py --iterations 100 --sizes 50 200 500
+"""
+import argparse
+import logging
+import time
+from pprint import pformat
+
+import bench_utils
+from agent.graph.memory import Memory
+from agent.utils import payload_logging
+from agent.utils.payload_logging import log_payload
+
+# streamed CustomerResponse chunks of a turn, each of them is a traversal result
+RESPONSE_CHUNKS = 12
+
+
+class DiscardingStream:
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def make_logger():
+    logger = logging.getLogger('logging_benchmark')
+    handler = logging.StreamHandler(DiscardingStream())
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def make_turn(size):
+    messages = [
+        {
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': f"Message {i}: could I get a large pepperoni pizza with extra cheese and a side of garlic knots?",
+        }
+        for i in range(size)
+    ]
+    memory = Memory.of({
+        'tool-output-cache': [
+            {'tool': 'get_products', 'description': 'Calling get_products returned 25 products.', 'output': 'x' * 2000}
+            for _ in range(max(size // 10, 1))
+        ]
+    })
+    input = {'memory': memory, 'tool': 'add_item_to_cart', 'parameters': {'variant_id': 1234, 'quantity': 1}}
+    output = {'reason': 'The customer asked for a pizza ' * 5, 'tool': 'add_item_to_cart', 'parameters': {'quantity': 1}}
+    results = [{'node': 'Routing', 'reason': 'ok', 'output': 'ChooseTool', 'memory': memory}]
+    results += [
+        {'node': 'CustomerResponse', 'reason': 'ok', 'output': 'chunk ', 'response': 'chunk ' * i, 'final': False, 'memory': memory}
+        for i in range(RESPONSE_CHUNKS)
+    ]
+    return messages, input, output, memory, results
+
+
+def legacy_turn(logger, messages, input, output, memory, results):
+    logger.info(f"Router processing messages: {messages}")
+    logger.info(f"Router processing input: {input}")
+    logger.info(f"Routing output: {output}")
+    logger.info(f"ChooseTool processing messages: {messages}")
+    logger.info(f"ChooseTool processing input: {pformat(input, indent=2, width=100)}")
+    logger.info(f"ChooseTool tool_output: {output}")
+    logger.info(f"IdentifyToolParams for tool {input} processing messages: {messages}")
+    logger.info(f"IdentifyToolParams output: {output}")
+    logger.info(f"ExecuteTool is executing input {input}")
+    logger.info(f"ExecuteTool finished processing Tool output: {output}")
+    logger.info(f"ConvertNaturalLanguage messages: {messages}")
+    logger.info(f"ConvertNaturalLanguage input: {input}")
+    logger.info(f"ConvertNaturalLanguage output: {output}")
+    logger.info(f"ConvertNaturalLanguage memory: {memory}")
+    logger.info(f"Router processing messages: {messages}")
+    logger.info(f"Router processing input: {input}")
+    logger.info(f"Routing output: {output}")
+    logger.info(f"CustomerResponse processing messages: {messages}")
+    for result in results:
+        logger.info(f"Yielding result from traverse:\n{pformat(result, indent=2, width=100)}")
+        logger.info(f"Result: {result}")
+
+
+def payload_turn(logger, messages, input, output, memory, results):
+    log_payload(logger, 'Routing', 'processing', messages=messages, input=input)
+    log_payload(logger, 'Routing', 'output', output=output)
+    log_payload(logger, 'ChooseTool', 'processing', messages=messages, input=input)
+    log_payload(logger, 'ChooseTool', 'output', tool_output=output)
+    log_payload(logger, 'IdentifyToolParams', 'processing', input=input, messages=messages)
+    log_payload(logger, 'IdentifyToolParams', 'output', output=output)
+    log_payload(logger, 'ExecuteTool', 'processing', input=input)
+    log_payload(logger, 'ExecuteTool', 'output', tool_output=output)
+    log_payload(logger, 'ConvertNaturalLanguage', 'processing', messages=messages, input=input)
+    log_payload(logger, 'ConvertNaturalLanguage', 'output', output=output)
+    log_payload(logger, 'ConvertNaturalLanguage', 'memory', memory=memory)
+    log_payload(logger, 'Routing', 'processing', messages=messages, input=input)
+    log_payload(logger, 'Routing', 'output', output=output)
+    log_payload(logger, 'CustomerResponse', 'processing', messages=messages)
+    for result in results:
+        log_payload(logger, result['node'], 'result', result=result)
+
+
+def measure(turn, logger, payloads, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        turn(logger, *payloads)
+        timings.append(time.process_time() - start)
+    return timings
+
+
+def main(args):
+    logger = make_logger()
+    for size in args.sizes:
+        payloads = make_turn(size)
+        bench_utils.summarize(f'f-string logging ({size} messages)', measure(legacy_turn, logger, payloads, args.iterations))
+        for mode in ('verbose', 'structured', 'off'):
+            payload_logging.log_payload_mode = mode
+            bench_utils.summarize(f'{mode} payloads ({size} messages)', measure(payload_turn, logger, payloads, args.iterations))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 500])
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,87 @@
+"""Microbenchmark for prompt construction over a turn.
+
+Replays the prompt construction of one turn (Routing, ChooseTool, IdentifyToolParams,
+ConvertNaturalLanguage, Routing, CustomerResponse) for conversations of growing length and
+compares rendering the conversation in every node with the shared per-turn renderer.
+
+Usage:
+    python prompt_benchmark.py --iterations 200 --sizes 50 100 200 500
+"""
+import argparse
+import logging
+import time
+
+import bench_utils
+from agent.utils.prompts import PromptTemplate, TurnPrompt, TOOL_CACHE_PROMPT
+
+# roughly the size of the node system prompts, with the conversation in the middle
+SYSTEM_PROMPT = ('## Rules\n' + 'Keep track of previous tool calls and their results.\n' * 40) * 2
+SYSTEM_PROMPT = SYSTEM_PROMPT[:len(SYSTEM_PROMPT) // 2] + '{conversation}\n' + SYSTEM_PROMPT[len(SYSTEM_PROMPT) // 2:]
+SYSTEM_PROMPT_TEMPLATE = PromptTemplate(SYSTEM_PROMPT, ['conversation'])
+
+NODE_VISITS = 6
+# ConvertNaturalLanguage adds a tool output cache entry halfway through the turn
+TOOL_CACHE_AFTER_VISIT = 3
+
+
+def make_conversation(size):
+    return [
+        {
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': f"Message {i}: could I get a large pepperoni pizza with extra cheese and a side of garlic knots?",
+        }
+        for i in range(size)
+    ]
+
+
+def make_tool_cache(size):
+    return [
+        {'tool': 'get_products', 'description': f"Calling get_products returned {size} products with their ids and prices."}
+        for _ in range(size)
+    ]
+
+
+def legacy_turn(messages, tool_caches):
+    for tool_output_cache in tool_caches:
+        conversation = ''.join([f"{i['role']}: {i['content']}\n" for i in messages])
+        if len(tool_output_cache) > 0:
+            tool_output_cache_str = ''.join([f"* {i['tool']}: {i['description']}\n" for i in tool_output_cache])
+            conversation += TOOL_CACHE_PROMPT.replace('{tool_output_cache}', tool_output_cache_str)
+        SYSTEM_PROMPT.replace('{conversation}', conversation)
+
+
+def shared_turn(messages, tool_caches):
+    turn_prompt = TurnPrompt(messages)
+    for tool_output_cache in tool_caches:
+        conversation = turn_prompt.conversation(tool_output_cache)
+        SYSTEM_PROMPT_TEMPLATE.render(conversation=conversation)
+
+
+def measure(turn, messages, tool_caches, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        turn(messages, tool_caches)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(args):
+    for size in args.sizes:
+        messages = make_conversation(size)
+        tool_cache = make_tool_cache(size // 10)
+        tool_caches = [
+            tool_cache if visit < TOOL_CACHE_AFTER_VISIT else tool_cache + make_tool_cache(1)
+            for visit in range(NODE_VISITS)
+        ]
+        bench_utils.summarize(f'per-node rendering ({size} messages)', measure(legacy_turn, messages, tool_caches, args.iterations))
+        bench_utils.summarize(f'shared turn rendering ({size} messages)', measure(shared_turn, messages, tool_caches, args.iterations))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 500])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    main(args)
@@ -0,0 +1,80 @@
+"""Benchmark of the Shopify tools against the local stand-in Shopify server.
+
+Runs a scripted ordering conversation (menu, product details, add to cart, cart summary)
+for many concurrent sessions through the pooled Shopify client and reports the latency of
+every tool call. Use --latency-ms to simulate the round trip to Shopify.
+
+Usage:
+    python shopify_client_benchmark.py --sessions 50 --latency-ms 20
+"""
+import argparse
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_utils
+
+sys.path.insert(0, os.path.join(bench_utils.BENCHMARK_DIR, '..'))
+from shopify_stub_server import make_server
+
+
+def run_session(tools, set_session, timings):
+    with set_session({}):
+        start = time.perf_counter()
+        products = json.loads(tools.get_products())
+        timings['get_products'].append(time.perf_counter() - start)
+
+        product_id = int(next(iter(products)))
+        start = time.perf_counter()
+        details = json.loads(tools.get_product_details(product_id))
+        timings['get_product_details'].append(time.perf_counter() - start)
+
+        variant_id = details['product_variants'][0]['variant_id']
+        for _ in range(2):
+            start = time.perf_counter()
+            tools.add_item_to_cart(variant_id, 1)
+            timings['add_item_to_cart'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        tools.get_cart_summary()
+        timings['get_cart_summary'].append(time.perf_counter() - start)
+
+
+def main(args):
+    server = make_server(port=args.port, latency_ms=args.latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['SHOPIFY_API_BASE_URL'] = f'http://127.0.0.1:{args.port}/admin/api/2024-04'
+
+    from agent.tools import shopify as tools
+    from agent.context_manager import set_session
+
+    timings = {name: [] for name in ('get_products', 'get_product_details', 'add_item_to_cart', 'get_cart_summary')}
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_session, tools, set_session, timings)
+            for _ in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - wall_start
+
+    for name, values in timings.items():
+        bench_utils.summarize(name, values)
+    print(f"{'conversations':<40} sessions={args.sessions} wall={wall:.2f}s")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--port', type=int, default=8011)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    main(args)
@@ -0,0 +1,105 @@
+"""Microbenchmark for result delivery in Graph.traverse.
+
+Measures:
+* first-result latency: time from starting a traversal to receiving the first
+  result yielded by a node that answers immediately.
+* CPU per idle session: process CPU time burned while many traversals wait on
+  a node that has not produced anything yet (e.g. a slow LLM call).
+
+Usage:
+    python traverse_benchmark.py --iterations 500 --sessions 300 --idle-seconds 2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import bench_utils
+
+# poll the in-memory task status keys, the redis cancellation watcher would add pub/sub traffic to the numbers
+os.environ['CANCELLATION_MODE'] = 'poll'
+
+from agent.graph import base
+from agent.graph.base import Graph, Node
+
+
+class ImmediateNode(Node):
+    async def process(self, messages: list, input: dict = None):
+        yield {'node': self.id, 'output': 'ready', 'memory': {}}
+
+    async def get_successors(self, result: dict):
+        return []
+
+
+class IdleNode(Node):
+    async def process(self, messages: list, input: dict = None):
+        await input['release'].wait()
+        yield {'node': self.id, 'output': 'released', 'memory': {}}
+
+    async def get_successors(self, result: dict):
+        return []
+
+
+def build_graph():
+    graph = Graph()
+    graph.add_node(ImmediateNode('Immediate'))
+    graph.add_node(IdleNode('Idle'))
+    return graph.compile()
+
+
+async def first_result_latency(graph, iterations):
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        traversal = graph.traverse(f'bench-{i}', 'Immediate', [], {})
+        await traversal.__anext__()
+        latencies.append(time.perf_counter() - start)
+        await traversal.aclose()
+    return latencies
+
+
+async def idle_session_cpu(graph, sessions, idle_seconds):
+    release = asyncio.Event()
+
+    async def consume(i):
+        async for _ in graph.traverse(f'idle-{i}', 'Idle', [], {'release': release}):
+            pass
+
+    consumers = [asyncio.create_task(consume(i)) for i in range(sessions)]
+    await asyncio.sleep(0.1)  # let every session reach the idle node
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(idle_seconds)
+    cpu_used = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    release.set()
+    await asyncio.gather(*consumers)
+    return cpu_used, wall
+
+
+async def main(args):
+    base.redis_client = bench_utils.InMemoryRedis()
+    graph = build_graph()
+
+    latencies = await first_result_latency(graph, args.iterations)
+    bench_utils.summarize('first-result latency', latencies)
+
+    cpu_used, wall = await idle_session_cpu(graph, args.sessions, args.idle_seconds)
+    per_session = cpu_used / args.sessions / wall
+    print(
+        f"{'idle sessions':<40} sessions={args.sessions} wall={wall:.2f}s "
+        f"cpu={cpu_used * 1000:.2f}ms cpu/session/s={per_session * 1e6:.2f}us"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--idle-seconds', type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(main(args))
@@ -0,0 +1,278 @@
+"""Local stand-in for the Shopify Admin REST and GraphQL APIs.
+
+Serves the endpoints used by the reasoning agent from one of the sample store CSV
+files, keeping draft orders and orders in memory. Point the reasoning agent at it with
+
+    SHOPIFY_API_BASE_URL=http://127.0.0.1:8010/admin/api/2024-04
+
+Usage:
+    python shopify_stub_server.py --port 8010 --csv ../sample-store-items/pizza-store.csv --latency-ms 50
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sample-store-items', 'pizza-store.csv')
+
+
+class ShopifyStore:
+    """In-memory catalog, draft orders and orders."""
+
+    def __init__(self, csv_path):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1000)
+        self.products = {}
+        self.draft_orders = {}
+        self.orders = {}
+        self.load_catalog(csv_path)
+
+    def load_catalog(self, csv_path):
+        current = None
+        with open(csv_path, newline='') as f:
+            for row in csv.DictReader(f):
+                if row['Title']:
+                    current = {
+                        'id': next(self.ids),
+                        'title': row['Title'],
+                        'handle': row['Handle'],
+                        'status': row.get('Status') or 'active',
+                        'options': [],
+                        'variants': [],
+                        'images': [],
+                    }
+                    for i in (1, 2, 3):
+                        if row.get(f'Option{i} Name'):
+                            current['options'].append({'name': row[f'Option{i} Name'], 'values': []})
+                    self.products[current['id']] = current
+                if row.get('Image Src'):
+                    current['images'].append({
+                        'id': next(self.ids),
+                        'product_id': current['id'],
+                        'src': row['Image Src'],
+                        'variant_ids': [],
+                    })
+                if row.get('Variant SKU') or row.get('Variant Price'):
+                    values = [row.get(f'Option{i} Value') for i in (1, 2, 3) if row.get(f'Option{i} Value')]
+                    for option, value in zip(current['options'], values):
+                        option['values'].append(value)
+                    variant = {
+                        'id': next(self.ids),
+                        'product_id': current['id'],
+                        'title': ' / '.join(values) or 'Default Title',
+                        'price': row.get('Variant Price') or '0.00',
+                        'sku': row.get('Variant SKU') or '',
+                        'image_id': None,
+                    }
+                    if row.get('Variant Image'):
+                        image = {'id': next(self.ids), 'product_id': current['id'], 'src': row['Variant Image'], 'variant_ids': [variant['id']]}
+                        current['images'].append(image)
+                        variant['image_id'] = image['id']
+                    current['variants'].append(variant)
+
+    def find_variant(self, variant_id):
+        for product in self.products.values():
+            for variant in product['variants']:
+                if variant['id'] == variant_id:
+                    return product, variant
+        return None, None
+
+    def build_line_items(self, items):
+        line_items = []
+        for item in items:
+            product, variant = self.find_variant(int(item.get('variant_id') or 0))
+            if variant:
+                line_items.append({
+                    'id': next(self.ids),
+                    'variant_id': variant['id'],
+                    'product_id': product['id'],
+                    'title': product['title'],
+                    'variant_title': variant['title'],
+                    'sku': variant['sku'],
+                    'price': variant['price'],
+                    'quantity': int(item.get('quantity', 1)),
+                })
+            else:
+                line_items.append({
+                    'id': next(self.ids),
+                    'variant_id': None,
+                    'product_id': None,
+                    'title': item.get('title', 'Custom item'),
+                    'variant_title': None,
+                    'sku': None,
+                    'price': str(item.get('price', '0.00')),
+                    'quantity': int(item.get('quantity', 1)),
+                })
+        return line_items
+
+    @staticmethod
+    def with_total(draft_order):
+        total = sum(float(i['price']) * i['quantity'] for i in draft_order['line_items'])
+        draft_order['total_price'] = f'{total:.2f}'
+        return draft_order
+
+
+class ShopifyStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    store = None
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def route(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        match = re.match(r'^/admin/api/[^/]+/(.+)$', url.path)
+        if not match:
+            return self.send_json(404, {'errors': 'Not Found'})
+        path = match.group(1)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self.read_json() if method in ('POST', 'PUT') else {}
+        store = self.store
+
+        with store.lock:
+            if method == 'GET' and path == 'products.json':
+                products = list(store.products.values())
+                if 'status' in params:
+                    products = [p for p in products if p['status'] == params['status']]
+                return self.send_json(200, {'products': products})
+
+            if path == 'graphql.json' and method == 'POST':
+                return self.send_json(200, self.graphql(body.get('query', ''), body.get('variables') or {}))
+
+            match = re.match(r'^products/(\d+)\.json$', path)
+            if method == 'GET' and match:
+                product = store.products.get(int(match.group(1)))
+                if not product:
+                    return self.send_json(404, {'errors': 'Not Found'})
+                return self.send_json(200, {'product': product})
+
+            if method == 'POST' and path == 'draft_orders.json':
+                draft_order = {
+                    'id': next(store.ids),
+                    'status': 'open',
+                    'order_id': None,
+                    'line_items': store.build_line_items(body['draft_order'].get('line_items', [])),
+                }
+                store.draft_orders[draft_order['id']] = store.with_total(draft_order)
+                return self.send_json(201, {'draft_order': draft_order})
+
+            match = re.match(r'^draft_orders/(\d+)(/complete)?\.json$', path)
+            if match:
+                draft_order = store.draft_orders.get(int(match.group(1)))
+                if not draft_order:
+                    return self.send_json(404, {'errors': 'Not Found'})
+                if match.group(2) and method == 'PUT':
+                    if draft_order['status'] == 'completed':
+                        return self.send_json(422, {'errors': 'This order has already been paid'})
+                    order = {'id': next(store.ids), 'fulfillment_status': None, 'line_items': draft_order['line_items']}
+                    store.orders[order['id']] = order
+                    draft_order.update({'status': 'completed', 'order_id': order['id']})
+                    return self.send_json(200, {'draft_order': draft_order})
+                if method == 'GET':
+                    return self.send_json(200, {'draft_order': draft_order})
+                if method == 'PUT':
+                    if 'line_items' in body.get('draft_order', {}):
+                        draft_order['line_items'] = store.build_line_items(body['draft_order']['line_items'])
+                    return self.send_json(200, {'draft_order': store.with_total(draft_order)})
+                if method == 'DELETE':
+                    del store.draft_orders[draft_order['id']]
+                    return self.send_json(200, {})
+
+            match = re.match(r'^orders/(\d+)\.json$', path)
+            if method == 'GET' and match:
+                order = store.orders.get(int(match.group(1)))
+                if not order:
+                    return self.send_json(404, {'errors': 'Not Found'})
+                return self.send_json(200, {'order': order})
+
+        return self.send_json(404, {'errors': 'Not Found'})
+
+    def graphql(self, query, variables):
+        """Answers the handful of GraphQL queries the reasoning agent sends."""
+        store = self.store
+        if 'productVariants' in query:
+            sku = variables.get('query', '').replace('sku:', '')
+            edges = [
+                {'node': {
+                    'id': f"gid://shopify/ProductVariant/{variant['id']}",
+                    'sku': variant['sku'],
+                    'product': {'id': f"gid://shopify/Product/{product['id']}", 'title': product['title']},
+                }}
+                for product in store.products.values() for variant in product['variants']
+                if variant['sku'] == sku
+            ][:1]
+            return {'data': {'productVariants': {'edges': edges}}}
+        if 'nodes(' in query:
+            nodes = []
+            for gid in variables.get('ids', []):
+                product = store.products.get(int(gid.rsplit('/', 1)[-1]))
+                if not product:
+                    nodes.append(None)
+                    continue
+                images = {image['id']: image['src'] for image in product['images']}
+                nodes.append({
+                    'id': f"gid://shopify/Product/{product['id']}",
+                    'images': {'edges': [{'node': {'url': image['src']}} for image in product['images'][:1]]},
+                    'variants': {'edges': [
+                        {'node': {
+                            'id': f"gid://shopify/ProductVariant/{variant['id']}",
+                            'image': {'url': images[variant['image_id']]} if variant['image_id'] else None,
+                        }}
+                        for variant in product['variants']
+                    ]},
+                })
+            return {'data': {'nodes': nodes}}
+        return {'errors': [{'message': 'Query not supported by the Shopify stand-in server'}]}
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def do_PUT(self):
+        self.route('PUT')
+
+    def do_DELETE(self):
+        self.route('DELETE')
+
+
+def make_server(host='127.0.0.1', port=8010, csv_path=DEFAULT_CSV, latency_ms=0.0):
+    handler = type('Handler', (ShopifyStubHandler,), {
+        'store': ShopifyStore(csv_path),
+        'latency': latency_ms / 1000,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='artificial latency added to every request')
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.csv, args.latency_ms)
+    print(f"Shopify stand-in server listening on http://{args.host}:{args.port}/admin/api/2024-04")
+    server.serve_forever()
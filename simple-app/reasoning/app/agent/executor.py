@@ -6,9 +6,11 @@ import logging
 import inspect
 
 from .tools.generic_tools import get_current_weather, get_current_time, get_stock_price
-from agent_framework import initialize_llm_client, observability_decorator
+from agent_framework import observability_decorator
+from .utils.llm_gateway import get_llm_gateway
 
-client = initialize_llm_client()
+# every LLM call shares the process wide gateway and its connection pool
+client = get_llm_gateway()
 MODEL = os.environ['LLM_MODEL_ID']
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
@@ -36,7 +38,7 @@ async def run_agent(input_dict: dict):
         messages = input_dict['messages']
         session = input_dict['session']
 
-        response = single_turn_agent(messages)
+        response = await single_turn_agent(messages)
         response['session'] = session
         logging.info(f"Agent Output: {json.dumps(response)}")
         yield json.dumps(response)
@@ -64,7 +66,7 @@ def extract_function_metadata(func: Callable) -> dict:
         }
     }
 
-def single_turn_agent(messages: List[dict]) -> str:
+async def single_turn_agent(messages: List[dict]) -> str:
 
     system_prompt = {
         "role": "user",
@@ -94,7 +96,8 @@ def single_turn_agent(messages: List[dict]) -> str:
         for func in tools_dict.values()
     ]
 
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
+        node='ChooseTool',
         model=os.environ['LLM_MODEL_ID'],
         messages=messages,
         tools=tools,
@@ -120,7 +123,8 @@ def single_turn_agent(messages: List[dict]) -> str:
             function_name = tool_call.function.name
             function_to_call = available_functions[function_name]
             function_args = json.loads(tool_call.function.arguments)
-            function_response = function_to_call(**function_args)
+            # the tools are blocking http calls
+            function_response = await asyncio.to_thread(function_to_call, **function_args)
             messages.append(
                 {
                     "tool_call_id": tool_call.id,
@@ -130,7 +134,8 @@ def single_turn_agent(messages: List[dict]) -> str:
                 }
             )
         
-        second_response = client.chat.completions.create(
+        second_response = await client.chat.completions.create(
+            node='Response',
             model=MODEL,
             messages=messages
         )
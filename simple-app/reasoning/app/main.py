@@ -1,9 +1,12 @@
-from agent_framework import xrx_reasoning, initialize_llm_client, observability_decorator
+from fastapi.responses import PlainTextResponse
+from agent_framework import xrx_reasoning
 from agent.executor import run_agent
-
-# The rest of the code remains the same
-llm_client = initialize_llm_client()
+from agent.utils.metrics import registry
 
 
 app = xrx_reasoning(run_agent=run_agent)()
 
+
+@app.get('/metrics')
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
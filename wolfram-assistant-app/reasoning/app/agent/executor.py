@@ -1,14 +1,17 @@
 from typing import List, Dict
+import asyncio
 import json
 import logging
-from agent_framework import initialize_llm_client, observability_decorator
+from agent_framework import observability_decorator
 
 import os
 from .tools import generic_tools
+from .utils.llm_gateway import get_llm_gateway
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
 
-client = initialize_llm_client()
+# every LLM call shares the process wide gateway and its connection pool
+client = get_llm_gateway()
 MODEL = os.environ['LLM_MODEL_ID']
 
 SYSTEM_PROMPT = """You are an AI agent that is designed to answer questions. 
@@ -92,7 +95,8 @@ async def single_turn_agent(messages: List[Dict[str, str]]) -> Dict[str, any]:
     }]
 
     # First LLM call to decide whether to use the tool or not.
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
+        node='ChooseTool',
         model=MODEL,
         messages=messages,
         tools=tools,
@@ -117,7 +121,8 @@ async def single_turn_agent(messages: List[Dict[str, str]]) -> Dict[str, any]:
             })
         
         # Second LLM call that merges the tool call response with a polished response.
-        second_response = client.chat.completions.create(
+        second_response = await client.chat.completions.create(
+            node='Response',
             model=MODEL,
             messages=messages
         )
@@ -148,6 +153,6 @@ async def ask_wolfram_assistant(question: str) -> str:
         return "No question provided"
 
     logging.info(f"QUESTION: {question}")
-    answer = generic_tools.get_wolfram_response(question)
+    answer = await asyncio.to_thread(generic_tools.get_wolfram_response, question)
     logging.info(f"ANSWER: {answer}")
     return answer
\ No newline at end of file